@@ -2,9 +2,11 @@ import evaluation_pb2
 import evaluation_pb2_grpc
 import grpc
 import os
-import pickle
+import queue
 import time
 
+from codec import action_to_message, step_result_to_feedback
+
 time.sleep(30)
 
 LOCAL_EVALUATION = os.environ.get("LOCAL_EVALUATION")
@@ -17,22 +19,46 @@ else:
 stub = evaluation_pb2_grpc.EnvironmentStub(channel)
 
 
-def pack_for_grpc(entity):
-    return pickle.dumps(entity)
+NUM_ENVS = int(os.environ.get("NUM_ENVS", "0"))
 
 
-def unpack_for_grpc(entity):
-    return pickle.loads(entity)
+def run_episode():
+    # actions are streamed over a single Act call instead of a round trip per step,
+    # None closes the stream. Agents with a fixed batch of actions can use stub.ActMany instead.
+    actions = queue.Queue()
+    actions.put(action_to_message(1))
 
+    for result in stub.Act(iter(actions.get, None)):
+        feedback = step_result_to_feedback(result)
+        print("Agent Feedback", feedback)
+        print("*" * 100)
+        if feedback[2]:
+            actions.put(None)
+            break
+        actions.put(action_to_message(1))
 
-flag = None
 
-while not flag:
-    base = unpack_for_grpc(
-        stub.act_on_environment(
-            evaluation_pb2.Package(SerializedEntity=pack_for_grpc(1))
-        ).SerializedEntity
+def run_session(num_envs):
+    # num_envs environments stepped together, one episode each
+    session = stub.CreateSession(
+        evaluation_pb2.SessionRequest(num_envs=num_envs, episodes=num_envs)
     )
-    flag = base["feedback"][2]
-    print("Agent Feedback", base["feedback"])
-    print("*" * 100)
+    finished = 0
+    while finished < num_envs:
+        results = stub.StepSession(
+            evaluation_pb2.SessionActions(
+                session_id=session.session_id,
+                actions=[action_to_message(1)] * session.num_envs,
+            )
+        ).results
+        finished += sum(result.done for result in results)
+        print("Agent Feedback", [step_result_to_feedback(result)[1:3] for result in results])
+        print("*" * 100)
+    scores = stub.CloseSession(session)
+    print("Episode scores", list(scores.episode_scores), "mean", scores.mean)
+
+
+if NUM_ENVS:
+    run_session(NUM_ENVS)
+else:
+    run_episode()
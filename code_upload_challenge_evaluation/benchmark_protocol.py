@@ -0,0 +1,146 @@
+"""
+Compares the pickled Package protocol with the typed Action/StepResult protocol of the Environment service:
+bytes on the wire per step and per step latency, for message encoding alone and for a loopback gRPC round trip.
+The typed protocol is also timed over the streaming Act and the batched ActMany RPCs.
+
+usage: python benchmark_protocol.py [--steps 2000] [--batch 32] [--obs-shape 4] [--obs-dtype float64]
+e.g. --obs-shape 84 84 3 --obs-dtype uint8 for image observations
+"""
+import argparse
+import pickle
+import sys
+import time
+from concurrent import futures
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "utils"))
+
+import grpc
+import numpy as np
+
+import evaluation_pb2
+import evaluation_pb2_grpc
+from codec import (
+    action_to_message,
+    feedback_to_step_result,
+    message_to_action,
+    step_result_to_feedback,
+)
+
+
+class BenchmarkEnvironment(evaluation_pb2_grpc.EnvironmentServicer):
+    """Environment servicer answering every step with the same feedback"""
+
+    def __init__(self, observation):
+        self.feedback = (observation, 1.0, False, {})
+
+    def act_on_environment(self, request, context):
+        pickle.loads(request.SerializedEntity)
+        return evaluation_pb2.Package(
+            SerializedEntity=pickle.dumps({"feedback": self.feedback, "current_score": 1})
+        )
+
+    def Step(self, request, context):
+        message_to_action(request)
+        return feedback_to_step_result(self.feedback, 1)
+
+    def Act(self, request_iterator, context):
+        for request in request_iterator:
+            yield self.Step(request, context)
+
+    def ActMany(self, request, context):
+        return evaluation_pb2.StepResultBatch(
+            results=[self.Step(action, context) for action in request.actions]
+        )
+
+
+def pickle_step(stub, action):
+    response = stub.act_on_environment(
+        evaluation_pb2.Package(SerializedEntity=pickle.dumps(action))
+    )
+    return pickle.loads(response.SerializedEntity)["feedback"]
+
+
+def typed_step(stub, action):
+    return step_result_to_feedback(stub.Step(action_to_message(action)))
+
+
+def streamed_steps(stub, action, steps):
+    actions = (action_to_message(action) for _ in range(steps))
+    for result in stub.Act(actions):
+        step_result_to_feedback(result)
+
+
+def batched_steps(stub, action, steps, batch):
+    for start in range(0, steps, batch):
+        request = evaluation_pb2.ActionBatch(
+            actions=[action_to_message(action)] * min(batch, steps - start)
+        )
+        for result in stub.ActMany(request).results:
+            step_result_to_feedback(result)
+
+
+def pickle_encoding(feedback, action):
+    request = evaluation_pb2.Package(SerializedEntity=pickle.dumps(action)).SerializeToString()
+    response = evaluation_pb2.Package(
+        SerializedEntity=pickle.dumps({"feedback": feedback, "current_score": 1})
+    ).SerializeToString()
+    pickle.loads(evaluation_pb2.Package.FromString(request).SerializedEntity)
+    pickle.loads(evaluation_pb2.Package.FromString(response).SerializedEntity)
+    return len(request) + len(response)
+
+
+def typed_encoding(feedback, action):
+    request = action_to_message(action).SerializeToString()
+    response = feedback_to_step_result(feedback, 1).SerializeToString()
+    message_to_action(evaluation_pb2.Action.FromString(request))
+    step_result_to_feedback(evaluation_pb2.StepResult.FromString(response))
+    return len(request) + len(response)
+
+
+def timed(function, steps, *args):
+    start = time.perf_counter()
+    for _ in range(steps):
+        result = function(*args)
+    return (time.perf_counter() - start) / steps * 1e6, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--obs-shape", type=int, nargs="+", default=[4])
+    parser.add_argument("--obs-dtype", default="float64")
+    args = parser.parse_args()
+
+    observation = np.random.rand(*args.obs_shape).astype(args.obs_dtype)
+    feedback = (observation, 1.0, False, {})
+    action = 1
+
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=1))
+    evaluation_pb2_grpc.add_EnvironmentServicer_to_server(BenchmarkEnvironment(observation), server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    stub = evaluation_pb2_grpc.EnvironmentStub(grpc.insecure_channel("127.0.0.1:{}".format(port)))
+    # warm up the channel
+    pickle_step(stub, action)
+    typed_step(stub, action)
+
+    print("observation shape {} dtype {}, {} steps".format(tuple(args.obs_shape), args.obs_dtype, args.steps))
+    print("{:<8}{:>16}{:>20}{:>20}".format("protocol", "bytes/step", "encode us/step", "round trip us/step"))
+    for name, encoding, step in (("pickle", pickle_encoding, pickle_step), ("typed", typed_encoding, typed_step)):
+        encode_us, size = timed(encoding, args.steps, feedback, action)
+        round_trip_us, _ = timed(step, args.steps, stub, action)
+        print("{:<8}{:>16}{:>20.1f}{:>20.1f}".format(name, size, encode_us, round_trip_us))
+
+    print("{:<28}{:>20}".format("typed rpc", "us/step"))
+    stream_us, _ = timed(streamed_steps, 1, stub, action, args.steps)
+    batch_us, _ = timed(batched_steps, 1, stub, action, args.steps, args.batch)
+    print("{:<28}{:>20.1f}".format("Act (stream)", stream_us / args.steps))
+    print("{:<28}{:>20.1f}".format("ActMany (batch {})".format(args.batch), batch_us / args.steps))
+
+    server.stop(0)
+
+
+if __name__ == "__main__":
+    main()
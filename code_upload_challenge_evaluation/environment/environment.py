@@ -1,21 +1,27 @@
 import grpc
 import gym
-import pickle
 import sys
 import os
 import requests
 import json
+import threading
 
 from environment_utils import EvalAI_Interface
 
 from concurrent import futures
-import time
 
 import evaluation_pb2
 import evaluation_pb2_grpc
+from codec import feedback_to_step_result, message_to_action
+from sessions import EnvironmentSession
 
 LOCAL_EVALUATION = os.environ.get("LOCAL_EVALUATION")
-EVALUATION_COMPLETED = False
+ENVIRONMENT_NAME = os.environ.get("ENVIRONMENT_NAME", "CartPole-v0")
+MAX_SESSION_ENVS = int(os.environ.get("MAX_SESSION_ENVS", "16"))
+# open sessions at a time, sessions not stepped for SESSION_IDLE_SECONDS are closed to make room for new ones
+MAX_SESSIONS = int(os.environ.get("MAX_SESSIONS", "8"))
+SESSION_IDLE_SECONDS = float(os.environ.get("SESSION_IDLE_SECONDS", "600"))
+EVALUATION_COMPLETED = threading.Event()
 
 
 class evaluator_environment:
@@ -38,32 +44,114 @@ class Environment(evaluation_pb2_grpc.EnvironmentServicer):
         self.phase_pk = phase_pk
         self.submission_pk = submission_pk
         self.server = server
+        # steps of concurrent RPCs are applied one at a time
+        self.lock = threading.Lock()
+        # multi environment sessions by session id, each with its own environment instances
+        self.sessions = {}
+
+    # the pickled get_action_space and act_on_environment RPCs are not served, unpickling the bytes of an agent
+    # runs arbitrary code in the environment. They answer UNIMPLEMENTED, agents use the typed RPCs
+    def GetActionSpace(self, request, context):
+        return evaluation_pb2.ActionSpace(actions=env.get_action_space())
+
+    def step(self, action):
+        completed = False
+        with self.lock:
+            if not env.feedback or not env.feedback[2]:
+                env.next_score()
+                env.feedback = env.env.step(action)
+                completed = env.feedback[2]
+            feedback = env.feedback
+        # the result is reported to EvalAI outside the lock, concurrent steps are not held up by the request
+        if completed:
+            self.complete()
+        return feedback
+
+    def complete(self, accuracies=None):
+        accuracies = accuracies or {"score": env.score}
+        if not LOCAL_EVALUATION:
+            update_submission_result(
+                accuracies, self.challenge_pk, self.phase_pk, self.submission_pk
+            )
+        else:
+            print("Final Score: {0}".format(accuracies))
+            print("Stopping Evaluation!")
+        EVALUATION_COMPLETED.set()
+
+    def Step(self, request, context):
+        feedback = self.step(message_to_action(request))
+        return feedback_to_step_result(feedback, env.score)
+
+    def Act(self, request_iterator, context):
+        for request in request_iterator:
+            yield self.Step(request, context)
+
+    def ActMany(self, request, context):
+        return evaluation_pb2.StepResultBatch(
+            results=[self.Step(action, context) for action in request.actions]
+        )
 
-    def get_action_space(self, request, context):
-        message = pack_for_grpc(env.get_action_space())
-        return evaluation_pb2.Package(SerializedEntity=message)
-
-    def act_on_environment(self, request, context):
-        global EVALUATION_COMPLETED
-        if not env.feedback or not env.feedback[2]:
-            action = unpack_for_grpc(request.SerializedEntity)
-            env.next_score()
-            env.feedback = env.env.step(action)
-        if env.feedback[2]:
-            if not LOCAL_EVALUATION:
-                update_submission_result(
-                    env, self.challenge_pk, self.phase_pk, self.submission_pk
-                )
-            else:
-                print("Final Score: {0}".format(env.score))
-                print("Stopping Evaluation!")
-                EVALUATION_COMPLETED = True
-        return evaluation_pb2.Package(
-            SerializedEntity=pack_for_grpc(
-                {"feedback": env.feedback, "current_score": env.score,}
+    def CreateSession(self, request, context):
+        num_envs = request.num_envs or 1
+        if num_envs > MAX_SESSION_ENVS:
+            context.abort(
+                grpc.StatusCode.INVALID_ARGUMENT,
+                "At most {} environments per session".format(MAX_SESSION_ENVS),
+            )
+        session = EnvironmentSession(ENVIRONMENT_NAME, num_envs, request.episodes or num_envs)
+        with self.lock:
+            idle = [
+                session_id
+                for session_id, open_session in self.sessions.items()
+                if open_session.idle_seconds() > SESSION_IDLE_SECONDS
+            ]
+            closed = [self.sessions.pop(session_id) for session_id in idle]
+            full = len(self.sessions) >= MAX_SESSIONS
+            if not full:
+                self.sessions[session.session_id] = session
+        for idle_session in closed:
+            idle_session.close()
+        if full:
+            session.close()
+            context.abort(
+                grpc.StatusCode.RESOURCE_EXHAUSTED,
+                "At most {} open sessions, close one first".format(MAX_SESSIONS),
             )
+        return evaluation_pb2.Session(session_id=session.session_id, num_envs=num_envs)
+
+    def get_session(self, session_id, context):
+        session = self.sessions.get(session_id)
+        if session is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, "Unknown session {}".format(session_id))
+        return session
+
+    def StepSession(self, request, context):
+        session = self.get_session(request.session_id, context)
+        try:
+            results = session.step([message_to_action(action) for action in request.actions])
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        return evaluation_pb2.StepResultBatch(
+            results=[feedback_to_step_result(feedback, score) for feedback, score in results]
         )
 
+    def CloseSession(self, request, context):
+        with self.lock:
+            session = self.sessions.pop(request.session_id, None)
+        if session is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, "Unknown session {}".format(request.session_id))
+        session.close()
+        summary = session.summary()
+        if summary["complete"]:
+            # the episode scores of a complete session are the submission result
+            self.complete(
+                {
+                    "score": summary["mean"],
+                    "score_std": summary["std"],
+                    "episodes": len(summary["episode_scores"]),
+                }
+            )
+        return evaluation_pb2.SessionScores(**summary)
 
 env = evaluator_environment()
 api = EvalAI_Interface(
@@ -72,19 +160,11 @@ api = EvalAI_Interface(
 )
 
 
-def pack_for_grpc(entity):
-    return pickle.dumps(entity)
-
-
-def unpack_for_grpc(entity):
-    return pickle.loads(entity)
-
-
 def get_action_space(env):
     return list(range(env.action_space.n))
 
 
-def update_submission_result(env, challenge_pk, phase_pk, submission_pk):
+def update_submission_result(accuracies, challenge_pk, phase_pk, submission_pk):
     submission_data = {
         "submission_status": "finished",
         "submission": submission_pk,
@@ -100,15 +180,13 @@ def update_submission_result(env, challenge_pk, phase_pk, submission_pk):
                 {
                     "split": "train_split",
                     "show_to_participant": True,
-                    "accuracies": {"score": env.score},
+                    "accuracies": accuracies,
                 }
             ]
         ),
     }
     api.update_submission_data(submission_data, challenge_pk)
     print("Data updated successfully!")
-    EVALUATION_COMPLETED = True
-    exit(0)
 
 
 def main():
@@ -126,7 +204,8 @@ def main():
         phase_pk = "1"
         submission_pk = "1"
 
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=1))
+    # a streaming Act call holds its worker thread for the whole episode
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
     evaluation_pb2_grpc.add_EnvironmentServicer_to_server(
         Environment(challenge_pk, phase_pk, submission_pk, server), server
     )
@@ -134,9 +213,9 @@ def main():
     server.add_insecure_port("[::]:8085")
     server.start()
     try:
-        while not EVALUATION_COMPLETED:
-            time.sleep(4)
-        server.stop(0)
+        EVALUATION_COMPLETED.wait()
+        # grace period lets the final step response reach the agent
+        server.stop(1).wait()
     except KeyboardInterrupt:
         server.stop(0)
 
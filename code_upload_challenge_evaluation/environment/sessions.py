@@ -0,0 +1,68 @@
+import threading
+import time
+import uuid
+
+import gym
+import numpy as np
+
+
+class EnvironmentSession:
+    """num_envs independent instances of an environment, stepped together with one action per instance.
+
+    An instance whose episode ends is reset right away, the step result of that instance still carries the
+    final observation with done set. The session is complete once `episodes` episodes finished in total.
+    """
+
+    def __init__(self, environment, num_envs, episodes):
+        self.session_id = uuid.uuid4().hex
+        self.envs = [gym.make(environment) for _ in range(num_envs)]
+        for instance in self.envs:
+            instance.reset()
+        self.episodes = episodes
+        self.scores = [0] * num_envs
+        self.episode_scores = []
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    @property
+    def complete(self):
+        return len(self.episode_scores) >= self.episodes
+
+    def step(self, actions):
+        """Applies actions[i] to instance i, returns the feedback and current score of each instance"""
+        if len(actions) != len(self.envs):
+            raise ValueError(
+                "Expected {} actions, got {}".format(len(self.envs), len(actions))
+            )
+        results = []
+        with self.lock:
+            self.last_used = time.monotonic()
+            for i, (instance, action) in enumerate(zip(self.envs, actions)):
+                self.scores[i] += 1
+                feedback = instance.step(action)
+                results.append((feedback, self.scores[i]))
+                if feedback[2]:
+                    if not self.complete:
+                        self.episode_scores.append(self.scores[i])
+                    self.scores[i] = 0
+                    instance.reset()
+        return results
+
+    def idle_seconds(self):
+        """Seconds since the session was created or last stepped"""
+        return time.monotonic() - self.last_used
+
+    def summary(self):
+        """Scores of the finished episodes with their mean and standard deviation"""
+        with self.lock:
+            scores = list(self.episode_scores)
+        return {
+            "episode_scores": scores,
+            "mean": float(np.mean(scores)) if scores else 0.0,
+            "std": float(np.std(scores)) if scores else 0.0,
+            "complete": len(scores) >= self.episodes,
+        }
+
+    def close(self):
+        for instance in self.envs:
+            instance.close()
@@ -0,0 +1,77 @@
+"""
+Client of the local evaluation daemon (evaluator.py).
+
+usage: python client.py submission.zip dev [--options '{"skip_empty_gt": true}'] [--address 127.0.0.1:8086] [--upload]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).absolute().parent.parent / "utils"))
+
+import grpc
+
+import evaluation_pb2
+import evaluation_pb2_grpc
+
+
+class EvaluatorClient(object):
+    """
+    Client for scoring submissions with a running evaluator
+    """
+
+    def __init__(self, address="127.0.0.1:8086"):
+        self.channel = grpc.insecure_channel(
+            address,
+            # uploaded submissions are sent in a single message
+            options=[("grpc.max_send_message_length", -1), ("grpc.max_receive_message_length", -1)],
+        )
+        self.stub = evaluation_pb2_grpc.EvaluatorStub(self.channel)
+
+    def evaluate(self, phase, path=None, data=None, **options):
+        """Scores the submission at path on the evaluator host, or the submission zip bytes data
+
+        Returns the EvaluateResponse, its output is the json encoded evaluate() output
+        """
+        request = evaluation_pb2.EvaluateRequest(phase=phase, options=json.dumps(options))
+        if data is not None:
+            request.data = data
+        else:
+            request.path = str(path)
+        return self.stub.Evaluate(request)
+
+    def close(self):
+        self.channel.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("submission")
+    parser.add_argument("phase")
+    parser.add_argument("--options", default="{}")
+    parser.add_argument("--address", default="127.0.0.1:8086")
+    parser.add_argument("--upload", action="store_true", help="send the submission bytes instead of its path")
+    args = parser.parse_args()
+
+    client = EvaluatorClient(args.address)
+    submission = Path(args.submission)
+    if args.upload:
+        response = client.evaluate(args.phase, data=submission.read_bytes(), **json.loads(args.options))
+    else:
+        response = client.evaluate(args.phase, path=submission.absolute(), **json.loads(args.options))
+    client.close()
+
+    if response.error:
+        print("Evaluation failed: {}".format(response.error))
+    else:
+        print(json.dumps(json.loads(response.output), indent=2))
+    print(
+        "queue {:.3f}s, score {:.3f}s, total {:.3f}s".format(
+            response.queue_seconds, response.score_seconds, response.total_seconds
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
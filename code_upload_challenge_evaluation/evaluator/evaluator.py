@@ -0,0 +1,207 @@
+"""
+Local evaluation daemon: loads, decrypts and indexes the test annotations of each phase once, then scores
+submissions sent to its Evaluator gRPC service, so a request costs only the scoring itself.
+
+Submissions are scored by a bounded process pool. Requests beyond the pool and its queue are refused with
+RESOURCE_EXHAUSTED instead of piling up. A pool broken by a dying scoring process (e.g. killed out of memory) is
+replaced, the requests it was scoring are scored again in a process of their own and only a request that also kills
+that one fails.
+Clients only set the scoring options of CLIENT_OPTIONS, admission limits and the files scoring writes or reads stay
+under the control of the daemon.
+
+usage: PHASES='{"dev": "annotations/test_annotations_devsplit.zip"}' python evaluator.py
+environment:
+    PHASES               json mapping of phase codename to test annotation file
+    EVALUATION_SCRIPT_DIR directory containing the evaluation_script package (default: repository root)
+    EVALUATOR_ADDRESS    address to serve on (default: 127.0.0.1:8086)
+    EVALUATOR_WORKERS    scoring processes (default: cpu count)
+    EVALUATOR_QUEUE      requests waiting for a worker before new ones are refused (default: 2 x workers)
+    ANGLE_UNIT           heading unit of the boxes, 'degrees' (default) or 'radians'
+    EVALUATOR_MAX_MESSAGE_BYTES largest request and response, an uploaded submission is sent in one request
+                         (default: 1 GiB)
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent import futures
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).absolute().parent.parent / "utils"))
+
+import grpc
+
+import evaluation_pb2
+import evaluation_pb2_grpc
+
+EVALUATION_SCRIPT_DIR = os.environ.get(
+    "EVALUATION_SCRIPT_DIR", str(Path(__file__).absolute().parent.parent.parent)
+)
+sys.path.append(EVALUATION_SCRIPT_DIR)
+
+from evaluation_script.main import GroundTruth, score_submission
+
+# test annotations of each phase in a scoring process, set once per process by init_worker
+WORKER_GT = None
+
+# scoring options a client may set, with their json type
+CLIENT_OPTIONS = {
+    "skip_empty_gt": bool,
+    "temporal": bool,
+    "class_aware": bool,
+    "progress_seed": int,
+    "bootstrap_replicates": int,
+}
+MAX_BOOTSTRAP_REPLICATES = 10000
+
+
+def init_worker(gt):
+    global WORKER_GT
+    WORKER_GT = gt
+
+
+def score_in_worker(submission_file, phase, options):
+    """Scores in a pool process, returns the output with the time the worker started and the scoring time"""
+    start = time.time()
+    output = score_submission(WORKER_GT[phase], submission_file, phase, **options)
+    return output, start, time.time() - start
+
+
+def check_options(options):
+    """The reason options are refused, None when a client may use them"""
+    if not isinstance(options, dict):
+        return "Options must be a json object"
+    unknown = set(options) - set(CLIENT_OPTIONS)
+    if unknown:
+        return "Unknown options {}, expected some of {}".format(sorted(unknown), list(CLIENT_OPTIONS))
+    for name, value in options.items():
+        if type(value) is not CLIENT_OPTIONS[name]:
+            return "Option {} must be a {}".format(name, CLIENT_OPTIONS[name].__name__)
+    if not 0 <= options.get("bootstrap_replicates", 0) <= MAX_BOOTSTRAP_REPLICATES:
+        return "Option bootstrap_replicates must be within [0, {}]".format(MAX_BOOTSTRAP_REPLICATES)
+    return None
+
+
+class Evaluator(evaluation_pb2_grpc.EvaluatorServicer):
+    def __init__(self, gt, workers, queue):
+        self.gt = gt
+        self.phases = set(gt)
+        self.workers = workers
+        self.pool = self.new_pool(workers)
+        self.pool_lock = threading.Lock()
+        # requests scored or waiting for a worker
+        self.slots = threading.BoundedSemaphore(workers + queue)
+
+    def new_pool(self, workers):
+        return futures.ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(self.gt,))
+
+    def replace_pool(self, broken):
+        """Replaces the broken pool, once for all the requests it broke"""
+        with self.pool_lock:
+            if self.pool is broken:
+                print("The scoring process pool broke, starting a new one")
+                broken.shutdown(wait=False)
+                self.pool = self.new_pool(self.workers)
+
+    def score(self, submission_file, phase, options):
+        """score_in_worker in the pool. When the pool breaks, the submission is scored again in a process of its own,
+        so only a submission that kills its own process fails"""
+        pool = self.pool
+        try:
+            return pool.submit(score_in_worker, submission_file, phase, options).result()
+        except BrokenProcessPool:
+            self.replace_pool(pool)
+        isolated = self.new_pool(1)
+        try:
+            return isolated.submit(score_in_worker, submission_file, phase, options).result()
+        except BrokenProcessPool:
+            raise RuntimeError("The scoring process died, e.g. killed for running out of memory")
+        finally:
+            isolated.shutdown()
+
+    def Evaluate(self, request, context):
+        received = time.time()
+        if request.phase not in self.phases:
+            context.abort(
+                grpc.StatusCode.INVALID_ARGUMENT,
+                "Unknown phase '{}', expected one of {}".format(request.phase, sorted(self.phases)),
+            )
+        try:
+            options = json.loads(request.options or "{}")
+        except ValueError:
+            options = None
+        refused = check_options(options)
+        if refused:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, refused)
+        if not self.slots.acquire(blocking=False):
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "All evaluation workers and queue slots are busy")
+
+        submission_file = None
+        try:
+            if request.WhichOneof("submission") == "data":
+                with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as f:
+                    f.write(request.data)
+                submission_file = f.name
+            output, started, score_seconds = self.score(submission_file or request.path, request.phase, options)
+            return evaluation_pb2.EvaluateResponse(
+                output=json.dumps(output, default=float),
+                queue_seconds=max(started - received, 0.0),
+                score_seconds=score_seconds,
+                total_seconds=time.time() - received,
+            )
+        except Exception as ex:
+            return evaluation_pb2.EvaluateResponse(
+                error=repr(ex), total_seconds=time.time() - received
+            )
+        finally:
+            self.slots.release()
+            if submission_file is not None:
+                os.remove(submission_file)
+
+    def close(self):
+        self.pool.shutdown()
+
+
+def load_phases(phases, angle_unit):
+    """Test annotations of each phase codename, decrypted, parsed and indexed once"""
+    gt = {}
+    for phase, annotation_file in phases.items():
+        print("Loading phase '{}' test annotations '{}'".format(phase, annotation_file))
+        gt[phase] = GroundTruth(annotation_file, angle_unit)
+    return gt
+
+
+def main():
+    phases = json.loads(os.environ.get("PHASES", "{}"))
+    if not phases:
+        raise ValueError("PHASES is empty, expected a json mapping of phase codename to test annotation file")
+    address = os.environ.get("EVALUATOR_ADDRESS", "127.0.0.1:8086")
+    workers = int(os.environ.get("EVALUATOR_WORKERS", "0")) or os.cpu_count()
+    queue = int(os.environ.get("EVALUATOR_QUEUE", str(2 * workers)))
+    max_message_bytes = int(os.environ.get("EVALUATOR_MAX_MESSAGE_BYTES", str(1024 ** 3)))
+
+    evaluator = Evaluator(load_phases(phases, os.environ.get("ANGLE_UNIT", "degrees")), workers, queue)
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=workers + queue + 1),
+        # gRPC receives at most 4 MB by default, too little for uploaded submissions
+        options=[
+            ("grpc.max_receive_message_length", max_message_bytes),
+            ("grpc.max_send_message_length", max_message_bytes),
+        ],
+    )
+    evaluation_pb2_grpc.add_EvaluatorServicer_to_server(evaluator, server)
+    server.add_insecure_port(address)
+    server.start()
+    print("Evaluator serving {} on {} with {} workers".format(sorted(phases), address, workers))
+    try:
+        server.wait_for_termination()
+    finally:
+        server.stop(1).wait()
+        evaluator.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import json
+
+import numpy as np
+
+import evaluation_pb2
+
+
+def array_to_tensor(array):
+    array = np.ascontiguousarray(array)
+    return evaluation_pb2.Tensor(
+        data=array.tobytes(), shape=array.shape, dtype=array.dtype.str
+    )
+
+
+def tensor_to_array(tensor):
+    return np.frombuffer(tensor.data, dtype=np.dtype(tensor.dtype)).reshape(
+        tuple(tensor.shape)
+    )
+
+
+def action_to_message(action):
+    """Discrete (integer) actions are sent as int64, anything else as a tensor"""
+    if isinstance(action, (int, np.integer)):
+        return evaluation_pb2.Action(discrete=int(action))
+    return evaluation_pb2.Action(continuous=array_to_tensor(action))
+
+
+def message_to_action(message):
+    if message.WhichOneof("value") == "continuous":
+        return tensor_to_array(message.continuous)
+    return message.discrete
+
+
+def feedback_to_step_result(feedback, current_score):
+    """gym step feedback (observation, reward, done, info) to a StepResult message"""
+    observation, reward, done, info = feedback
+    return evaluation_pb2.StepResult(
+        observation=array_to_tensor(observation),
+        reward=float(reward),
+        done=bool(done),
+        current_score=current_score,
+        info=json.dumps(info, default=str),
+    )
+
+
+def step_result_to_feedback(step_result):
+    """StepResult message to gym step feedback (observation, reward, done, info)"""
+    return (
+        tensor_to_array(step_result.observation),
+        step_result.reward,
+        step_result.done,
+        json.loads(step_result.info or "{}"),
+    )
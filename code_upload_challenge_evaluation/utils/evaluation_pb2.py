@@ -1,12 +1,10 @@
 # -*- coding: utf-8 -*-
 # Generated by the protocol buffer compiler.  DO NOT EDIT!
 # source: evaluation.proto
-
-import sys
-_b=sys.version_info[0]<3 and (lambda x:x) or (lambda x:x.encode('latin1'))
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
 from google.protobuf import descriptor as _descriptor
-from google.protobuf import message as _message
-from google.protobuf import reflection as _reflection
+from google.protobuf import descriptor_pool as _descriptor_pool
 from google.protobuf import symbol_database as _symbol_database
 # @@protoc_insertion_point(imports)
 
@@ -15,89 +13,43 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor.FileDescriptor(
-  name='evaluation.proto',
-  package='evaluation',
-  syntax='proto3',
-  serialized_options=None,
-  serialized_pb=_b('\n\x10\x65valuation.proto\x12\nevaluation\"#\n\x07Package\x12\x18\n\x10SerializedEntity\x18\x01 \x01(\x0c\x32\x8f\x01\n\x0b\x45nvironment\x12>\n\x10get_action_space\x12\x13.evaluation.Package\x1a\x13.evaluation.Package\"\x00\x12@\n\x12\x61\x63t_on_environment\x12\x13.evaluation.Package\x1a\x13.evaluation.Package\"\x00\x62\x06proto3')
-)
-
-
-
-
-_PACKAGE = _descriptor.Descriptor(
-  name='Package',
-  full_name='evaluation.Package',
-  filename=None,
-  file=DESCRIPTOR,
-  containing_type=None,
-  fields=[
-    _descriptor.FieldDescriptor(
-      name='SerializedEntity', full_name='evaluation.Package.SerializedEntity', index=0,
-      number=1, type=12, cpp_type=9, label=1,
-      has_default_value=False, default_value=_b(""),
-      message_type=None, enum_type=None, containing_type=None,
-      is_extension=False, extension_scope=None,
-      serialized_options=None, file=DESCRIPTOR),
-  ],
-  extensions=[
-  ],
-  nested_types=[],
-  enum_types=[
-  ],
-  serialized_options=None,
-  is_extendable=False,
-  syntax='proto3',
-  extension_ranges=[],
-  oneofs=[
-  ],
-  serialized_start=32,
-  serialized_end=67,
-)
-
-DESCRIPTOR.message_types_by_name['Package'] = _PACKAGE
-_sym_db.RegisterFileDescriptor(DESCRIPTOR)
-
-Package = _reflection.GeneratedProtocolMessageType('Package', (_message.Message,), {
-  'DESCRIPTOR' : _PACKAGE,
-  '__module__' : 'evaluation_pb2'
-  # @@protoc_insertion_point(class_scope:evaluation.Package)
-  })
-_sym_db.RegisterMessage(Package)
-
-
-
-_ENVIRONMENT = _descriptor.ServiceDescriptor(
-  name='Environment',
-  full_name='evaluation.Environment',
-  file=DESCRIPTOR,
-  index=0,
-  serialized_options=None,
-  serialized_start=70,
-  serialized_end=213,
-  methods=[
-  _descriptor.MethodDescriptor(
-    name='get_action_space',
-    full_name='evaluation.Environment.get_action_space',
-    index=0,
-    containing_service=None,
-    input_type=_PACKAGE,
-    output_type=_PACKAGE,
-    serialized_options=None,
-  ),
-  _descriptor.MethodDescriptor(
-    name='act_on_environment',
-    full_name='evaluation.Environment.act_on_environment',
-    index=1,
-    containing_service=None,
-    input_type=_PACKAGE,
-    output_type=_PACKAGE,
-    serialized_options=None,
-  ),
-])
-_sym_db.RegisterServiceDescriptor(_ENVIRONMENT)
-
-DESCRIPTOR.services_by_name['Environment'] = _ENVIRONMENT
-
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x10\x65valuation.proto\x12\nevaluation\"#\n\x07Package\x12\x18\n\x10SerializedEntity\x18\x01 \x01(\x0c\"\x07\n\x05\x45mpty\"4\n\x06Tensor\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12\r\n\x05shape\x18\x02 \x03(\x03\x12\r\n\x05\x64type\x18\x03 \x01(\t\"\x1e\n\x0b\x41\x63tionSpace\x12\x0f\n\x07\x61\x63tions\x18\x01 \x03(\x03\"O\n\x06\x41\x63tion\x12\x12\n\x08\x64iscrete\x18\x01 \x01(\x03H\x00\x12(\n\ncontinuous\x18\x02 \x01(\x0b\x32\x12.evaluation.TensorH\x00\x42\x07\n\x05value\"2\n\x0b\x41\x63tionBatch\x12#\n\x07\x61\x63tions\x18\x01 \x03(\x0b\x32\x12.evaluation.Action\"x\n\nStepResult\x12\'\n\x0bobservation\x18\x01 \x01(\x0b\x32\x12.evaluation.Tensor\x12\x0e\n\x06reward\x18\x02 \x01(\x01\x12\x0c\n\x04\x64one\x18\x03 \x01(\x08\x12\x15\n\rcurrent_score\x18\x04 \x01(\x03\x12\x0c\n\x04info\x18\x05 \x01(\t\":\n\x0fStepResultBatch\x12\'\n\x07results\x18\x01 \x03(\x0b\x32\x16.evaluation.StepResult\"4\n\x0eSessionRequest\x12\x10\n\x08num_envs\x18\x01 \x01(\x05\x12\x10\n\x08\x65pisodes\x18\x02 \x01(\x05\"/\n\x07Session\x12\x12\n\nsession_id\x18\x01 \x01(\t\x12\x10\n\x08num_envs\x18\x02 \x01(\x05\"I\n\x0eSessionActions\x12\x12\n\nsession_id\x18\x01 \x01(\t\x12#\n\x07\x61\x63tions\x18\x02 \x03(\x0b\x32\x12.evaluation.Action\"T\n\rSessionScores\x12\x16\n\x0e\x65pisode_scores\x18\x01 \x03(\x01\x12\x0c\n\x04mean\x18\x02 \x01(\x01\x12\x0b\n\x03std\x18\x03 \x01(\x01\x12\x10\n\x08\x63omplete\x18\x04 \x01(\x08\"_\n\x0f\x45valuateRequest\x12\x0e\n\x04path\x18\x01 \x01(\tH\x00\x12\x0e\n\x04\x64\x61ta\x18\x02 \x01(\x0cH\x00\x12\r\n\x05phase\x18\x03 \x01(\t\x12\x0f\n\x07options\x18\x04 \x01(\tB\x0c\n\nsubmission\"v\n\x10\x45valuateResponse\x12\x0e\n\x06output\x18\x01 \x01(\t\x12\r\n\x05\x65rror\x18\x02 \x01(\t\x12\x15\n\rqueue_seconds\x18\x03 \x01(\x01\x12\x15\n\rscore_seconds\x18\x04 \x01(\x01\x12\x15\n\rtotal_seconds\x18\x05 \x01(\x01\x32\xd1\x04\n\x0b\x45nvironment\x12>\n\x10get_action_space\x12\x13.evaluation.Package\x1a\x13.evaluation.Package\"\x00\x12@\n\x12\x61\x63t_on_environment\x12\x13.evaluation.Package\x1a\x13.evaluation.Package\"\x00\x12>\n\x0eGetActionSpace\x12\x11.evaluation.Empty\x1a\x17.evaluation.ActionSpace\"\x00\x12\x34\n\x04Step\x12\x12.evaluation.Action\x1a\x16.evaluation.StepResult\"\x00\x12\x37\n\x03\x41\x63t\x12\x12.evaluation.Action\x1a\x16.evaluation.StepResult\"\x00(\x01\x30\x01\x12\x41\n\x07\x41\x63tMany\x12\x17.evaluation.ActionBatch\x1a\x1b.evaluation.StepResultBatch\"\x00\x12\x42\n\rCreateSession\x12\x1a.evaluation.SessionRequest\x1a\x13.evaluation.Session\"\x00\x12H\n\x0bStepSession\x12\x1a.evaluation.SessionActions\x1a\x1b.evaluation.StepResultBatch\"\x00\x12@\n\x0c\x43loseSession\x12\x13.evaluation.Session\x1a\x19.evaluation.SessionScores\"\x00\x32T\n\tEvaluator\x12G\n\x08\x45valuate\x12\x1b.evaluation.EvaluateRequest\x1a\x1c.evaluation.EvaluateResponse\"\x00\x62\x06proto3')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'evaluation_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _PACKAGE._serialized_start=32
+  _PACKAGE._serialized_end=67
+  _EMPTY._serialized_start=69
+  _EMPTY._serialized_end=76
+  _TENSOR._serialized_start=78
+  _TENSOR._serialized_end=130
+  _ACTIONSPACE._serialized_start=132
+  _ACTIONSPACE._serialized_end=162
+  _ACTION._serialized_start=164
+  _ACTION._serialized_end=243
+  _ACTIONBATCH._serialized_start=245
+  _ACTIONBATCH._serialized_end=295
+  _STEPRESULT._serialized_start=297
+  _STEPRESULT._serialized_end=417
+  _STEPRESULTBATCH._serialized_start=419
+  _STEPRESULTBATCH._serialized_end=477
+  _SESSIONREQUEST._serialized_start=479
+  _SESSIONREQUEST._serialized_end=531
+  _SESSION._serialized_start=533
+  _SESSION._serialized_end=580
+  _SESSIONACTIONS._serialized_start=582
+  _SESSIONACTIONS._serialized_end=655
+  _SESSIONSCORES._serialized_start=657
+  _SESSIONSCORES._serialized_end=741
+  _EVALUATEREQUEST._serialized_start=743
+  _EVALUATEREQUEST._serialized_end=838
+  _EVALUATERESPONSE._serialized_start=840
+  _EVALUATERESPONSE._serialized_end=958
+  _ENVIRONMENT._serialized_start=961
+  _ENVIRONMENT._serialized_end=1554
+  _EVALUATOR._serialized_start=1556
+  _EVALUATOR._serialized_end=1640
 # @@protoc_insertion_point(module_scope)
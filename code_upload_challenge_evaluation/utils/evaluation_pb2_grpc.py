@@ -1,63 +1,401 @@
 # Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
+"""Client and server classes corresponding to protobuf-defined services."""
 import grpc
 
 import evaluation_pb2 as evaluation__pb2
 
 
 class EnvironmentStub(object):
-  # missing associated documentation comment in .proto file
-  pass
+    """Missing associated documentation comment in .proto file."""
 
-  def __init__(self, channel):
-    """Constructor.
+    def __init__(self, channel):
+        """Constructor.
 
-    Args:
-      channel: A grpc.Channel.
-    """
-    self.get_action_space = channel.unary_unary(
-        '/evaluation.Environment/get_action_space',
-        request_serializer=evaluation__pb2.Package.SerializeToString,
-        response_deserializer=evaluation__pb2.Package.FromString,
-        )
-    self.act_on_environment = channel.unary_unary(
-        '/evaluation.Environment/act_on_environment',
-        request_serializer=evaluation__pb2.Package.SerializeToString,
-        response_deserializer=evaluation__pb2.Package.FromString,
-        )
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.get_action_space = channel.unary_unary(
+                '/evaluation.Environment/get_action_space',
+                request_serializer=evaluation__pb2.Package.SerializeToString,
+                response_deserializer=evaluation__pb2.Package.FromString,
+                )
+        self.act_on_environment = channel.unary_unary(
+                '/evaluation.Environment/act_on_environment',
+                request_serializer=evaluation__pb2.Package.SerializeToString,
+                response_deserializer=evaluation__pb2.Package.FromString,
+                )
+        self.GetActionSpace = channel.unary_unary(
+                '/evaluation.Environment/GetActionSpace',
+                request_serializer=evaluation__pb2.Empty.SerializeToString,
+                response_deserializer=evaluation__pb2.ActionSpace.FromString,
+                )
+        self.Step = channel.unary_unary(
+                '/evaluation.Environment/Step',
+                request_serializer=evaluation__pb2.Action.SerializeToString,
+                response_deserializer=evaluation__pb2.StepResult.FromString,
+                )
+        self.Act = channel.stream_stream(
+                '/evaluation.Environment/Act',
+                request_serializer=evaluation__pb2.Action.SerializeToString,
+                response_deserializer=evaluation__pb2.StepResult.FromString,
+                )
+        self.ActMany = channel.unary_unary(
+                '/evaluation.Environment/ActMany',
+                request_serializer=evaluation__pb2.ActionBatch.SerializeToString,
+                response_deserializer=evaluation__pb2.StepResultBatch.FromString,
+                )
+        self.CreateSession = channel.unary_unary(
+                '/evaluation.Environment/CreateSession',
+                request_serializer=evaluation__pb2.SessionRequest.SerializeToString,
+                response_deserializer=evaluation__pb2.Session.FromString,
+                )
+        self.StepSession = channel.unary_unary(
+                '/evaluation.Environment/StepSession',
+                request_serializer=evaluation__pb2.SessionActions.SerializeToString,
+                response_deserializer=evaluation__pb2.StepResultBatch.FromString,
+                )
+        self.CloseSession = channel.unary_unary(
+                '/evaluation.Environment/CloseSession',
+                request_serializer=evaluation__pb2.Session.SerializeToString,
+                response_deserializer=evaluation__pb2.SessionScores.FromString,
+                )
 
 
 class EnvironmentServicer(object):
-  # missing associated documentation comment in .proto file
-  pass
+    """Missing associated documentation comment in .proto file."""
+
+    def get_action_space(self, request, context):
+        """pickled entities of the original protocol, not served by the environment: unpickling agent bytes runs
+        arbitrary code. Kept for benchmark_protocol.py, agents use the typed RPCs below
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def act_on_environment(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetActionSpace(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Step(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
 
-  def get_action_space(self, request, context):
-    # missing associated documentation comment in .proto file
-    pass
-    context.set_code(grpc.StatusCode.UNIMPLEMENTED)
-    context.set_details('Method not implemented!')
-    raise NotImplementedError('Method not implemented!')
+    def Act(self, request_iterator, context):
+        """several steps per round trip: a bidirectional stream of steps, or a batch of steps applied in order
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
 
-  def act_on_environment(self, request, context):
-    # missing associated documentation comment in .proto file
-    pass
-    context.set_code(grpc.StatusCode.UNIMPLEMENTED)
-    context.set_details('Method not implemented!')
-    raise NotImplementedError('Method not implemented!')
+    def ActMany(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def CreateSession(self, request, context):
+        """sessions of num_envs independent environments stepped together, one action per environment and call
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def StepSession(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def CloseSession(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
 
 
 def add_EnvironmentServicer_to_server(servicer, server):
-  rpc_method_handlers = {
-      'get_action_space': grpc.unary_unary_rpc_method_handler(
-          servicer.get_action_space,
-          request_deserializer=evaluation__pb2.Package.FromString,
-          response_serializer=evaluation__pb2.Package.SerializeToString,
-      ),
-      'act_on_environment': grpc.unary_unary_rpc_method_handler(
-          servicer.act_on_environment,
-          request_deserializer=evaluation__pb2.Package.FromString,
-          response_serializer=evaluation__pb2.Package.SerializeToString,
-      ),
-  }
-  generic_handler = grpc.method_handlers_generic_handler(
-      'evaluation.Environment', rpc_method_handlers)
-  server.add_generic_rpc_handlers((generic_handler,))
+    rpc_method_handlers = {
+            'get_action_space': grpc.unary_unary_rpc_method_handler(
+                    servicer.get_action_space,
+                    request_deserializer=evaluation__pb2.Package.FromString,
+                    response_serializer=evaluation__pb2.Package.SerializeToString,
+            ),
+            'act_on_environment': grpc.unary_unary_rpc_method_handler(
+                    servicer.act_on_environment,
+                    request_deserializer=evaluation__pb2.Package.FromString,
+                    response_serializer=evaluation__pb2.Package.SerializeToString,
+            ),
+            'GetActionSpace': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetActionSpace,
+                    request_deserializer=evaluation__pb2.Empty.FromString,
+                    response_serializer=evaluation__pb2.ActionSpace.SerializeToString,
+            ),
+            'Step': grpc.unary_unary_rpc_method_handler(
+                    servicer.Step,
+                    request_deserializer=evaluation__pb2.Action.FromString,
+                    response_serializer=evaluation__pb2.StepResult.SerializeToString,
+            ),
+            'Act': grpc.stream_stream_rpc_method_handler(
+                    servicer.Act,
+                    request_deserializer=evaluation__pb2.Action.FromString,
+                    response_serializer=evaluation__pb2.StepResult.SerializeToString,
+            ),
+            'ActMany': grpc.unary_unary_rpc_method_handler(
+                    servicer.ActMany,
+                    request_deserializer=evaluation__pb2.ActionBatch.FromString,
+                    response_serializer=evaluation__pb2.StepResultBatch.SerializeToString,
+            ),
+            'CreateSession': grpc.unary_unary_rpc_method_handler(
+                    servicer.CreateSession,
+                    request_deserializer=evaluation__pb2.SessionRequest.FromString,
+                    response_serializer=evaluation__pb2.Session.SerializeToString,
+            ),
+            'StepSession': grpc.unary_unary_rpc_method_handler(
+                    servicer.StepSession,
+                    request_deserializer=evaluation__pb2.SessionActions.FromString,
+                    response_serializer=evaluation__pb2.StepResultBatch.SerializeToString,
+            ),
+            'CloseSession': grpc.unary_unary_rpc_method_handler(
+                    servicer.CloseSession,
+                    request_deserializer=evaluation__pb2.Session.FromString,
+                    response_serializer=evaluation__pb2.SessionScores.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'evaluation.Environment', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+
+
+ # This class is part of an EXPERIMENTAL API.
+class Environment(object):
+    """Missing associated documentation comment in .proto file."""
+
+    @staticmethod
+    def get_action_space(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/evaluation.Environment/get_action_space',
+            evaluation__pb2.Package.SerializeToString,
+            evaluation__pb2.Package.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def act_on_environment(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/evaluation.Environment/act_on_environment',
+            evaluation__pb2.Package.SerializeToString,
+            evaluation__pb2.Package.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def GetActionSpace(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/evaluation.Environment/GetActionSpace',
+            evaluation__pb2.Empty.SerializeToString,
+            evaluation__pb2.ActionSpace.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def Step(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/evaluation.Environment/Step',
+            evaluation__pb2.Action.SerializeToString,
+            evaluation__pb2.StepResult.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def Act(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(request_iterator, target, '/evaluation.Environment/Act',
+            evaluation__pb2.Action.SerializeToString,
+            evaluation__pb2.StepResult.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def ActMany(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/evaluation.Environment/ActMany',
+            evaluation__pb2.ActionBatch.SerializeToString,
+            evaluation__pb2.StepResultBatch.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def CreateSession(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/evaluation.Environment/CreateSession',
+            evaluation__pb2.SessionRequest.SerializeToString,
+            evaluation__pb2.Session.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def StepSession(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/evaluation.Environment/StepSession',
+            evaluation__pb2.SessionActions.SerializeToString,
+            evaluation__pb2.StepResultBatch.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def CloseSession(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/evaluation.Environment/CloseSession',
+            evaluation__pb2.Session.SerializeToString,
+            evaluation__pb2.SessionScores.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+
+class EvaluatorStub(object):
+    """scores submissions with the repository's evaluation_script against test annotations loaded once per phase,
+    see evaluator/evaluator.py
+    """
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.Evaluate = channel.unary_unary(
+                '/evaluation.Evaluator/Evaluate',
+                request_serializer=evaluation__pb2.EvaluateRequest.SerializeToString,
+                response_deserializer=evaluation__pb2.EvaluateResponse.FromString,
+                )
+
+
+class EvaluatorServicer(object):
+    """scores submissions with the repository's evaluation_script against test annotations loaded once per phase,
+    see evaluator/evaluator.py
+    """
+
+    def Evaluate(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_EvaluatorServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'Evaluate': grpc.unary_unary_rpc_method_handler(
+                    servicer.Evaluate,
+                    request_deserializer=evaluation__pb2.EvaluateRequest.FromString,
+                    response_serializer=evaluation__pb2.EvaluateResponse.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'evaluation.Evaluator', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+
+
+ # This class is part of an EXPERIMENTAL API.
+class Evaluator(object):
+    """scores submissions with the repository's evaluation_script against test annotations loaded once per phase,
+    see evaluator/evaluator.py
+    """
+
+    @staticmethod
+    def Evaluate(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/evaluation.Evaluator/Evaluate',
+            evaluation__pb2.EvaluateRequest.SerializeToString,
+            evaluation__pb2.EvaluateResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
@@ -40,4 +40,4 @@ install_local_package("package_folder_name")
 
 """
 
-from .main import evaluate
+from .main import GroundTruth, evaluate, evaluate_arrays, evaluate_many
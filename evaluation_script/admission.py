@@ -0,0 +1,88 @@
+import os
+import tarfile
+import zipfile
+from pathlib import Path
+
+
+# default complexity limits of a submission, see Admission
+__MAX_FRAME_BOXES__ = 20000
+__MAX_TOTAL_BOXES__ = 20000000
+
+__ADMISSION_POLICIES__ = ('truncate', 'reject')
+
+
+class AdmissionError(Exception):
+    pass
+
+
+class Admission:
+    """
+    Cheap complexity limits checked before scoring, from the box counts of the submission frames: the zip directory
+    and the tar member headers hold each frame's uncompressed size, so nothing is extracted. The box count of a frame
+    is its size over the box record size. Other archive formats can not be counted and are rejected.
+    A frame over max_frame_boxes is cut to its first max_frame_boxes boxes (policy 'truncate', boxes carry no score to
+    rank them by) or the submission is rejected (policy 'reject'). A submission over max_total_boxes in the scored
+    frames is always rejected. Rejection raises AdmissionError with the reason.
+    """
+    def __init__(self, record_size: int, max_frame_boxes: int = __MAX_FRAME_BOXES__,
+                 max_total_boxes: int = __MAX_TOTAL_BOXES__, policy: str = 'truncate'):
+        if policy not in __ADMISSION_POLICIES__:
+            raise ValueError(f"unknown admission policy '{policy}', expected one of {__ADMISSION_POLICIES__}")
+        self.record_size = record_size
+        self.max_frame_boxes = max_frame_boxes
+        self.max_total_boxes = max_total_boxes
+        self.policy = policy
+
+    def box_counts(self, user_submission_file: str or Path, frame_names):
+        """ box count of each of frame_names found in the submission zip directory or tar members, None when it is
+        neither a zip nor a tar.
+        """
+        if zipfile.is_zipfile(user_submission_file):
+            with zipfile.ZipFile(user_submission_file) as zf:
+                sizes = {info.filename: info.file_size for info in zf.infolist()}
+        elif tarfile.is_tarfile(str(user_submission_file)):
+            # a compressed tar is decompressed once to read the headers, nothing is extracted
+            with tarfile.open(str(user_submission_file)) as tf:
+                members = {os.path.normpath(member.name): member for member in tf.getmembers()}
+            for name in frame_names:
+                if name in members and not members[name].isfile():
+                    # a link or device could point the extracted frame at any file
+                    raise AdmissionError(f"submission rejected: frame '{name}' is not a regular file")
+            sizes = {name: member.size for name, member in members.items()}
+        else:
+            return None
+        return {name: sizes[name] // self.record_size for name in frame_names if name in sizes}
+
+    def check(self, user_submission_file: str or Path, frame_names):
+        """ {frame name: boxes to read} of the truncated frames, raises AdmissionError when the submission is rejected.
+        """
+        counts = self.box_counts(user_submission_file, frame_names)
+        if counts is None:
+            raise AdmissionError(
+                f"submission rejected: '{Path(user_submission_file).name}' is not a zip or tar archive, "
+                f"its box counts can not be checked"
+            )
+        return self.check_counts(counts)
+
+    def check_counts(self, counts: dict):
+        """ check() of known {frame name: box count}.
+        """
+        total = sum(counts.values())
+        print(f'admission: {total} boxes in {len(counts)} frames, largest frame {max(counts.values(), default=0)} boxes')
+        if self.max_total_boxes is not None and total > self.max_total_boxes:
+            raise AdmissionError(f'submission rejected: {total} boxes, over the {self.max_total_boxes} boxes limit')
+
+        limits = {}
+        if self.max_frame_boxes is not None:
+            for name, count in counts.items():
+                if count <= self.max_frame_boxes:
+                    continue
+                if self.policy == 'reject':
+                    raise AdmissionError(
+                        f"submission rejected: frame '{name}' has {count} boxes, "
+                        f"over the {self.max_frame_boxes} boxes per frame limit"
+                    )
+                print(f"admission: frame '{name}' has {count} boxes, over the {self.max_frame_boxes} boxes per frame "
+                      f"limit, scoring its first {self.max_frame_boxes}")
+                limits[name] = self.max_frame_boxes
+        return limits
@@ -0,0 +1,56 @@
+"""
+Frame level bootstrap confidence intervals of the average iou metrics, from the per frame partial sums of a scored
+submission (budget.FrameLog records), without re-running any matching.
+A replicate resamples the frames with replacement: its frame counts are a row of a weight matrix, and
+the iou sums and box counts of all replicates are one matrix product of it with the per frame sums.
+"""
+import numpy as np
+
+
+# the per frame columns a replicate sums
+__SUM_FIELDS__ = ('gt', 'det', 'gt_xy_iou_sum', 'det_xy_iou_sum')
+
+# weight matrix entries resampled at once, replicates are drawn in chunks of at most this many entries
+__CHUNK_ENTRIES__ = 2 ** 22
+
+
+def bootstrap_sums(records: np.array, replicates: int = 1000, seed: int = 0):
+    """ (replicates, 4) resampled sums of the __SUM_FIELDS__ columns of records.
+    """
+    n = len(records)
+    columns = np.stack([records[field].astype(float) for field in __SUM_FIELDS__], axis=1)
+    rng = np.random.default_rng(seed)
+    chunk = max(__CHUNK_ENTRIES__ // max(n, 1), 1)
+    sums = np.empty((replicates, len(__SUM_FIELDS__)), dtype=float)
+    for start in range(0, replicates, chunk):
+        stop = min(start + chunk, replicates)
+        # frame counts of each replicate row: bincount of the resampled frame indices offset by row
+        picks = rng.integers(0, n, (stop - start, n), dtype=np.uint32) + (np.arange(stop - start) * n)[:, None]
+        weights = np.bincount(picks.ravel(), minlength=(stop - start) * n).reshape(stop - start, n)
+        sums[start:stop] = weights.astype(float) @ columns
+    return sums
+
+
+def bootstrap_intervals(records: np.array, replicates: int = 1000, confidence: float = 0.95, seed: int = 0,
+                        names=None):
+    """ {metric name: (low, high)} percentile intervals of AVG_XY_IOU, AVG_GT_VS_DET_XY_IOU and AVG_DET_VS_GT_XY_IOU,
+    empty with less than 2 frames. With the frame names of records, records are resampled in name order, so the
+    intervals of a seed do not depend on the order frames were scored in (see progress.stratified_order).
+    """
+    if len(records) < 2 or not replicates:
+        return {}
+    if names is not None:
+        records = records[np.argsort(np.asarray(names), kind='stable')]
+    gt, det, gt_sum, det_sum = bootstrap_sums(records, replicates, seed).T
+    # a replicate without det (or gt) boxes averages to 0, like metrics.AverageIoU
+    avg_gt = np.divide(gt_sum, gt, out=np.zeros(replicates), where=gt > 0)
+    avg_det = np.divide(det_sum, det, out=np.zeros(replicates), where=det > 0)
+    tails = 100 * np.array([(1 - confidence) / 2, (1 + confidence) / 2])
+    return {
+        name: tuple(np.percentile(values, tails))
+        for name, values in (
+            ('AVG_XY_IOU', 0.5 * avg_gt + 0.5 * avg_det),
+            ('AVG_GT_VS_DET_XY_IOU', avg_gt),
+            ('AVG_DET_VS_GT_XY_IOU', avg_det),
+        )
+    }
@@ -0,0 +1,104 @@
+import os
+from pathlib import Path
+
+import numpy as np
+
+
+# rough resident size of one indexed box: geometry table, shapely polygon and grid entries
+__BYTES_PER_BOX__ = 1024
+
+# smallest per worker frame budget, below it workers are dropped instead of shrinking tiles further
+__MIN_FRAME_BYTES__ = 64 * 2 ** 20
+
+# float64 gt tile x det matrices alive at once: xy intersection, one iou matrix per iou kind and reduction temporaries
+__TILE_MATRICES__ = 3
+
+
+def tile_rows(frame_bytes: int, n_det: int, n_kinds: int = 1):
+    """ gt rows per tile so the tile matrices of a frame with n_det det boxes stay within frame_bytes, at least 1.
+    """
+    row_bytes = max(n_det, 1) * np.dtype(float).itemsize * (__TILE_MATRICES__ + n_kinds)
+    return max(int(frame_bytes // row_bytes), 1)
+
+
+def plan_workers(memory_budget: int, gt_boxes: int, requested: int = None):
+    """ (workers, frame_bytes) for a total memory_budget in bytes: each worker holds its own gt copy
+    (gt_boxes * __BYTES_PER_BOX__) and frame_bytes for the tiles of the frame it scores.
+    Workers are dropped until each gets __MIN_FRAME_BYTES__, a single worker gets at least that much.
+    """
+    requested = requested or os.cpu_count() or 1
+    gt_bytes = gt_boxes * __BYTES_PER_BOX__
+    workers = requested
+    while workers > 1 and (memory_budget - workers * gt_bytes) // workers < __MIN_FRAME_BYTES__:
+        workers -= 1
+    frame_bytes = max((memory_budget - workers * gt_bytes) // workers, __MIN_FRAME_BYTES__)
+    if workers < requested:
+        print(f"memory budget: throttling to {workers} of {requested} workers, "
+              f"{gt_bytes / 2 ** 20:.0f} MiB gt and {frame_bytes / 2 ** 20:.0f} MiB tiles per worker")
+    if memory_budget < gt_bytes + __MIN_FRAME_BYTES__:
+        print(f"memory budget: {memory_budget / 2 ** 20:.0f} MiB is below the "
+              f"{(gt_bytes + __MIN_FRAME_BYTES__) / 2 ** 20:.0f} MiB a single worker needs, running over budget")
+    return workers, frame_bytes
+
+
+# per frame partial results of a submission, see FrameLog
+__FRAME_RECORD_DTYPE__ = np.dtype([
+    ('gt', np.int64),
+    ('det', np.int64),
+    ('gt_xy_iou_sum', np.float64),
+    ('det_xy_iou_sum', np.float64),
+    # digests of the scored gt and det box bytes, see manifest.digest
+    ('gt_digest', 'S16'),
+    ('det_digest', 'S16'),
+])
+
+
+class FrameLog:
+    """
+    Per frame partial results (__FRAME_RECORD_DTYPE__) in gt frame order. Kept in memory, or with spill_file
+    appended to a np.memmap on disk that grows in chunks of chunk_frames records, so memory stays flat however many
+    frames a split has.
+    """
+    def __init__(self, spill_file: str or Path = None, chunk_frames: int = 4096):
+        self.spill_file = Path(spill_file) if spill_file is not None else None
+        self.chunk_frames = chunk_frames
+        self.size = 0
+        self._records = self._allocate(chunk_frames)
+
+    def _allocate(self, capacity: int):
+        if self.spill_file is None:
+            records = np.zeros(capacity, dtype=__FRAME_RECORD_DTYPE__)
+            if self.size:
+                records[:self.size] = self._records[:self.size]
+            return records
+        if self.size:
+            self._records.flush()
+            del self._records
+        with open(self.spill_file, 'ab') as f:
+            f.truncate(capacity * __FRAME_RECORD_DTYPE__.itemsize)
+        return np.memmap(self.spill_file, dtype=__FRAME_RECORD_DTYPE__, mode='r+', shape=(capacity,))
+
+    def append(self, gt: int, det: int, gt_xy_iou_sum: float, det_xy_iou_sum: float, gt_digest: bytes = b'',
+               det_digest: bytes = b''):
+        if self.size == len(self._records):
+            self._records = self._allocate(self.size + self.chunk_frames)
+        self._records[self.size] = (gt, det, gt_xy_iou_sum, det_xy_iou_sum, gt_digest, det_digest)
+        self.size += 1
+
+    def extend(self, records: np.array):
+        if self.size + len(records) > len(self._records):
+            self._records = self._allocate(self.size + len(records) + self.chunk_frames)
+        self._records[self.size:self.size + len(records)] = records
+        self.size += len(records)
+
+    @property
+    def records(self):
+        return self._records[:self.size]
+
+    def close(self):
+        if self.spill_file is not None:
+            del self._records
+            self._records = np.zeros(0, dtype=__FRAME_RECORD_DTYPE__)
+            self.size = 0
+            if self.spill_file.exists():
+                self.spill_file.unlink()
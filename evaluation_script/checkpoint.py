@@ -0,0 +1,60 @@
+"""
+Crash safe, resumable scoring: the accumulated state of a scoring run (metric accumulators, per frame records and
+the frames done so far) is periodically written to a journal file keyed by the submission, gt and scoring config
+digests. A run restarted with the same inputs resumes after the last journaled frame instead of starting over.
+"""
+import json
+import os
+import pickle
+import time
+from pathlib import Path
+
+from .manifest import digest
+
+
+class Journal:
+    """
+    Journal of one scoring run in checkpoint_dir, named by the digest of key (json serializable: submission and gt
+    digests and the options that change results), so other inputs or options never resume from it.
+    save() is due every interval_seconds and replaces the file atomically, a crash mid save keeps the previous one.
+    """
+    def __init__(self, checkpoint_dir: str or Path, key: dict, interval_seconds: float = 60.0):
+        self.key = json.loads(json.dumps(key, sort_keys=True, default=str))
+        name = digest(json.dumps(self.key, sort_keys=True).encode()).hex()
+        self.path = Path(checkpoint_dir) / f'{name}.journal'
+        self.interval_seconds = interval_seconds
+        self.last_save = time.time()
+
+    def load(self):
+        """ the journaled state, None without a usable journal.
+        """
+        if not self.path.exists():
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                journal = pickle.load(f)
+        except Exception as ex:
+            print(f"checkpoint: ignoring unreadable journal '{self.path}'. Exception: {ex!r}")
+            return None
+        if journal.get('key') != self.key:
+            print(f"checkpoint: ignoring journal '{self.path}' of other inputs")
+            return None
+        return journal['state']
+
+    def due(self):
+        return time.time() - self.last_save >= self.interval_seconds
+
+    def save(self, state: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        with open(tmp, 'wb') as f:
+            pickle.dump({'key': self.key, 'state': state}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self.last_save = time.time()
+
+    def remove(self):
+        for path in (self.path, self.path.with_suffix('.tmp')):
+            if path.exists():
+                path.unlink()
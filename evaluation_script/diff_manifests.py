@@ -0,0 +1,31 @@
+"""
+Prints the frames, inputs and metadata that differ between two result manifests (see manifest.py).
+
+usage: python -m evaluation_script.diff_manifests a.manifest b.manifest [--atol 1e-9]
+"""
+import argparse
+
+from .manifest import diff_manifests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('a')
+    parser.add_argument('b')
+    parser.add_argument('--atol', type=float, default=0.0)
+    args = parser.parse_args()
+
+    diff = diff_manifests(args.a, args.b, args.atol)
+    for key, (a, b) in diff['metadata'].items():
+        print(f'metadata {key}: {a} -> {b}')
+    if diff['only_a']:
+        print(f"frames only in a: {diff['only_a']}")
+    if diff['only_b']:
+        print(f"frames only in b: {diff['only_b']}")
+    for name, fields in diff['frames'].items():
+        print(f"frame '{name}': " + ', '.join(f'{field} {a} -> {b}' for field, (a, b) in fields.items()))
+    print(f"{len(diff['frames'])} frames differ")
+
+
+if __name__ == '__main__':
+    main()
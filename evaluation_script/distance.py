@@ -0,0 +1,69 @@
+"""
+Bird's eye view center distance matching: the nearest box center of each box within a distance bound, found with a
+scipy cKDTree when scipy is installed, else with a numpy uniform grid of bound sized cells (only the 3 x 3 cells
+around a center can hold a center within the bound).
+"""
+import numpy as np
+
+
+# center distance thresholds (meters) of the distance match metrics, see metrics.CenterMatchRate
+__CENTER_DISTANCES__ = (0.5, 1.0, 2.0, 4.0)
+
+
+def _nearest_kdtree(query: np.array, ref: np.array, max_distance: float):
+    from scipy.spatial import cKDTree
+    # the query bound is exclusive, centers at exactly max_distance are matched like the grid does
+    distance, arg = cKDTree(ref).query(query, k=1, distance_upper_bound=np.nextafter(max_distance, np.inf))
+    found = distance <= max_distance
+    return np.where(found, distance, np.inf), np.where(found, arg, -1)
+
+
+def _nearest_grid(query: np.array, ref: np.array, max_distance: float):
+    origin = ref.min(axis=0) - max_distance
+    offsets = np.indices((3, 3)).reshape(2, -1).T - 1
+    ref_cells = np.floor((ref - origin) / max_distance)
+    query_cells = np.floor((query - origin) / max_distance)
+    # cells are keyed by their rank among the ref cells and the 3 x 3 neighbourhoods of the query cells, so far apart
+    # centers never overflow a linear cell key
+    neighbour_cells = (query_cells[None, :, :] + offsets[:, None, :]).reshape(-1, 2)
+    _, keys = np.unique(np.concatenate([ref_cells, neighbour_cells]), axis=0, return_inverse=True)
+    keys = keys.reshape(-1)
+    ref_keys, neighbour_keys = keys[:len(ref)], keys[len(ref):].reshape(len(offsets), len(query))
+    order = np.argsort(ref_keys, kind='stable')
+    ref_keys = ref_keys[order]
+
+    distance = np.full(len(query), np.inf)
+    arg = np.full(len(query), -1)
+    for keys in neighbour_keys:
+        starts = np.searchsorted(ref_keys, keys, side='left')
+        counts = np.searchsorted(ref_keys, keys, side='right') - starts
+        found = np.flatnonzero(counts)
+        if not len(found):
+            continue
+        # the candidates of each query are a contiguous run, in ref index order within the cell
+        heads = np.cumsum(counts) - counts
+        entries = np.arange(counts.sum()) - np.repeat(heads, counts) + np.repeat(starts, counts)
+        cols = order[entries]
+        pair_distance = np.hypot(*(np.repeat(query, counts, axis=0) - ref[cols]).T)
+        cell_best = np.minimum.reduceat(pair_distance, heads[found])
+        # first (lowest ref index) candidate at the cell minimum
+        at_best = pair_distance == np.repeat(cell_best, counts[found])
+        cell_arg = cols[np.minimum.reduceat(np.where(at_best, np.arange(len(cols)), len(cols)), heads[found])]
+        better = (cell_best < distance[found]) | ((cell_best == distance[found]) & (cell_arg < arg[found]))
+        distance[found[better]], arg[found[better]] = cell_best[better], cell_arg[better]
+    beyond = distance > max_distance
+    distance[beyond], arg[beyond] = np.inf, -1
+    return distance, arg
+
+
+def nearest_centers(query: np.array, ref: np.array, max_distance: float = max(__CENTER_DISTANCES__)):
+    """ (distance, arg) of the nearest ref center of each (x, y) query center, inf / -1 when none is within
+    max_distance.
+    """
+    query, ref = np.asarray(query, dtype=float).reshape(-1, 2), np.asarray(ref, dtype=float).reshape(-1, 2)
+    if not len(query) or not len(ref):
+        return np.full(len(query), np.inf), np.full(len(query), -1)
+    try:
+        return _nearest_kdtree(query, ref, max_distance)
+    except ImportError:
+        return _nearest_grid(query, ref, max_distance)
@@ -1,4 +1,5 @@
-from main import evaluate
+# run from the repository root: python -m evaluation_script.ex_evaluation_script
+from .main import evaluate
 
 from pathlib import Path
 
@@ -0,0 +1,181 @@
+import numpy as np
+
+
+# corners of the unit box centered at the origin, same order as shapely.geometry.box(-0.5, -0.5, 0.5, 0.5)
+__UNIT_CORNERS__ = np.array([
+    [0.5, -0.5],
+    [0.5, 0.5],
+    [-0.5, 0.5],
+    [-0.5, -0.5],
+])
+
+# heading units of __GT_BOX_DTYPE__ boxes, by the angle of a full turn
+__ANGLE_PERIODS__ = {
+    'degrees': 360.0,
+    'radians': 2 * np.pi,
+}
+
+# pairs whose relative heading is within this many radians of a multiple of 90 degrees are intersected in closed form
+__ALIGNED_TOLERANCE__ = 1e-9
+
+
+def wrap_angle(angle: np.array, period: float = 360.0):
+    """ wraps angles to [-period / 2, period / 2).
+    """
+    return (angle + period / 2) % period - period / 2
+
+
+class BoxGeometry:
+    """
+    Per-frame geometry table of __GT_BOX_DTYPE__ boxes, computed once in a vectorized pass over the structured array.
+    Holds each box's xy corners, axis aligned bounds, circumradius and area, and the shapely polygons built from the corners.
+    Rotation follows IOUBox.contour: heading is rotated by -heading around the box center, heading is in angle_unit
+    (see __ANGLE_PERIODS__, IOUBox uses degrees) and is wrapped to a single turn.
+    Degenerate boxes (non finite values, zero or negative size) are flagged in valid, they get zero area and never overlap.
+    """
+    def __init__(self, boxes: np.array, angle_unit: str = 'degrees'):
+        if angle_unit not in __ANGLE_PERIODS__:
+            raise ValueError(f"unknown angle unit '{angle_unit}', expected one of {list(__ANGLE_PERIODS__)}")
+        self.boxes = boxes
+        self.angle_unit = angle_unit
+        centers = np.stack([boxes['x'], boxes['y']], axis=-1).astype(float).reshape(-1, 2)
+        sizes = np.stack([boxes['dx'], boxes['dy']], axis=-1).astype(float).reshape(-1, 2)
+        period = __ANGLE_PERIODS__[angle_unit]
+        angle = wrap_angle(-boxes['heading'].astype(float), period) * (2 * np.pi / period)
+
+        self.valid = (
+            np.all(np.isfinite(centers), axis=1) & np.all(np.isfinite(sizes), axis=1)
+            & np.all(sizes > 0, axis=1) & np.isfinite(angle)
+        )
+        # degenerate boxes are collapsed to a point at the origin, so no nan or inf reaches the polygons
+        self.centers = np.where(self.valid[:, None], centers, 0.0)
+        self.sizes = np.where(self.valid[:, None], sizes, 0.0)
+        self.angle = np.where(self.valid, angle, 0.0)
+        sizes = self.sizes
+
+        self.cos, self.sin = np.cos(self.angle), np.sin(self.angle)
+        cos, sin = self.cos, self.sin
+        local = __UNIT_CORNERS__[None, :, :] * sizes[:, None, :]
+        self.corners = np.empty((len(boxes), 4, 2), dtype=float)
+        self.corners[..., 0] = cos[:, None] * local[..., 0] - sin[:, None] * local[..., 1] + self.centers[:, None, 0]
+        self.corners[..., 1] = sin[:, None] * local[..., 0] + cos[:, None] * local[..., 1] + self.centers[:, None, 1]
+
+        self.bounds = np.concatenate([self.corners.min(axis=1), self.corners.max(axis=1)], axis=-1).reshape(-1, 4)
+        self.radius = 0.5 * np.hypot(sizes[:, 0], sizes[:, 1])
+        # float64, consistent with the polygons, so identical boxes have an iou of 1 up to the 1e-9 guard
+        self.area = sizes[:, 0] * sizes[:, 1]
+
+        # vertical extent for 3d iou, boxes without a valid one get zero volume
+        z, dz = boxes['z'].astype(float).reshape(-1), boxes['dz'].astype(float).reshape(-1)
+        valid_z = self.valid & np.isfinite(z) & np.isfinite(dz) & (dz > 0)
+        self.z_bounds = np.where(valid_z[:, None], np.stack([z - dz / 2, z + dz / 2], axis=-1), 0.0)
+        self.volume = self.area * (self.z_bounds[:, 1] - self.z_bounds[:, 0])
+        self._polygons = None
+
+    def __len__(self):
+        return len(self.boxes)
+
+    @property
+    def polygons(self):
+        """ shapely polygons of the corners, built on first use.
+        """
+        if self._polygons is None:
+            import shapely.geometry
+            try:
+                from shapely import polygons
+                self._polygons = polygons(self.corners)
+            except ImportError:
+                # shapely < 2.0 has no vectorized constructor
+                self._polygons = np.array([shapely.geometry.Polygon(c) for c in self.corners], dtype=object)
+        return self._polygons
+
+
+def overlapping_pairs(target: BoxGeometry, ref: BoxGeometry, rows: np.array, cols: np.array):
+    """ keeps the (rows, cols) candidate pairs of valid boxes whose circumcircles and bounds overlap,
+    others have zero intersection.
+    """
+    keep = target.valid[rows] & ref.valid[cols]
+    rows, cols = rows[keep], cols[keep]
+    distance = np.hypot(*(target.centers[rows] - ref.centers[cols]).T)
+    keep = distance <= target.radius[rows] + ref.radius[cols]
+    rows, cols = rows[keep], cols[keep]
+    a, b = target.bounds[rows], ref.bounds[cols]
+    keep = (a[:, 0] <= b[:, 2]) & (a[:, 2] >= b[:, 0]) & (a[:, 1] <= b[:, 3]) & (a[:, 3] >= b[:, 1])
+    return rows[keep], cols[keep]
+
+
+def aligned_pairs(target: BoxGeometry, ref: BoxGeometry, rows: np.array, cols: np.array):
+    """ mask of the (rows, cols) pairs whose sides are parallel: relative heading a multiple of 90 degrees,
+    which covers axis aligned pairs and pairs with the same heading.
+    """
+    relative = wrap_angle(ref.angle[cols] - target.angle[rows], np.pi / 2)
+    return np.abs(relative) <= __ALIGNED_TOLERANCE__
+
+
+def aligned_intersection_areas(target: BoxGeometry, ref: BoxGeometry, rows: np.array, cols: np.array):
+    """ closed form xy intersection area of aligned pairs (see aligned_pairs): in the target box frame both boxes are
+    axis aligned rectangles, and the intersection is the product of the x and y interval overlaps.
+    """
+    offset = ref.centers[cols] - target.centers[rows]
+    cos, sin = target.cos[rows], target.sin[rows]
+    # ref center in the target box frame, inverse of the target rotation
+    local = np.stack([cos * offset[:, 0] + sin * offset[:, 1], -sin * offset[:, 0] + cos * offset[:, 1]], axis=-1)
+    # ref sides are swapped when it is turned by 90 degrees relative to the target
+    turned = np.abs(wrap_angle(ref.angle[cols] - target.angle[rows], np.pi)) > np.pi / 4
+    ref_half = np.where(turned[:, None], ref.sizes[cols, ::-1], ref.sizes[cols]) / 2
+    target_half = target.sizes[rows] / 2
+    overlap = np.minimum(target_half, local + ref_half) - np.maximum(-target_half, local - ref_half)
+    return np.prod(np.clip(overlap, 0.0, None), axis=1)
+
+
+def intersection_areas(target: BoxGeometry, ref: BoxGeometry, rows: np.array, cols: np.array):
+    """ xy intersection area of each (rows, cols) pair. Aligned pairs are computed in closed form,
+    the remaining polygons are clipped in one vectorized call when shapely >= 2.0.
+    """
+    areas = np.zeros(len(rows), dtype=float)
+    aligned = aligned_pairs(target, ref, rows, cols)
+    areas[aligned] = aligned_intersection_areas(target, ref, rows[aligned], cols[aligned])
+    rows, cols = rows[~aligned], cols[~aligned]
+    if len(rows) == 0:
+        return areas
+    try:
+        from shapely import area, intersection
+        areas[~aligned] = area(intersection(target.polygons[rows], ref.polygons[cols]))
+    except ImportError:
+        areas[~aligned] = [target.polygons[r].intersection(ref.polygons[c]).area for r, c in zip(rows, cols)]
+    return areas
+
+
+def xy_intersection_matrix(target: BoxGeometry, ref: BoxGeometry, rows: np.array = None, cols: np.array = None):
+    """ len(target) x len(ref) xy intersection area matrix, only the (rows, cols) candidate pairs are computed (default all pairs).
+    """
+    if rows is None:
+        rows, cols = np.indices((len(target), len(ref))).reshape(2, -1)
+    rows, cols = overlapping_pairs(target, ref, rows, cols)
+    results = np.zeros((len(target), len(ref)), dtype=float)
+    results[rows, cols] = intersection_areas(target, ref, rows, cols)
+    return results
+
+
+def iou_from_intersection(intersection: np.array, target_size: np.array, ref_size: np.array):
+    """ iou matrix from an intersection matrix and the sizes (areas or volumes) of its target rows and ref columns.
+    """
+    return intersection / (target_size[:, None] + ref_size[None, :] - intersection + 1e-9)
+
+
+def xy_iou_matrix(target: BoxGeometry, ref: BoxGeometry, rows: np.array = None, cols: np.array = None):
+    """ len(target) x len(ref) xy iou matrix, only the (rows, cols) candidate pairs are computed (default all pairs).
+    The matrix is shared by both match directions: max over axis 1 for target boxes, max over axis 0 for ref boxes.
+    """
+    return iou_from_intersection(xy_intersection_matrix(target, ref, rows, cols), target.area, ref.area)
+
+
+def iou_3d_matrix(target: BoxGeometry, ref: BoxGeometry, xy_intersection: np.array, target_rows: slice = slice(None)):
+    """ 3d iou matrix of upright boxes, from their xy intersection matrix: the xy intersection times the z overlap
+    over the volumes. target_rows selects the target boxes of xy_intersection's rows (default all).
+    """
+    z_bounds = target.z_bounds[target_rows]
+    low = np.maximum(z_bounds[:, None, 0], ref.z_bounds[None, :, 0])
+    high = np.minimum(z_bounds[:, None, 1], ref.z_bounds[None, :, 1])
+    intersection = xy_intersection * np.clip(high - low, 0.0, None)
+    return iou_from_intersection(intersection, target.volume[target_rows], ref.volume)
@@ -1,10 +1,24 @@
+import json
 import random
 import tempfile
 from pathlib import Path
 import shutil
 import time
+import zipfile
 import numpy as np
 
+from .admission import __MAX_FRAME_BOXES__, __MAX_TOTAL_BOXES__, Admission
+from .bootstrap import bootstrap_intervals
+from .checkpoint import Journal
+from .budget import FrameLog, plan_workers, tile_rows
+from .manifest import digest, evaluator_digest, file_digest, frames_digest, write_manifest
+from .geometry import __ANGLE_PERIODS__, BoxGeometry, xy_iou_matrix
+from .metrics import __IOU_KINDS__, FrameMatch, phase_metrics
+from .progress import ProgressReporter, stratified_order
+from .points import PointGrid, count_points_in_boxes, point_count_bucket_labels, point_count_buckets, read_points
+from .regions import IgnoreRegions
+from .temporal import TemporalAccumulator, associate, previous_frames
+
 
 __GT_BOX_DTYPE__ = np.dtype([
     ('x', np.float32),
@@ -17,6 +31,9 @@ __GT_BOX_DTYPE__ = np.dtype([
     ('class', np.float32),
 ])
 
+# boxes spanning more grid cells than this are not put in the FrameIndex grid
+__MAX_BOX_CELLS__ = 16
+
 class IOUBox:    
     """
     source: https://stackoverflow.com/questions/44797713/calculate-the-area-of-intersection-of-two-rotated-rectangles-in-python
@@ -75,13 +92,8 @@ def calc_xy_iou(target_boxes: np.array, ref_boxes: np.array):
     Returns:
         np.array: numpy array in size of tgt_boxes
     """
-    # https://stackoverflow.com/questions/44797713/calculate-the-area-of-intersection-of-two-rotated-rectangles-in-python
-    # create a result matrix in size of inputs
-    results = np.empty((len(target_boxes), len(ref_boxes)), dtype=float)
-    for ri, tgt_box in enumerate(target_boxes):
-        for ci, ref_box in enumerate(ref_boxes):
-            results[ri, ci] = (IOUBox.from_numpy(tgt_box)).iou(IOUBox.from_numpy(ref_box))
-    
+    results = xy_iou_matrix(BoxGeometry(target_boxes), BoxGeometry(ref_boxes))
+
     # for each gt use iou of detection with max iou (best match)
     ious = np.max(results, axis=1)
 
@@ -110,6 +122,599 @@ def zero_iou_from_gt_file(gt_file):
     return np.zeros(len(gt_boxes), dtype=float)
 
 
+class FrameIndex:
+    """
+    Boxes of a single frame with their geometry table (see geometry.BoxGeometry), built once per frame.
+    A uniform grid over the box bounds gives the candidate pairs, boxes in disjoint cells have zero iou and are never clipped.
+    Boxes spanning more than __MAX_BOX_CELLS__ cells are kept out of the grid and are candidates of every box.
+    """
+    def __init__(self, boxes: np.array, angle_unit: str = 'degrees'):
+        self.boxes = boxes
+        self.geometry = BoxGeometry(boxes, angle_unit)
+        bounds = self.geometry.bounds
+
+        # cell size follows the typical box extent, so most boxes fall in 1-4 cells
+        extents = np.maximum(bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1])
+        self.cell_size = max(float(np.median(extents)), 1.0) if len(extents) else 1.0
+        cells, large = self._cells(bounds)
+        # an oversized box would be added to a huge number of cells, its pairs are pruned by overlapping_pairs instead
+        self.large = np.flatnonzero(large)
+        self.grid = {}
+        for i in np.flatnonzero(~large):
+            x0, y0, x1, y1 = cells[i]
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    self.grid.setdefault((cx, cy), []).append(i)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def _cells(self, bounds: np.array):
+        """ (x0, y0, x1, y1) grid cells covered by bounds and whether they span more than __MAX_BOX_CELLS__ cells,
+        cells of those are not meaningful.
+        """
+        cells = np.floor(bounds / self.cell_size)
+        large = (cells[:, 2] - cells[:, 0] + 1) * (cells[:, 3] - cells[:, 1] + 1) > __MAX_BOX_CELLS__
+        cells = np.where(large[:, None], 0.0, np.clip(cells, -2.0 ** 62, 2.0 ** 62)).astype(np.int64)
+        return cells, large
+
+    def candidate_pairs(self, other: 'FrameIndex', start: int = 0, stop: int = None):
+        """ (rows, cols) pairs of other's boxes (rows) and this frame's boxes (cols) sharing at least one grid cell,
+        for other's boxes [start, stop) (default all). Oversized boxes of either frame pair with every box.
+        """
+        rows, cols = [], []
+        cells, large = self._cells(other.geometry.bounds[start:stop])
+        for ri, (x0, y0, x1, y1), ri_large in zip(range(start, start + len(cells)), cells, large):
+            if ri_large:
+                indices = range(len(self))
+            else:
+                indices = set(self.large)
+                for cx in range(x0, x1 + 1):
+                    for cy in range(y0, y1 + 1):
+                        indices.update(self.grid.get((cx, cy), ()))
+                indices = sorted(indices)
+            rows += [ri] * len(indices)
+            cols += indices
+        return np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)
+
+
+def match_frames(target: FrameIndex, ref: FrameIndex = None, tile_rows: int = None, plan=(),
+                 class_aware: bool = False):
+    """ FrameMatch of target (gt) and ref (det) boxes over the grid candidate pairs, ref None for a missing frame.
+    """
+    if ref is None:
+        return FrameMatch(target.geometry)
+    return FrameMatch(
+        target.geometry, ref.geometry, lambda start, stop: ref.candidate_pairs(target, start, stop), tile_rows, plan,
+        class_aware,
+    )
+
+
+class SubmissionFrames:
+    """
+    Frames of a submission archive by file name. The archive is extracted to a tmp dir, or with stream
+    the frames of a zip are read one at a time straight from the archive, so nothing is written to disk.
+    """
+    def __init__(self, user_submission_file: Path, tmp_name: str = None, stream: bool = False):
+        self.zip = None
+        self.dir = None
+        if stream and zipfile.is_zipfile(user_submission_file):
+            print(f"Stream submission file '{user_submission_file}'")
+            self.zip = zipfile.ZipFile(user_submission_file)
+            self.names = set(self.zip.namelist())
+        else:
+            print(f"Unzip submission file '{user_submission_file}'")
+            timestamp = int(time.time() * 1e6) # used for run unique folder name
+            self.dir = tmp_dir(timestamp, tmp_name or user_submission_file.name)
+            shutil.unpack_archive(str(user_submission_file), str(self.dir))
+
+    def path(self, name: str):
+        return f'{self.zip.filename}:{name}' if self.zip is not None else str(self.dir / name)
+
+    def exists(self, name: str):
+        return name in self.names if self.zip is not None else (self.dir / name).exists()
+
+    def read(self, name: str, count: int = None):
+        """ boxes of frame name, only its first count boxes when count is given.
+        """
+        if self.zip is not None:
+            itemsize = __GT_BOX_DTYPE__.itemsize
+            if count is None:
+                buf = self.zip.read(name)
+            else:
+                with self.zip.open(name) as f:
+                    buf = f.read(count * itemsize)
+            # trailing bytes short of a whole box are ignored, like np.fromfile does for extracted files
+            return np.frombuffer(buf[:len(buf) // itemsize * itemsize], dtype=__GT_BOX_DTYPE__)
+        return np.fromfile(self.dir / name, dtype=__GT_BOX_DTYPE__, count=-1 if count is None else count)
+
+    def close(self):
+        if self.zip is not None:
+            self.zip.close()
+        if self.dir is not None and self.dir.exists():
+            print(f"delete '{self.dir}'")
+            shutil.rmtree(self.dir)
+
+
+def as_boxes(boxes):
+    """ __GT_BOX_DTYPE__ array of boxes: a structured array with (some of) its fields, or a (N, 7) array of
+    x, y, z, dx, dy, dz, heading or (N, 8) with class. Missing fields are 0.
+    """
+    boxes = np.asarray(boxes)
+    if boxes.dtype == __GT_BOX_DTYPE__:
+        return boxes.reshape(-1)
+    result = np.zeros(len(boxes), dtype=__GT_BOX_DTYPE__)
+    if boxes.dtype.names is not None:
+        for field in __GT_BOX_DTYPE__.names:
+            if field in boxes.dtype.names:
+                result[field] = boxes[field]
+        return result
+    boxes = boxes.reshape(-1, boxes.shape[-1]) if boxes.size else boxes.reshape(0, len(__GT_BOX_DTYPE__))
+    if boxes.shape[1] not in (7, 8):
+        raise ValueError(f'expected (N, 7) or (N, 8) boxes, got shape {boxes.shape}')
+    for i, field in enumerate(__GT_BOX_DTYPE__.names[:boxes.shape[1]]):
+        result[field] = boxes[:, i]
+    return result
+
+
+def as_frames(frames):
+    """ {frame name: __GT_BOX_DTYPE__ array} of a dict of frames by name, or of a sequence of frames named
+    0000000000.bin, 0000000001.bin, ... like submission files. Frames are anything as_boxes takes.
+    """
+    if not isinstance(frames, dict):
+        frames = {f'{i:010d}.bin': boxes for i, boxes in enumerate(frames)}
+    return {name: as_boxes(boxes) for name, boxes in frames.items()}
+
+
+class ArrayFrames:
+    """
+    In memory submission frames (see as_frames), read like SubmissionFrames.
+    """
+    def __init__(self, frames):
+        self.frames = as_frames(frames)
+
+    def path(self, name: str):
+        return f'<array>:{name}'
+
+    def exists(self, name: str):
+        return name in self.frames
+
+    def read(self, name: str, count: int = None):
+        return self.frames[name][:count]
+
+    def close(self):
+        pass
+
+
+class GroundTruth:
+    """
+    Test annotations decrypted, extracted, parsed and indexed once.
+    Shared by every submission scored against the same annotation file, see evaluate_many.
+    GroundTruth.from_frames builds the same handle from in memory frames, see evaluate_arrays.
+    When the annotation archive has a points/ folder with a point cloud frame per gt file (raw float32 x, y, z, intensity),
+    the number of points inside each gt box is counted once and kept in point_counts, the points themselves are not kept.
+    angle_unit is the heading unit of gt and submission boxes, see geometry.__ANGLE_PERIODS__.
+    """
+    def __init__(self, test_annotation_file: str or Path, angle_unit: str = 'degrees'):
+        self.angle_unit = angle_unit
+        test_annotation_file = Path(test_annotation_file)
+        assert test_annotation_file.exists()
+        timestamp = int(time.time() * 1e6) # used for run unique folder name
+
+        tmp_enc_dir = None
+        tmp_annotations_dir = None
+        try:
+            if test_annotation_file.suffix == '.enc':
+                print("# Decrypt test annotation file")
+                from cryptography.fernet import Fernet
+                key = (Path(__file__).parent / 'key.txt').read_bytes()
+                tmp_enc_dir = tmp_dir(timestamp, test_annotation_file.name)
+                tmp_enc_dir.mkdir()
+
+                # decrypt
+                f = Fernet(key)
+                data = test_annotation_file.read_bytes()
+                data_dec = f.decrypt(data)
+
+                # dump zip file
+                test_annotation_file = tmp_enc_dir / test_annotation_file.name.replace('.enc', '.zip')
+                with open(test_annotation_file, 'wb') as f:
+                    f.write(data_dec)
+
+            print(f"Unzip annotation file '{test_annotation_file}'")
+            tmp_annotations_dir = tmp_dir(timestamp, test_annotation_file.name)
+            shutil.unpack_archive(str(test_annotation_file), str(tmp_annotations_dir))
+
+            gt_files = sorted(tmp_annotations_dir.glob('*.bin'))
+            print(f'{len(gt_files)} gt files: {[str(f) for f in gt_files]}')
+            self._index_frames({gt_file.name: np.fromfile(gt_file, dtype=__GT_BOX_DTYPE__) for gt_file in gt_files})
+
+            self.point_counts = None
+            points_dir = tmp_annotations_dir / 'points'
+            if points_dir.is_dir():
+                print("# Count gt box points")
+                self.point_counts = {}
+                for name, gt_index in self.index.items():
+                    points_file = points_dir / name
+                    if points_file.exists():
+                        points = read_points(points_file)
+                        self.point_counts[name] = count_points_in_boxes(points, gt_index.geometry, PointGrid(points))
+                    else:
+                        print(f"points file missing: '{points_file}', gt boxes of the frame are in no point count bucket.")
+        finally:
+            for tmp in (tmp_annotations_dir, tmp_enc_dir):
+                if tmp is not None and tmp.exists():
+                    print(f"delete '{tmp}'")
+                    shutil.rmtree(tmp)
+
+    @classmethod
+    def from_frames(cls, frames, angle_unit: str = 'degrees', points=None):
+        """ gt of in memory frames (see as_frames), points optionally maps frame names to (N, 4) point clouds
+        whose points are counted per gt box like the points/ folder of an annotation archive.
+        """
+        gt = cls.__new__(cls)
+        gt.angle_unit = angle_unit
+        gt._index_frames(as_frames(frames))
+        gt.point_counts = None
+        if points is not None:
+            gt.point_counts = {
+                name: count_points_in_boxes(frame_points, gt.index[name].geometry, PointGrid(frame_points))
+                for name, frame_points in points.items() if name in gt.index
+            }
+        return gt
+
+    def _index_frames(self, frames: dict):
+        self.frames = frames
+        self.n_boxes = sum(len(boxes) for boxes in self.frames.values())
+        self.classes = sorted({int(c) for boxes in self.frames.values() for c in np.unique(boxes['class'])})
+
+        print("# Index gt frames")
+        self.index = {name: FrameIndex(boxes, self.angle_unit) for name, boxes in self.frames.items()}
+
+        # consecutive frames of a sequence and their associated gt boxes, see temporal
+        self.previous = previous_frames(self.frames)
+        self._associations = {}
+
+    def content_digest(self):
+        """ hex digest of the gt frame names and boxes, computed once.
+        """
+        if getattr(self, '_content_digest', None) is None:
+            self._content_digest = frames_digest(self.frames)
+        return self._content_digest
+
+    def associations(self, name: str):
+        """ (prev_rows, rows) gt boxes of name associated with the previous frame of its sequence, computed once.
+        """
+        if name not in self._associations:
+            prev_name = self.previous[name]
+            self._associations[name] = associate(self.index[prev_name], self.index[name])
+        return self._associations[name]
+
+    def associate_frames(self):
+        for name in self.previous:
+            self.associations(name)
+
+
+# score_submission options accepted as evaluate / evaluate_many kwargs
+SCORE_OPTIONS = (
+    'skip_empty_gt', 'temporal', 'memory_budget', 'max_frame_boxes', 'max_total_boxes', 'admission_policy',
+    'manifest_file', 'progress', 'progress_seed', 'bootstrap_replicates', 'class_aware',
+    'ignore_regions', 'checkpoint_dir', 'checkpoint_seconds',
+)
+
+
+def install_requirements():
+    print("# Install external packages")
+    import os
+    ecode = os.system("python -m pip install shapely cryptography")
+    assert ecode == 0
+
+
+def score_submission(gt: GroundTruth, user_submission_file: str or Path, phase_codename: str, tmp_name: str = None,
+                     skip_empty_gt: bool = False, temporal: bool = False, memory_budget: int = None,
+                     max_frame_boxes: int = __MAX_FRAME_BOXES__, max_total_boxes: int = __MAX_TOTAL_BOXES__,
+                     admission_policy: str = 'truncate', manifest_file: str or Path = None, progress=None,
+                     progress_seed: int = 0, bootstrap_replicates: int = 1000, class_aware: bool = False,
+                     ignore_regions: dict or str or Path = None, checkpoint_dir: str or Path = None,
+                     checkpoint_seconds: float = 60.0, frames: list = None, partial: bool = False):
+    """ scores a single submission archive (or ArrayFrames) against already loaded gt, returns the evaluate output dict.
+    With gt point counts, the gt->det iou is also averaged per point count bucket (result file only), and
+    skip_empty_gt ignores gt boxes without points, together with the detections best matching them.
+    temporal adds the sequence consistency metrics of TemporalAccumulator to the result file.
+    The leaderboard and result file metrics of the phase come from metrics.phase_metrics, all of them are updated
+    from one FrameMatch per frame.
+    memory_budget (bytes) bounds the per frame work: matches are reduced in gt row tiles sized to it and the per frame
+    partial results are spilled to disk (see budget.FrameLog).
+    Before scoring, the frame box counts are checked against max_frame_boxes / max_total_boxes (None: no limit),
+    see admission.Admission, which raises AdmissionError for a rejected submission.
+    manifest_file is where the result manifest (per frame partial results and input digests) is written,
+    see manifest.diff_manifests.
+    With progress (a callback, or True to print), frames are scored in a stratified random order (progress_seed) and
+    provisional AVG_XY_IOU estimates with confidence intervals are reported as frames finish, see
+    progress.ProgressReporter. Temporal metrics need the frames in sequence order, so they do not combine with it.
+    bootstrap_replicates frame resamples (0: none) give 95% intervals of the average xy iou metrics in the result file
+    (<name>_CI95_LOW / _HIGH), from the per frame partial sums, see bootstrap.bootstrap_intervals.
+    class_aware matches each box only with boxes of its own class, see metrics.FrameMatch.
+    ignore_regions (a config dict or json file, see regions.py) removes the gt and det boxes centered in ignore
+    polygons or beyond a range limit before matching.
+    With checkpoint_dir, the scoring state is journaled there every checkpoint_seconds and a run with the same
+    submission, gt and options resumes from its journal, see checkpoint.Journal. Tmp files are removed however
+    scoring ends.
+    frames limits scoring to those gt frame names (default all), and partial returns the scoring state of the frames
+    instead of the output, to be merged with the states of the other frames, see shard.py and score_output.
+    """
+    if progress and temporal:
+        raise ValueError('progress scores frames out of sequence order, it cannot be combined with temporal')
+    output = {}
+    timestamp = int(time.time() * 1e6) # used for run unique folder name
+    admission = Admission(__GT_BOX_DTYPE__.itemsize, max_frame_boxes, max_total_boxes, admission_policy)
+    if isinstance(user_submission_file, ArrayFrames):
+        submission_frames = user_submission_file
+        print("# Check submission complexity")
+        frame_limits = admission.check_counts(
+            {name: len(submission_frames.frames[name]) for name in gt.index if submission_frames.exists(name)}
+        )
+        spill_name = f'{tmp_name or "arrays"}.frames'
+    else:
+        print(f"user_submission_file '{user_submission_file}'")
+        user_submission_file = Path(user_submission_file)
+        assert user_submission_file.exists()
+
+        print("# Check submission complexity")
+        frame_limits = admission.check(user_submission_file, gt.index)
+
+        # zip frames are read one at a time, so an oversized frame is never decompressed past its limit
+        submission_frames = SubmissionFrames(user_submission_file, tmp_name, stream=True)
+        spill_name = f'{tmp_name or user_submission_file.name}.frames'
+    frame_log = FrameLog(tmp_dir(timestamp, spill_name) if memory_budget is not None else None)
+    # the options results depend on
+    run_options = {
+        'skip_empty_gt': skip_empty_gt, 'temporal': temporal, 'angle_unit': gt.angle_unit,
+        'max_frame_boxes': max_frame_boxes, 'max_total_boxes': max_total_boxes,
+        'admission_policy': admission_policy, 'truncated_frames': sorted(frame_limits),
+        # frames are in scoring order, shuffled by the seed in progress mode
+        'progress_seed': progress_seed if progress else None,
+        'bootstrap_replicates': bootstrap_replicates, 'class_aware': class_aware,
+        # by content, so editing a regions file never resumes a journal of the old regions
+        'ignore_regions': ignore_regions and (
+            digest(json.dumps(ignore_regions, sort_keys=True).encode()).hex()
+            if isinstance(ignore_regions, dict) else digest(Path(ignore_regions).read_bytes()).hex()
+        ),
+    }
+
+    try:
+        # run evaluation frame by frame
+        print("# Run evaluation")
+        leaderboard_metrics, result_metrics = phase_metrics(phase_codename, gt.classes)
+        metrics = leaderboard_metrics + result_metrics
+        # everything the metrics match by iou with, reduced in one pass per frame (center distance needs no iou)
+        plan = {('xy', None)} | {(metric.kind, metric.class_id) for metric in metrics if metric.kind in __IOU_KINDS__}
+        bucket_labels = point_count_bucket_labels()
+        bucket_sums = np.zeros(len(bucket_labels), dtype=float)
+        bucket_counts = np.zeros(len(bucket_labels), dtype=np.int64)
+        gt_count = 0
+        temporal_accumulator = TemporalAccumulator(heading_period=__ANGLE_PERIODS__[gt.angle_unit]) if temporal else None
+        names = list(frames) if frames is not None else list(gt.index)
+        regions = IgnoreRegions.from_config(ignore_regions) if ignore_regions else None
+        ignored_counts = np.zeros(2, dtype=np.int64) if regions is not None else None
+        # gt boxes kept by the ignore regions in each scored frame, for the temporal associations
+        regions_kept = {}
+        reporter = None
+        if progress:
+            order = stratified_order(np.array([len(gt.index[name]) for name in names]), seed=progress_seed)
+            names = [names[i] for i in order]
+            reporter = ProgressReporter(progress, len(names))
+
+        def scoring_state():
+            """ everything accumulated over names[:done], journaled, merged across shards and turned into the output.
+            """
+            return {
+                'done': done, 'names': names[:done], 'metrics': metrics, 'n_leaderboard': len(leaderboard_metrics),
+                'bucket_sums': bucket_sums, 'bucket_counts': bucket_counts, 'gt_count': gt_count,
+                'temporal_accumulator': temporal_accumulator, 'regions_kept': regions_kept,
+                'ignored_counts': ignored_counts, 'records': np.array(frame_log.records), 'options': run_options,
+            }
+
+        journal = None
+        done = 0
+        if checkpoint_dir is not None:
+            journal = Journal(checkpoint_dir, {
+                'gt': gt.content_digest(),
+                'submission': (
+                    frames_digest(submission_frames.frames) if isinstance(submission_frames, ArrayFrames)
+                    else file_digest(user_submission_file)
+                ),
+                'phase_codename': phase_codename,
+                'evaluator': evaluator_digest(),
+                'options': run_options,
+            }, checkpoint_seconds)
+            state = journal.load()
+            if state is not None:
+                done = state['done']
+                metrics = state['metrics']
+                n_leaderboard = len(leaderboard_metrics)
+                leaderboard_metrics, result_metrics = metrics[:n_leaderboard], metrics[n_leaderboard:]
+                bucket_sums, bucket_counts, gt_count = state['bucket_sums'], state['bucket_counts'], state['gt_count']
+                temporal_accumulator, regions_kept = state['temporal_accumulator'], state['regions_kept']
+                ignored_counts = state['ignored_counts']
+                frame_log.extend(state['records'])
+                print(f"checkpoint: resuming after {done} of {len(names)} frames from '{journal.path}'")
+
+        for name in names[done:]:
+            gt_index = gt.index[name]
+            print(f"gt frame: '{name}'")
+            det_boxes = None
+            if not submission_frames.exists(name):
+                print(f"submission file missing: '{submission_frames.path(name)}', adding 0 for each gt to results compute.")
+            else:
+                print(f"submission file: '{submission_frames.path(name)}'")
+                try:
+                    det_boxes = submission_frames.read(name, frame_limits.get(name))
+                except Exception as ex:
+                    print(f"Failed reading submission file: '{submission_frames.path(name)}'. adding 0 each gt to results compute. Exception: {ex}")
+
+            gt_kept = None
+            if regions is not None:
+                gt_kept = ~regions.ignored(name, gt_index.boxes)
+                if det_boxes is not None:
+                    det_kept = ~regions.ignored(name, det_boxes)
+                    ignored_counts[1] += np.count_nonzero(~det_kept)
+                    det_boxes = det_boxes[det_kept]
+                ignored_counts[0] += np.count_nonzero(~gt_kept)
+                print(f'ignore regions: removing {np.count_nonzero(~gt_kept)} gt boxes'
+                      + (f', {np.count_nonzero(~det_kept)} det boxes' if det_boxes is not None else ''))
+                if not gt_kept.all():
+                    gt_index = FrameIndex(gt_index.boxes[gt_kept], gt.angle_unit)
+
+            if det_boxes is None:
+                frame = match_frames(gt_index)
+                gt_xy_ious = np.zeros(len(gt_index), dtype=float)
+            else:
+                det_index = FrameIndex(det_boxes, gt.angle_unit)
+                frame_tile_rows = None
+                if memory_budget is not None:
+                    frame_tile_rows = tile_rows(memory_budget, len(det_index), len({kind for kind, _ in plan}))
+                    if frame_tile_rows < len(gt_index):
+                        print(f'memory budget: throttling, {-(-len(gt_index) // frame_tile_rows)} tiles of {frame_tile_rows} gt boxes')
+                frame = match_frames(gt_index, det_index, frame_tile_rows, plan, class_aware)
+                print(f'calculating metrics. {len(gt_index)} gt boxes, {len(det_index)} det boxes')
+                print('calc gt vs det and det vs gt best xy iou matches')
+                gt_xy_ious, gt_best_det, det_xy_iou, det_best_gt = frame.best('xy')
+
+            if temporal_accumulator is not None:
+                det_heading = np.full(len(gt_index), np.nan)
+                if det_boxes is not None:
+                    matched = gt_best_det >= 0
+                    det_heading[matched] = det_boxes['heading'][gt_best_det[matched]]
+                prev_name = gt.previous.get(name)
+                associations = gt.associations(name) if prev_name is not None else None
+                frame_gt_boxes, frame_gt_ious = gt_index.boxes, gt_xy_ious
+                if gt_kept is not None:
+                    # back on all gt rows of the frame, associations of ignored boxes are dropped
+                    frame_gt_boxes = gt.index[name].boxes
+                    frame_gt_ious = np.zeros(len(gt_kept), dtype=float)
+                    frame_gt_ious[gt_kept] = gt_xy_ious
+                    kept_heading, det_heading = det_heading, np.full(len(gt_kept), np.nan)
+                    det_heading[gt_kept] = kept_heading
+                    regions_kept[name] = gt_kept
+                    if associations is not None and prev_name in regions_kept:
+                        prev_rows, rows = associations
+                        both = regions_kept[prev_name][prev_rows] & gt_kept[rows]
+                        associations = (prev_rows[both], rows[both])
+                temporal_accumulator.update(name, prev_name, associations, frame_gt_boxes, frame_gt_ious, det_heading)
+
+            point_counts = gt.point_counts.get(name) if gt.point_counts is not None else None
+            if point_counts is not None and gt_kept is not None:
+                point_counts = point_counts[gt_kept]
+            if point_counts is not None:
+                gt_buckets = point_count_buckets(point_counts)
+                if skip_empty_gt:
+                    nonempty = point_counts > 0
+                    print(f'skipping {np.count_nonzero(~nonempty)} gt boxes without points')
+                    # a frame without gt boxes has no empty gt box to match, every det is kept
+                    if det_boxes is not None and nonempty.size:
+                        matches_empty = (det_best_gt >= 0) & ~nonempty[det_best_gt]
+                        frame.det_keep = ~matches_empty
+                    frame.gt_keep = nonempty
+                    gt_xy_ious = gt_xy_ious[nonempty]
+                    gt_buckets = gt_buckets[nonempty]
+                bucket_sums += np.bincount(gt_buckets, weights=gt_xy_ious, minlength=len(bucket_labels))
+                bucket_counts += np.bincount(gt_buckets, minlength=len(bucket_labels))
+
+            for metric in metrics:
+                metric.update(frame)
+            det_xy_ious = det_xy_iou[frame.det_keep] if det_boxes is not None else np.zeros(len(gt_xy_ious))
+            frame_log.append(
+                len(gt_xy_ious), len(det_xy_ious), gt_xy_ious.sum(), det_xy_ious.sum(),
+                digest(gt_index.boxes.tobytes()), digest(det_boxes.tobytes()) if det_boxes is not None else b'',
+            )
+            gt_count += len(gt_xy_ious)
+            print(f'gt boxes scored - {gt_count}')
+            if reporter is not None:
+                reporter.update(frame_log.records)
+            done += 1
+            if journal is not None and journal.due():
+                journal.save(scoring_state())
+
+        state = scoring_state()
+        if partial:
+            return state
+        output = score_output(gt, phase_codename, state, bootstrap_replicates, manifest_file, {
+            'phase_codename': phase_codename,
+            'evaluator': evaluator_digest(),
+            'submission': file_digest(user_submission_file) if isinstance(user_submission_file, Path) else None,
+            'options': state['options'],
+        })
+        if reporter is not None:
+            reporter.finish(frame_log.records, output["submission_result"].get('AVG_XY_IOU'))
+        if journal is not None:
+            journal.remove()
+    finally:
+        print("# Cleanups")
+        submission_frames.close()
+        frame_log.close()
+
+    return output
+
+
+def score_output(gt: GroundTruth, phase_codename: str, state: dict, bootstrap_replicates: int = 1000,
+                 manifest_file: str or Path = None, manifest_metadata: dict = None):
+    """ the evaluate output dict of a scoring state (see score_submission partial) of all frames of gt,
+    writes the result manifest to manifest_file with manifest_metadata (the state options by default).
+    """
+    output = {}
+    metrics, names, records = state['metrics'], state['names'], state['records']
+    leaderboard_metrics = metrics[:state['n_leaderboard']]
+    results = {}
+    for metric in metrics:
+        value = metric.result()
+        print(f'# {metric.name}: {value}')
+        # a metric without a value, e.g. true positive errors without any true positive, is left out
+        if value is not None:
+            results[metric.name] = value
+
+    output["result"] = [
+        {
+            f"{phase_codename}_split": {
+                metric.name: results[metric.name] for metric in leaderboard_metrics if metric.name in results
+            }
+        }
+    ]
+    # To display the results in the result file
+    output["submission_result"] = dict(results)
+    if gt.point_counts is not None:
+        bucket_sums, bucket_counts = state['bucket_sums'], state['bucket_counts']
+        for bucket, label in enumerate(point_count_bucket_labels()):
+            if bucket_counts[bucket]:
+                avg_bucket_xy_iou = bucket_sums[bucket] / bucket_counts[bucket]
+                print(f'# AVG_GT_VS_DET_XY_IOU_PTS_{label}: {avg_bucket_xy_iou} ({bucket_counts[bucket]} gt boxes)')
+                output["submission_result"][f"AVG_GT_VS_DET_XY_IOU_PTS_{label}"] = avg_bucket_xy_iou
+    if state['temporal_accumulator'] is not None:
+        for key, value in state['temporal_accumulator'].result().items():
+            print(f'# {key}: {value}')
+            output["submission_result"][key] = value
+    ignored_counts = state['ignored_counts']
+    if ignored_counts is not None:
+        print(f'# Ignored boxes: {ignored_counts[0]} gt, {ignored_counts[1]} det')
+        output["submission_result"]["IGNORED_GT_BOXES"] = int(ignored_counts[0])
+        output["submission_result"]["IGNORED_DET_BOXES"] = int(ignored_counts[1])
+    for name, (low, high) in bootstrap_intervals(records, bootstrap_replicates, names=names).items():
+        print(f'# {name} 95% bootstrap interval: [{low}, {high}]')
+        output["submission_result"][f"{name}_CI95_LOW"] = low
+        output["submission_result"][f"{name}_CI95_HIGH"] = high
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        frame_xy_iou = records['gt_xy_iou_sum'] / records['gt']
+    print(f'# Lowest gt vs det xy iou frames: {[(names[i], frame_xy_iou[i]) for i in np.argsort(frame_xy_iou)[:3]]}')
+    if manifest_file is not None:
+        print(f"# Write result manifest '{manifest_file}'")
+        metadata = manifest_metadata or {'options': state['options']}
+        write_manifest(manifest_file, names, records, dict(metadata, result=output["submission_result"]))
+    print("# Output")
+    print(output)
+    return output
+
+
 def evaluate(test_annotation_file, user_submission_file, phase_codename, **kwargs):
     print("Starting Evaluation.....")
     """
@@ -125,6 +730,23 @@ def evaluate(test_annotation_file, user_submission_file, phase_codename, **kwarg
         You can access the submission metadata
         with kwargs['submission_metadata']
 
+        `skip_empty_gt` (kwargs): ignore gt boxes without lidar points,
+        needs point cloud frames in the annotation archive, see GroundTruth
+        `temporal` (kwargs): add sequence consistency metrics, see temporal.TemporalAccumulator
+        `angle_unit` (kwargs): box heading unit, 'degrees' (default) or 'radians'
+        `memory_budget` (kwargs): memory (bytes) the evaluation should stay within, see budget.plan_workers
+        `max_frame_boxes`, `max_total_boxes`, `admission_policy` (kwargs): submission complexity limits,
+        see admission.Admission
+        `manifest_file` (kwargs): where to write the result manifest, see manifest.py
+        `progress`, `progress_seed` (kwargs): report provisional scores of a stratified frame sample while scoring,
+        a callback receiving status dicts or True to print them, see progress.py
+        `bootstrap_replicates` (kwargs): frame resamples of the result file confidence intervals (default 1000, 0: none),
+        see bootstrap.py
+        `class_aware` (kwargs): only match boxes of the same class, see metrics.FrameMatch
+        `ignore_regions` (kwargs): ignore polygons / range limit config, dict or json file, see regions.py
+        `checkpoint_dir`, `checkpoint_seconds` (kwargs): journal the scoring state there and resume an interrupted
+        run of the same inputs, see checkpoint.py
+
         Example: A sample submission metadata can be accessed like this:
         >>> print(kwargs['submission_metadata'])
         {
@@ -148,105 +770,101 @@ def evaluate(test_annotation_file, user_submission_file, phase_codename, **kwarg
             'submitted_at': u'2017-03-20T19:22:03.880652Z'
         }
     """
-    print("# Install external packages")
-    import os
-    ecode = os.system("python -m pip install shapely cryptography")
-    assert ecode == 0
-    
-    output = {}
+    install_requirements()
+
     print(f"# Evaluating for '{phase_codename}' Phase")
     print(f"test_annotation_file '{test_annotation_file}'")
-    print(f"user_submission_file '{user_submission_file}'")
 
     # read input
     print("# Read inputs")
-    test_annotation_file = Path(test_annotation_file)
-    user_submission_file = Path(user_submission_file)
-    assert test_annotation_file.exists()
-    assert user_submission_file.exists()
-    timestamp = int(time.time() * 1e6) # used for run unique folder name
-
-    tmp_enc_dir = None
-    if test_annotation_file.suffix == '.enc':
-        print("# Decrypt test annotation file")
-        from cryptography.fernet import Fernet
-        key = (Path(__file__).parent / 'key.txt').read_bytes()
-        tmp_enc_dir = tmp_dir(timestamp, test_annotation_file.name)
-        tmp_enc_dir.mkdir()
-
-        # decrypt
-        f = Fernet(key)
-        data = test_annotation_file.read_bytes()
-        data_dec = f.decrypt(data)
-
-        # dump zip file
-        test_annotation_file = tmp_enc_dir / test_annotation_file.name.replace('.enc', '.zip')
-        with open(test_annotation_file, 'wb') as f:
-            f.write(data_dec)
-
-    print(f"Unzip annotation file '{test_annotation_file}'")
-    tmp_annotations_dir = tmp_dir(timestamp, test_annotation_file.name)
-    shutil.unpack_archive(str(test_annotation_file), str(tmp_annotations_dir))
-
-    print(f"Unzip submission file '{user_submission_file}'")
-    tmp_submission_dir = tmp_dir(timestamp, user_submission_file.name)
-    shutil.unpack_archive(str(user_submission_file), str(tmp_submission_dir))
-
-    # run evaluation frame by frame
-    print("# Run evaluation")
-    gt_files = sorted(tmp_annotations_dir.glob('*.bin'))
-    print(f'{len(gt_files)} gt files: {[str(f) for f in gt_files]}')
-    all_gt_xy_iou = []
-    all_det_xy_iou = []
-    for gt_file in gt_files:
-        print(f"gt file: '{gt_file}'")
-        submission_file = tmp_submission_dir / gt_file.name
-        if not submission_file.exists():
-            print(f"submission file missing: '{submission_file}', adding 0 for each gt to results compute.")
-            gt_xy_ious = zero_iou_from_gt_file(gt_file)
-            det_xy_iou = zero_iou_from_gt_file(gt_file)
-        else:
-            print(f"submission file: '{submission_file}'")
-            print('calc gt vs det xy ious')
-            gt_xy_ious = calc_xy_iou_from_files(gt_file, submission_file)
-            print('calc det vs get xy ious')
-            det_xy_iou = calc_xy_iou_from_files(submission_file, gt_file)
-        
-        all_gt_xy_iou += gt_xy_ious.tolist()
-        all_det_xy_iou += det_xy_iou.tolist()
-        print(f'all_gt_xy_iou len - {len(all_gt_xy_iou)}')
-        print(f'all_det_xy_iou len - {len(all_det_xy_iou)}')
-
-    avg_gt_xy_iou = np.mean(all_gt_xy_iou)
-    avg_det_xy_iou = np.mean(all_det_xy_iou)
-    avg_xy_iou = 0.5 * avg_gt_xy_iou + 0.5 * avg_det_xy_iou
-
-    print(f'# AVG_GT_VS_DET_XY_IOU: {avg_gt_xy_iou}')
-    print(f'# AVG_DET_VS_GT_XY_IOU: {avg_det_xy_iou}')
-    print(f'# AVG_XY_IOU: {avg_xy_iou}')
-
-    output["result"] = [
-        {
-            f"{phase_codename}_split": {
-                "AVG_XY_IOU": avg_xy_iou,
-            }
-        }
-    ]
-    # To display the results in the result file
-    output["submission_result"] = output["result"][0][f"{phase_codename}_split"]
-    print("# Output")
-    print(output)
-    
-    print("# Cleanups")
-    if tmp_annotations_dir.exists():
-        print(f"delete '{tmp_annotations_dir}'")
-        shutil.rmtree(tmp_annotations_dir)
-    if tmp_submission_dir.exists():
-        print(f"delete '{tmp_submission_dir}'")
-        shutil.rmtree(tmp_submission_dir)
-    if tmp_enc_dir is not None and tmp_enc_dir.exists():
-        print(f"delete '{tmp_enc_dir}'")
-        shutil.rmtree(tmp_enc_dir)
+    gt = GroundTruth(test_annotation_file, kwargs.get('angle_unit', 'degrees'))
+    score_options = {key: kwargs[key] for key in SCORE_OPTIONS if key in kwargs}
+    if kwargs.get('memory_budget') is not None:
+        _, score_options['memory_budget'] = plan_workers(kwargs['memory_budget'], gt.n_boxes, 1)
+    output = score_submission(gt, user_submission_file, phase_codename, **score_options)
 
     print(f"# Completed evaluation for '{phase_codename}' Phase")
     return output
+
+
+# gt shared by the evaluate_many worker processes, set once per process by _init_worker
+_WORKER_GT = None
+
+
+def _init_worker(gt: GroundTruth):
+    global _WORKER_GT
+    _WORKER_GT = gt
+
+
+def _score_in_worker(user_submission_file, phase_codename, tmp_name, score_options):
+    return score_submission(_WORKER_GT, user_submission_file, phase_codename, tmp_name, **score_options)
+
+
+def evaluate_many(test_annotation_file, user_submission_files, phase_codename, max_workers=None, **kwargs):
+    """
+    Evaluates several submissions of the same challenge phase, e.g. re-scoring the whole leaderboard after a metric change.
+    The test annotation file is decrypted, parsed and indexed once and shared by all submissions,
+    which are scored in parallel by max_workers processes (default: cpu count, 1 scores in process).
+    With a memory_budget kwarg (bytes) the worker count is lowered to fit it, see budget.plan_workers.
+    With a manifest_dir kwarg the result manifest of each submission is written there as <index>_<file name>.manifest.
+    Returns a list of evaluate outputs in the order of user_submission_files, None for a submission that failed.
+    """
+    install_requirements()
+    score_options = {key: kwargs[key] for key in SCORE_OPTIONS if key in kwargs}
+
+    print(f"# Evaluating {len(user_submission_files)} submissions for '{phase_codename}' Phase")
+    print(f"test_annotation_file '{test_annotation_file}'")
+    gt = GroundTruth(test_annotation_file, kwargs.get('angle_unit', 'degrees'))
+    if score_options.get('temporal'):
+        # associated once here instead of once per worker process
+        gt.associate_frames()
+    if kwargs.get('memory_budget') is not None:
+        max_workers, score_options['memory_budget'] = plan_workers(kwargs['memory_budget'], gt.n_boxes, max_workers)
+
+    # index prefix keeps tmp dirs unique for submissions sharing a file name
+    tmp_names = [f'{i}_{Path(f).name}' for i, f in enumerate(user_submission_files)]
+    submission_options = [dict(score_options) for _ in user_submission_files]
+    if kwargs.get('manifest_dir') is not None:
+        for i, tmp_name in enumerate(tmp_names):
+            submission_options[i]['manifest_file'] = str(Path(kwargs['manifest_dir']) / f'{tmp_name}.manifest')
+    outputs = [None] * len(user_submission_files)
+    if max_workers == 1:
+        for i, user_submission_file in enumerate(user_submission_files):
+            try:
+                outputs[i] = score_submission(gt, user_submission_file, phase_codename, tmp_names[i], **submission_options[i])
+            except Exception as ex:
+                print(f"Failed evaluating submission '{user_submission_file}'. Exception: {ex!r}")
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(gt,)) as executor:
+            futures = [
+                executor.submit(_score_in_worker, user_submission_file, phase_codename, tmp_names[i], submission_options[i])
+                for i, user_submission_file in enumerate(user_submission_files)
+            ]
+            for i, future in enumerate(futures):
+                try:
+                    outputs[i] = future.result()
+                except Exception as ex:
+                    print(f"Failed evaluating submission '{user_submission_files[i]}'. Exception: {ex!r}")
+
+    print(f"# Completed evaluation of {len(user_submission_files)} submissions for '{phase_codename}' Phase")
+    return outputs
+
+
+def evaluate_arrays(gt, predictions, phase_codename: str = 'dev', verbose: bool = False, **kwargs):
+    """
+    Scores in memory predictions with the same metrics as evaluate, without files, e.g. in a validation loop.
+    gt is a GroundTruth handle, kept and reused across calls so the gt is indexed once, or frames to build one from
+    (GroundTruth.from_frames, angle_unit kwarg). gt and predictions frames are dicts of frames by name or sequences
+    of frames, each a __GT_BOX_DTYPE__ array or a (N, 7) / (N, 8) float array, see as_frames.
+    kwargs are score_submission options (SCORE_OPTIONS). Returns the evaluate output dict, the scoring log is printed
+    only with verbose.
+    """
+    import contextlib
+    import io
+    log = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with log:
+        if not isinstance(gt, GroundTruth):
+            gt = GroundTruth.from_frames(gt, kwargs.get('angle_unit', 'degrees'))
+        score_options = {key: kwargs[key] for key in SCORE_OPTIONS if key in kwargs}
+        return score_submission(gt, ArrayFrames(predictions), phase_codename, **score_options)
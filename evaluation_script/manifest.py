@@ -0,0 +1,116 @@
+"""
+Result manifests: the per frame partial results of a scored submission (budget.__FRAME_RECORD_DTYPE__ records: box
+counts, gt->det and det->gt xy iou sums and digests of the scored boxes) with the evaluator, submission and result.
+Two manifests are diffed frame by frame, so a score change is narrowed to the frames and inputs that moved without
+re-running the evaluation.
+
+File layout: __MAGIC__, header length (8 bytes little endian), json header (sorted keys), raw records.
+The same inputs and evaluator give the same bytes. See diff_manifests.py for the command line diff.
+"""
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+
+from .budget import __FRAME_RECORD_DTYPE__
+
+
+__MAGIC__ = b'IVZMANIFEST1\n'
+
+# record fields compared by diff_manifests, float sums within atol are equal
+__DIFF_FIELDS__ = ('gt_digest', 'det_digest', 'gt', 'det', 'gt_xy_iou_sum', 'det_xy_iou_sum')
+
+
+def digest(data: bytes):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def file_digest(path: str or Path, chunk_size: int = 2 ** 20):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def frames_digest(frames: dict):
+    """ hex digest of {name: boxes} frames, in name order.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for name in sorted(frames):
+        h.update(name.encode())
+        h.update(np.ascontiguousarray(frames[name]).tobytes())
+    return h.hexdigest()
+
+
+def evaluator_digest():
+    """ digest of the evaluation script sources, changes with any evaluator change.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for source in sorted(Path(__file__).parent.glob('*.py')):
+        h.update(source.name.encode())
+        h.update(source.read_bytes())
+    return h.hexdigest()
+
+
+def write_manifest(manifest_file: str or Path, names, records: np.array, metadata: dict):
+    header = json.dumps({'names': list(names), 'metadata': metadata}, sort_keys=True, default=float).encode()
+    with open(manifest_file, 'wb') as f:
+        f.write(__MAGIC__)
+        f.write(len(header).to_bytes(8, 'little'))
+        f.write(header)
+        f.write(np.ascontiguousarray(records, dtype=__FRAME_RECORD_DTYPE__).tobytes())
+
+
+def read_manifest(manifest_file: str or Path):
+    """ (names, records, metadata) of a manifest file.
+    """
+    data = Path(manifest_file).read_bytes()
+    if not data.startswith(__MAGIC__):
+        raise ValueError(f"'{manifest_file}' is not a result manifest")
+    start = len(__MAGIC__) + 8
+    end = start + int.from_bytes(data[len(__MAGIC__):start], 'little')
+    header = json.loads(data[start:end])
+    records = np.frombuffer(data[end:], dtype=__FRAME_RECORD_DTYPE__)
+    return header['names'], records, header['metadata']
+
+
+def diff_manifests(a_file: str or Path, b_file: str or Path, atol: float = 0.0):
+    """ frame differences of two manifests: {'only_a': [names], 'only_b': [names], 'frames': {name: {field: (a, b)}}}
+    for the __DIFF_FIELDS__ that differ, and 'metadata': {key: (a, b)} for the differing metadata.
+    """
+    a_names, a_records, a_metadata = read_manifest(a_file)
+    b_names, b_records, b_metadata = read_manifest(b_file)
+    a_index = {name: i for i, name in enumerate(a_names)}
+    b_index = {name: i for i, name in enumerate(b_names)}
+    common = [name for name in a_names if name in b_index]
+
+    frames = {}
+    if common:
+        a_common = a_records[[a_index[name] for name in common]]
+        b_common = b_records[[b_index[name] for name in common]]
+        changed = {}
+        for field in __DIFF_FIELDS__:
+            if a_common.dtype[field].kind == 'f':
+                changed[field] = ~np.isclose(a_common[field], b_common[field], rtol=0.0, atol=atol, equal_nan=True)
+            else:
+                changed[field] = a_common[field] != b_common[field]
+        for i in np.flatnonzero(np.any(np.stack(list(changed.values())), axis=0)):
+            frames[common[i]] = {
+                field: (_plain(a_common[field][i]), _plain(b_common[field][i]))
+                for field in __DIFF_FIELDS__ if changed[field][i]
+            }
+
+    keys = sorted(set(a_metadata) | set(b_metadata))
+    return {
+        'only_a': [name for name in a_names if name not in b_index],
+        'only_b': [name for name in b_names if name not in a_index],
+        'frames': frames,
+        'metadata': {key: (a_metadata.get(key), b_metadata.get(key)) for key in keys
+                     if a_metadata.get(key) != b_metadata.get(key)},
+    }
+
+
+def _plain(value):
+    return value.hex() if isinstance(value, bytes) else value.item()
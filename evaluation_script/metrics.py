@@ -0,0 +1,393 @@
+import numpy as np
+
+from .distance import __CENTER_DISTANCES__, nearest_centers
+from .geometry import BoxGeometry, intersection_areas, wrap_angle, iou_3d_matrix, iou_from_intersection, overlapping_pairs
+
+
+# iou kinds a metric can match boxes with
+__IOU_KINDS__ = ('xy', '3d')
+
+# errors of matched gt / det pairs, see TruePositiveError
+__TP_ERRORS__ = ('translation', 'scale', 'orientation')
+
+
+def class_partitions(classes: np.array):
+    """ (order, bounds, values): one stable argsort groups the boxes by class,
+    order[bounds[i]:bounds[i + 1]] are the indices of the boxes of class values[i].
+    """
+    order = np.argsort(classes, kind='stable')
+    values, starts = np.unique(classes[order], return_index=True)
+    return order, np.append(starts, len(classes)), values
+
+
+def same_class_pairs(target_classes: np.array, ref_classes: np.array, start: int = 0, stop: int = None):
+    """ (rows, cols) of all target rows [start, stop) (default all) x ref boxes pairs of the same class,
+    built per class partition so pairs of different classes are never enumerated.
+    """
+    t_order, t_bounds, t_values = class_partitions(target_classes[start:stop])
+    r_order, r_bounds, r_values = class_partitions(ref_classes)
+    rows, cols = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    for t, r in zip(*np.nonzero(t_values[:, None] == r_values[None, :])):
+        t_rows = t_order[t_bounds[t]:t_bounds[t + 1]] + start
+        r_cols = r_order[r_bounds[r]:r_bounds[r + 1]]
+        rows.append(np.repeat(t_rows, len(r_cols)))
+        cols.append(np.tile(r_cols, len(t_rows)))
+    return np.concatenate(rows), np.concatenate(cols)
+
+
+class FrameMatch:
+    """
+    Gt vs det geometry of a single frame, shared by all the metrics of a phase (see phase_metrics).
+    Metrics only need best matches, so the gt x det iou matrices are reduced to best match ious / indices as they are
+    computed, in tiles of tile_rows gt rows (default all). Each tile's xy intersections are computed once and every
+    (kind, class_id) of plan is reduced from them in the same pass, so an added metric adds no geometry pass.
+    pairs(start, stop) gives the candidate (rows, cols) pairs of gt rows [start, stop) (default all pairs).
+    gt_keep / det_keep mark the boxes metrics are computed over (see skip_empty_gt), det is None when the submission
+    frame is missing or unreadable.
+    class_aware only matches boxes of the same class: the candidate pairs are cut to same class pairs before any
+    geometry, so a box never matches one of another class and the pair count drops roughly by the class count.
+    """
+    def __init__(self, gt: BoxGeometry, det: BoxGeometry = None, pairs=None, tile_rows: int = None, plan=(),
+                 class_aware: bool = False):
+        self.gt = gt
+        self.det = det
+        self.class_aware = class_aware
+        if pairs is None:
+            pairs = self._same_class_pairs if class_aware else self._all_pairs
+        elif class_aware:
+            pairs = self._class_filtered(pairs)
+        self.pairs = pairs
+        self.tile_rows = tile_rows
+        self.plan = set(plan)
+        self.gt_keep = np.ones(len(gt), dtype=bool)
+        self.det_keep = np.ones(len(det), dtype=bool) if det is not None else None
+        self._best = {}
+        self._nearest = {}
+
+    def _all_pairs(self, start: int, stop: int):
+        return np.indices((stop - start, len(self.det))).reshape(2, -1) + np.array([[start], [0]])
+
+    def _same_class_pairs(self, start: int, stop: int):
+        return same_class_pairs(self.gt.boxes['class'], self.det.boxes['class'], start, stop)
+
+    def _class_filtered(self, pairs):
+        def class_pairs(start: int, stop: int):
+            rows, cols = pairs(start, stop)
+            same = self.gt.boxes['class'][rows] == self.det.boxes['class'][cols]
+            return rows[same], cols[same]
+        return class_pairs
+
+    def _tile_ious(self, kind: str, start: int, stop: int, xy_intersection: np.array):
+        if kind == 'xy':
+            return iou_from_intersection(xy_intersection, self.gt.area[start:stop], self.det.area)
+        if kind == '3d':
+            return iou_3d_matrix(self.gt, self.det, xy_intersection, slice(start, stop))
+        raise ValueError(f"unknown iou kind '{kind}', expected one of {__IOU_KINDS__}")
+
+    def _reduce(self, keys):
+        n_gt, n_det = len(self.gt), len(self.det)
+        best = {
+            key: (np.zeros(n_gt), np.full(n_gt, -1), np.zeros(n_det), np.full(n_det, -1))
+            for key in keys
+        }
+        tile_rows = self.tile_rows or max(n_gt, 1)
+        for start in range(0, n_gt, tile_rows):
+            stop = min(start + tile_rows, n_gt)
+            rows, cols = self.pairs(start, stop)
+            rows, cols = overlapping_pairs(self.gt, self.det, rows, cols)
+            xy_intersection = np.zeros((stop - start, n_det), dtype=float)
+            xy_intersection[rows - start, cols] = intersection_areas(self.gt, self.det, rows, cols)
+            for kind in sorted({kind for kind, _ in keys}):
+                ious = self._tile_ious(kind, start, stop, xy_intersection)
+                for class_id in [class_id for k, class_id in keys if k == kind]:
+                    gt_best, gt_arg, det_best, det_arg = best[(kind, class_id)]
+                    gt_class, det_class = self.class_masks(class_id)
+                    if n_det == 0:
+                        continue
+                    class_ious = ious if class_id is None else ious * gt_class[start:stop, None] * det_class[None, :]
+                    gt_arg[start:stop] = np.argmax(class_ious, axis=1)
+                    gt_best[start:stop] = class_ious[np.arange(stop - start), gt_arg[start:stop]]
+                    tile_arg = np.argmax(class_ious, axis=0)
+                    tile_best = class_ious[tile_arg, np.arange(n_det)]
+                    # strict, so ties keep the lowest gt row like a single argmax over the full matrix
+                    better = tile_best > det_best
+                    det_best[better], det_arg[better] = tile_best[better], tile_arg[better] + start
+        for gt_best, gt_arg, det_best, det_arg in best.values():
+            gt_arg[gt_best <= 0] = -1
+            det_arg[det_best <= 0] = -1
+        self._best.update(best)
+
+    def best(self, kind: str = 'xy', class_id: int = None):
+        """ (gt_best, gt_arg, det_best, det_arg): best match iou of each gt box among det boxes of class_id
+        (all for None) and its det index, and the same for each det box among gt boxes of class_id.
+        Indices are -1 without an overlapping match, boxes of other classes get 0 / -1.
+        """
+        key = (kind, class_id)
+        if key not in self._best:
+            self._reduce({key} | {k for k in self.plan if k not in self._best})
+        return self._best[key]
+
+    def nearest(self, class_id: int = None):
+        """ (gt_distance, gt_arg, det_distance, det_arg): xy distance to the nearest det center of each gt box among
+        det boxes of class_id (all for None, the same class with class_aware) and its det index, and the same for each
+        det box. Only centers within max(__CENTER_DISTANCES__) are found, others get inf / -1, as do degenerate boxes.
+        No iou is computed.
+        """
+        if class_id not in self._nearest:
+            n_gt, n_det = len(self.gt), len(self.det)
+            nearest = (np.full(n_gt, np.inf), np.full(n_gt, -1), np.full(n_det, np.inf), np.full(n_det, -1))
+            gt_class, det_class = self.class_masks(class_id)
+            gt_class, det_class = gt_class & self.gt.valid, det_class & self.det.valid
+            if class_id is None and self.class_aware:
+                groups = [
+                    (gt_class & (self.gt.boxes['class'] == c), det_class & (self.det.boxes['class'] == c))
+                    for c in np.intersect1d(self.gt.boxes['class'], self.det.boxes['class'])
+                ]
+            else:
+                groups = [(gt_class, det_class)]
+            gt_distance, gt_arg, det_distance, det_arg = nearest
+            for gt_rows, det_rows in groups:
+                gt_rows, det_rows = np.flatnonzero(gt_rows), np.flatnonzero(det_rows)
+                if not len(gt_rows) or not len(det_rows):
+                    continue
+                distance, arg = nearest_centers(self.gt.centers[gt_rows], self.det.centers[det_rows])
+                gt_distance[gt_rows], gt_arg[gt_rows] = distance, np.where(arg >= 0, det_rows[arg], -1)
+                distance, arg = nearest_centers(self.det.centers[det_rows], self.gt.centers[gt_rows])
+                det_distance[det_rows], det_arg[det_rows] = distance, np.where(arg >= 0, gt_rows[arg], -1)
+            self._nearest[class_id] = nearest
+        return self._nearest[class_id]
+
+    def class_masks(self, class_id: int = None):
+        """ gt and det boxes of class_id (all boxes for None), det mask is None without det.
+        """
+        if class_id is None:
+            return np.ones(len(self.gt), dtype=bool), np.ones(len(self.det), dtype=bool) if self.det is not None else None
+        gt_class = self.gt.boxes['class'] == class_id
+        return gt_class, self.det.boxes['class'] == class_id if self.det is not None else None
+
+
+class Metric:
+    """
+    A named output accumulated over the frames of a submission: update() with each frame's FrameMatch, then result().
+    merge() adds the accumulated state of the same metric over other frames, e.g. another shard of the split.
+    Best match ious are taken among boxes of class_id (all boxes for None) from the kind ('xy' or '3d') iou matrix,
+    kind 'center' metrics match by center distance instead (see FrameMatch.nearest).
+    """
+    def __init__(self, name: str, kind: str = 'xy', class_id: int = None):
+        self.name = name
+        self.kind = kind
+        self.class_id = class_id
+
+    def best_ious(self, frame: FrameMatch):
+        """ (gt, det) best match iou of each kept box. As before the registry, a frame without det adds a zero det
+        iou per kept gt box, so det is then zeros of the gt length.
+        """
+        gt_class, det_class = frame.class_masks(self.class_id)
+        gt_rows = frame.gt_keep & gt_class
+        if frame.det is None:
+            return np.zeros(np.count_nonzero(gt_rows), dtype=float), np.zeros(np.count_nonzero(gt_rows), dtype=float)
+        gt_best, _, det_best, _ = frame.best(self.kind, self.class_id)
+        return gt_best[gt_rows], det_best[frame.det_keep & det_class]
+
+    def update(self, frame: FrameMatch):
+        raise NotImplementedError
+
+    def merge(self, other: 'Metric'):
+        raise NotImplementedError
+
+    def result(self):
+        """ the metric value, None when it has none (see TruePositiveError).
+        """
+        raise NotImplementedError
+
+
+class AverageIoU(Metric):
+    """ mean best match iou: direction 'gt' over gt boxes, 'det' over det boxes,
+    'both' the 0.5 / 0.5 blend of the two (AVG_XY_IOU). The mean over no boxes is 0, never nan.
+    """
+    def __init__(self, name: str, kind: str = 'xy', direction: str = 'both', class_id: int = None):
+        super().__init__(name, kind, class_id)
+        self.direction = direction
+        self.sums = np.zeros(2, dtype=float)
+        self.counts = np.zeros(2, dtype=np.int64)
+
+    def update(self, frame: FrameMatch):
+        gt_best, det_best = self.best_ious(frame)
+        self.sums += [gt_best.sum(), det_best.sum()]
+        self.counts += [len(gt_best), len(det_best)]
+
+    def merge(self, other: 'AverageIoU'):
+        self.sums += other.sums
+        self.counts += other.counts
+
+    def result(self):
+        # a direction without boxes averages to 0, like a missing frame scores its gt boxes against no det
+        avg_gt, avg_det = np.divide(self.sums, self.counts, out=np.zeros(2), where=self.counts > 0)
+        if self.direction == 'gt':
+            return avg_gt
+        if self.direction == 'det':
+            return avg_det
+        return 0.5 * avg_gt + 0.5 * avg_det
+
+
+class MatchRate(Metric):
+    """ share of boxes whose best match iou reaches threshold: direction 'gt' is recall, 'det' precision.
+    Submissions carry no confidence score, so there is no ranking to compute AP over, these are the single
+    operating point precision / recall. Without boxes to count (e.g. precision of an empty submission) the rate is 0.
+    """
+    def __init__(self, name: str, threshold: float, kind: str = 'xy', direction: str = 'gt', class_id: int = None):
+        super().__init__(name, kind, class_id)
+        self.threshold = threshold
+        self.direction = direction
+        self.matched = 0
+        self.count = 0
+
+    def update(self, frame: FrameMatch):
+        gt_best, det_best = self.best_ious(frame)
+        if self.direction == 'gt':
+            best = gt_best
+        else:
+            # a missing frame has no det boxes to count
+            best = det_best if frame.det is not None else det_best[:0]
+        self.matched += np.count_nonzero(best >= self.threshold)
+        self.count += len(best)
+
+    def merge(self, other: 'MatchRate'):
+        self.matched += other.matched
+        self.count += other.count
+
+    def result(self):
+        return self.matched / self.count if self.count else 0.0
+
+
+class CenterMatchRate(Metric):
+    """ share of boxes whose nearest center (see FrameMatch.nearest) is within threshold meters: direction 'gt' is
+    recall, 'det' precision. nuScenes style center distance matching, no iou is computed for it and it is more
+    lenient than iou with small objects. Without boxes to count the rate is 0, like MatchRate.
+    """
+    def __init__(self, name: str, threshold: float, direction: str = 'gt', class_id: int = None):
+        super().__init__(name, 'center', class_id)
+        self.threshold = threshold
+        self.direction = direction
+        self.matched = 0
+        self.count = 0
+
+    def update(self, frame: FrameMatch):
+        gt_class, det_class = frame.class_masks(self.class_id)
+        if frame.det is None:
+            # a missing frame has no det boxes to count, its gt boxes are unmatched
+            if self.direction == 'gt':
+                self.count += np.count_nonzero(frame.gt_keep & gt_class)
+            return
+        gt_distance, _, det_distance, _ = frame.nearest(self.class_id)
+        if self.direction == 'gt':
+            distance = gt_distance[frame.gt_keep & gt_class]
+        else:
+            distance = det_distance[frame.det_keep & det_class]
+        self.matched += np.count_nonzero(distance <= self.threshold)
+        self.count += len(distance)
+
+    def merge(self, other: 'CenterMatchRate'):
+        self.matched += other.matched
+        self.count += other.count
+
+    def result(self):
+        return self.matched / self.count if self.count else 0.0
+
+
+class TruePositiveError(Metric):
+    """ mean error of the matched pairs: gt boxes whose best match xy iou reaches threshold and that best det.
+    The pairs come from the best match indices of the iou pass, their errors are gathers over the box arrays:
+    * translation - xy center distance
+    * scale - 1 - iou of the boxes once aligned (same center and heading), from their dx, dy, dz
+    * orientation - absolute heading difference in radians, wrapped to [0, pi]
+    Without any matched pair there is no error to average, result() is None and the output leaves the metric out.
+    """
+    def __init__(self, name: str, error: str, threshold: float = 0.5, class_id: int = None):
+        if error not in __TP_ERRORS__:
+            raise ValueError(f"unknown true positive error '{error}', expected one of {__TP_ERRORS__}")
+        super().__init__(name, 'xy', class_id)
+        self.error = error
+        self.threshold = threshold
+        self.sum = 0.0
+        self.count = 0
+
+    def update(self, frame: FrameMatch):
+        if frame.det is None:
+            return
+        gt_best, gt_arg, _, _ = frame.best(self.kind, self.class_id)
+        gt_class, _ = frame.class_masks(self.class_id)
+        rows = np.flatnonzero(frame.gt_keep & gt_class & (gt_best >= self.threshold))
+        cols = gt_arg[rows]
+        if self.error == 'translation':
+            errors = np.hypot(*(frame.gt.centers[rows] - frame.det.centers[cols]).T)
+        elif self.error == 'scale':
+            gt_size = np.stack([frame.gt.boxes[field][rows] for field in ('dx', 'dy', 'dz')], axis=1).astype(float)
+            det_size = np.stack([frame.det.boxes[field][cols] for field in ('dx', 'dy', 'dz')], axis=1).astype(float)
+            intersection = np.prod(np.minimum(gt_size, det_size), axis=1)
+            errors = 1 - intersection / (np.prod(gt_size, axis=1) + np.prod(det_size, axis=1) - intersection)
+        else:
+            errors = np.abs(wrap_angle(frame.gt.angle[rows] - frame.det.angle[cols], 2 * np.pi))
+        self.sum += errors.sum()
+        self.count += len(errors)
+
+    def merge(self, other: 'TruePositiveError'):
+        self.sum += other.sum
+        self.count += other.count
+
+    def result(self):
+        return self.sum / self.count if self.count else None
+
+
+def default_metrics():
+    return [AverageIoU('AVG_XY_IOU')]
+
+
+def leaderboard_metrics():
+    return [
+        AverageIoU('AVG_XY_IOU'),
+        AverageIoU('AVG_3D_IOU', kind='3d'),
+        MatchRate('XY_RECALL_50', 0.5, direction='gt'),
+        MatchRate('XY_PRECISION_50', 0.5, direction='det'),
+    ]
+
+
+# leaderboard metrics of each phase codename, names must match the challenge_config.yaml leaderboard labels
+PHASE_METRICS = {
+    'dev': leaderboard_metrics,
+    'eval': leaderboard_metrics,
+}
+
+
+def result_metrics(classes=()):
+    """ metrics of the result file only, per class metrics for each gt class id in classes.
+    """
+    metrics = [
+        AverageIoU('AVG_GT_VS_DET_XY_IOU', direction='gt'),
+        AverageIoU('AVG_DET_VS_GT_XY_IOU', direction='det'),
+        MatchRate('XY_RECALL_70', 0.7, direction='gt'),
+        MatchRate('XY_PRECISION_70', 0.7, direction='det'),
+        MatchRate('3D_RECALL_50', 0.5, kind='3d', direction='gt'),
+        MatchRate('3D_PRECISION_50', 0.5, kind='3d', direction='det'),
+    ]
+    for threshold in __CENTER_DISTANCES__:
+        label = f'{threshold:g}'.replace('.', '_')
+        metrics += [
+            CenterMatchRate(f'CENTER_RECALL_{label}M', threshold, direction='gt'),
+            CenterMatchRate(f'CENTER_PRECISION_{label}M', threshold, direction='det'),
+        ]
+    metrics += [AverageIoU(f'AVG_XY_IOU_CLASS_{class_id}', class_id=class_id) for class_id in classes]
+    for class_id in [None] + list(classes):
+        suffix = f'_CLASS_{class_id}' if class_id is not None else ''
+        metrics += [
+            TruePositiveError(f'TP_{error.upper()}_ERROR{suffix}', error, class_id=class_id) for error in __TP_ERRORS__
+        ]
+    return metrics
+
+
+def phase_metrics(phase_codename: str, classes=()):
+    """ fresh (leaderboard, result file only) metric lists of a phase, unknown phases get AVG_XY_IOU only.
+    """
+    leaderboard = PHASE_METRICS.get(phase_codename, default_metrics)()
+    names = {metric.name for metric in leaderboard}
+    return leaderboard, [metric for metric in result_metrics(classes) if metric.name not in names]
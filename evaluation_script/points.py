@@ -0,0 +1,87 @@
+import numpy as np
+
+from .geometry import BoxGeometry
+
+
+# point cloud frames are raw float32 (x, y, z, intensity) records
+__POINT_FIELDS__ = 4
+
+# gt point count bucket edges, bucket i holds counts in [edges[i], edges[i + 1])
+__POINT_COUNT_BUCKETS__ = (0, 1, 10, 50, 200)
+
+
+def read_points(points_file):
+    return np.fromfile(points_file, dtype=np.float32).reshape(-1, __POINT_FIELDS__)
+
+
+class PointGrid:
+    """
+    Uniform xy grid over a point cloud frame. Points are sorted once by cell key (column major),
+    so the points of a column of cells are a contiguous slice found with two binary searches.
+    """
+    def __init__(self, points: np.array, cell_size: float = 2.0):
+        self.cell_size = cell_size
+        xy = points[:, :2].astype(float)
+        self.origin = xy.min(axis=0) if len(xy) else np.zeros(2)
+        cells = np.floor((xy - self.origin) / cell_size).astype(np.int64)
+        self.shape = cells.max(axis=0) + 1 if len(cells) else np.zeros(2, dtype=np.int64)
+        keys = cells[:, 0] * self.shape[1] + cells[:, 1]
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.points = points[order]
+
+    def query(self, bounds: np.array):
+        """ points of the cells covering bounds (xmin, ymin, xmax, ymax).
+        """
+        low = np.floor((bounds[:2] - self.origin) / self.cell_size).astype(np.int64)
+        high = np.floor((bounds[2:] - self.origin) / self.cell_size).astype(np.int64)
+        low, high = np.maximum(low, 0), np.minimum(high, self.shape - 1)
+        if np.any(low > high):
+            return self.points[:0]
+        columns = np.arange(low[0], high[0] + 1) * self.shape[1]
+        starts = np.searchsorted(self.keys, columns + low[1], side='left')
+        ends = np.searchsorted(self.keys, columns + high[1], side='right')
+        return np.concatenate([self.points[s:e] for s, e in zip(starts, ends)])
+
+
+def count_points_in_boxes(points: np.array, geometry: BoxGeometry, grid: PointGrid = None):
+    """ number of points inside each box, points are moved to each box's local frame and tested against its half sizes.
+    Only the points of the grid cells under the box bounds are transformed.
+    """
+    grid = grid or PointGrid(points)
+    boxes = geometry.boxes
+    counts = np.zeros(len(geometry), dtype=np.int64)
+    for i, bounds in enumerate(geometry.bounds):
+        candidates = grid.query(bounds)
+        if len(candidates) == 0:
+            continue
+        offset = candidates[:, :2].astype(float) - geometry.centers[i]
+        # inverse of the geometry rotation
+        local_x = geometry.cos[i] * offset[:, 0] + geometry.sin[i] * offset[:, 1]
+        local_y = -geometry.sin[i] * offset[:, 0] + geometry.cos[i] * offset[:, 1]
+        local_z = candidates[:, 2] - boxes['z'][i]
+        inside = (
+            (np.abs(local_x) <= boxes['dx'][i] / 2)
+            & (np.abs(local_y) <= boxes['dy'][i] / 2)
+            & (np.abs(local_z) <= boxes['dz'][i] / 2)
+        )
+        counts[i] = np.count_nonzero(inside)
+    return counts
+
+
+def point_count_bucket_labels(edges=__POINT_COUNT_BUCKETS__):
+    labels = []
+    for low, high in zip(edges, list(edges[1:]) + [None]):
+        if high is None:
+            labels.append(f'{low}+')
+        elif high == low + 1:
+            labels.append(f'{low}')
+        else:
+            labels.append(f'{low}-{high - 1}')
+    return labels
+
+
+def point_count_buckets(counts: np.array, edges=__POINT_COUNT_BUCKETS__):
+    """ bucket index of each point count.
+    """
+    return np.searchsorted(np.asarray(edges), counts, side='right') - 1
@@ -0,0 +1,94 @@
+"""
+Progressive scoring: the frames of a split are scored in a stratified random order, so every prefix of it is a sample
+of the split, and a provisional AVG_XY_IOU with a confidence interval is reported from the frames scored so far
+(budget.FrameLog records), refined as more frames finish until the exact final score.
+"""
+import time
+
+import numpy as np
+
+
+# two sided 95% normal quantile
+__Z_95__ = 1.959963984540054
+
+
+def stratified_order(weights: np.array, strata: int = 8, seed: int = 0):
+    """ frame positions in a random order: frames are cut into strata of similar weight (gt box count) and the
+    shuffled strata are interleaved evenly, so any prefix samples each stratum in proportion to its size.
+    The same weights and seed give the same order.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(weights)
+    by_weight = np.lexsort((rng.random(n), weights))
+    stratum = np.empty(n, dtype=np.int64)
+    stratum[by_weight] = np.arange(n) * strata // max(n, 1)
+    keys = np.empty(n, dtype=float)
+    for s in range(strata):
+        members = rng.permutation(np.flatnonzero(stratum == s))
+        # systematic positions (j + u) / m of the m stratum members in [0, 1)
+        keys[members] = (np.arange(len(members)) + rng.random()) / max(len(members), 1)
+    return np.argsort(keys, kind='stable')
+
+
+def estimate_xy_iou(records: np.array, total_frames: int, z: float = __Z_95__):
+    """ (AVG_XY_IOU, half width of its confidence interval) from the records of a random sample of total_frames
+    frames. AVG_XY_IOU is a blend of two ratio estimators (iou sums over box counts), its variance is the linearized
+    ratio variance with the finite population correction, so the interval closes to 0 once all frames are scored.
+    """
+    n = len(records)
+    gt, det = records['gt'].astype(float), records['det'].astype(float)
+    gt_sum, det_sum = records['gt_xy_iou_sum'], records['det_xy_iou_sum']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        gt_ratio, det_ratio = gt_sum.sum() / gt.sum(), det_sum.sum() / det.sum()
+        value = 0.5 * gt_ratio + 0.5 * det_ratio
+        if n < 2 or n >= total_frames:
+            return value, 0.0 if n >= total_frames else float('nan')
+        residuals = 0.5 * (gt_sum - gt_ratio * gt) / gt.mean() + 0.5 * (det_sum - det_ratio * det) / det.mean()
+        variance = (1 - n / total_frames) * residuals.var(ddof=1) / n
+    return value, z * np.sqrt(variance)
+
+
+class ProgressReporter:
+    """
+    Calls callback with a status dict after the first_report scored frames, then each time the scored frame count
+    doubles, and once more with the exact final score (final True):
+    {'frames', 'total_frames', 'AVG_XY_IOU', 'AVG_XY_IOU_CI95': (low, high), 'elapsed_seconds', 'final'}
+    callback True prints the status lines instead.
+    """
+    def __init__(self, callback, total_frames: int, first_report: int = 16):
+        self.callback = callback if callable(callback) else self._print
+        self.total_frames = total_frames
+        self.next_report = min(first_report, total_frames)
+        self.start = time.time()
+
+    @staticmethod
+    def _print(status: dict):
+        low, high = status['AVG_XY_IOU_CI95']
+        kind = 'final' if status['final'] else 'provisional'
+        print(f"# {kind} AVG_XY_IOU after {status['frames']} / {status['total_frames']} frames: "
+              f"{status['AVG_XY_IOU']} [{low}, {high}] ({status['elapsed_seconds']:.1f}s)")
+
+    def _status(self, records: np.array, final: bool, value: float = None):
+        estimate, half_width = estimate_xy_iou(records, self.total_frames)
+        value = estimate if value is None else value
+        return {
+            'frames': len(records),
+            'total_frames': self.total_frames,
+            'AVG_XY_IOU': value,
+            'AVG_XY_IOU_CI95': (value - half_width, value + half_width),
+            'elapsed_seconds': time.time() - self.start,
+            'final': final,
+        }
+
+    def update(self, records: np.array):
+        """ records of the frames scored so far, reports when a report is due.
+        """
+        if len(records) < self.next_report or len(records) >= self.total_frames:
+            return
+        self.next_report = 2 * len(records)
+        self.callback(self._status(records, False))
+
+    def finish(self, records: np.array, avg_xy_iou: float = None):
+        """ reports the final status, avg_xy_iou is the exact metric result when computed.
+        """
+        self.callback(self._status(records, True, avg_xy_iou))
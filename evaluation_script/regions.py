@@ -0,0 +1,108 @@
+"""
+Ignore regions (don't care zones): gt and det boxes whose center falls in an ignore polygon or beyond the range
+limit are removed before matching, so unlabeled areas neither penalize nor reward a submission.
+
+Config, a dict or the path of a json file holding it (polygons are lists of [x, y] vertices in the box frame):
+    {
+        "polygons": [[[x, y], ...], ...],   # ignored in every frame
+        "max_range": 80.0,                  # xy distance from the sensor origin beyond which boxes are ignored
+        "frames": {"0000000001.bin": {"polygons": [...], "max_range": 50.0}}
+    }
+Frame polygons are added to the global ones, a frame max_range replaces the global one.
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+
+
+class PolygonGrid:
+    """
+    Polygons with a uniform grid over their bounds, kept as (cell key, polygon) entries sorted by key, so the
+    candidate polygons of many points are found with two binary searches and tested in one vectorized
+    point in polygon (crossing number) pass.
+    """
+    def __init__(self, polygons, cell_size: float = 10.0):
+        polygons = [np.asarray(polygon, dtype=float).reshape(-1, 2) for polygon in polygons]
+        self.cell_size = cell_size
+        # rings closed by padding with the first vertex, padding edges have zero length and never cross
+        n_vertices = max((len(polygon) for polygon in polygons), default=0) + 1
+        self.vertices = np.zeros((len(polygons), n_vertices, 2), dtype=float)
+        for i, polygon in enumerate(polygons):
+            self.vertices[i, :len(polygon)] = polygon
+            self.vertices[i, len(polygon):] = polygon[0]
+
+        bounds = np.concatenate([self.vertices.min(axis=1), self.vertices.max(axis=1)], axis=1).reshape(-1, 4)
+        self.origin = bounds[:, :2].min(axis=0) if len(bounds) else np.zeros(2)
+        cells = np.floor((bounds - np.tile(self.origin, 2)) / cell_size).astype(np.int64)
+        self.shape = cells[:, 2:].max(axis=0) + 1 if len(cells) else np.zeros(2, dtype=np.int64)
+        keys, ids = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+        for i, (x0, y0, x1, y1) in enumerate(cells):
+            cx, cy = np.meshgrid(np.arange(x0, x1 + 1), np.arange(y0, y1 + 1), indexing='ij')
+            keys.append((cx * self.shape[1] + cy).ravel())
+            ids.append(np.full(cx.size, i))
+        keys, ids = np.concatenate(keys), np.concatenate(ids)
+        order = np.argsort(keys, kind='stable')
+        self.keys, self.polygon_ids = keys[order], ids[order]
+
+    def __len__(self):
+        return len(self.vertices)
+
+    def contains(self, points: np.array):
+        """ whether each (x, y) point is inside any of the polygons.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        inside = np.zeros(len(points), dtype=bool)
+        if not len(self) or not len(points):
+            return inside
+        cells = np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+        on_grid = np.all((cells >= 0) & (cells < self.shape), axis=1)
+        point_keys = np.where(on_grid, cells[:, 0] * self.shape[1] + cells[:, 1], -1)
+        starts = np.searchsorted(self.keys, point_keys, side='left')
+        counts = np.where(on_grid, np.searchsorted(self.keys, point_keys, side='right') - starts, 0)
+
+        # (point, polygon) candidate pairs of the points' cells
+        point_ids = np.repeat(np.arange(len(points)), counts)
+        entries = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+        polygon = self.vertices[self.polygon_ids[entries]]
+        px, py = points[point_ids, 0:1], points[point_ids, 1:2]
+        xi, yi = polygon[:, :-1, 0], polygon[:, :-1, 1]
+        xj, yj = polygon[:, 1:, 0], polygon[:, 1:, 1]
+        spans = (yi > py) != (yj > py)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            crosses = spans & (px < xi + (py - yi) * (xj - xi) / (yj - yi))
+        hits = np.count_nonzero(crosses, axis=1) % 2 == 1
+        inside[point_ids[hits]] = True
+        return inside
+
+
+class IgnoreRegions:
+    """
+    Global and per frame ignore polygons and range limits, see the module docstring for the config.
+    """
+    def __init__(self, polygons=(), max_range: float = None, frames: dict = None, cell_size: float = 10.0):
+        self.polygons = PolygonGrid(polygons, cell_size)
+        self.max_range = max_range
+        self.frames = {}
+        for name, frame in (frames or {}).items():
+            self.frames[name] = (
+                PolygonGrid(frame.get('polygons', ()), cell_size), frame.get('max_range', max_range)
+            )
+
+    @classmethod
+    def from_config(cls, config: dict or str or Path):
+        if not isinstance(config, dict):
+            config = json.loads(Path(config).read_text())
+        return cls(config.get('polygons', ()), config.get('max_range'), config.get('frames'))
+
+    def ignored(self, name: str, boxes: np.array):
+        """ whether each __GT_BOX_DTYPE__ box of frame name has its center in an ignore region.
+        """
+        centers = np.stack([boxes['x'], boxes['y']], axis=-1).astype(float).reshape(-1, 2)
+        frame_polygons, max_range = self.frames.get(name, (None, self.max_range))
+        ignored = self.polygons.contains(centers)
+        if frame_polygons is not None:
+            ignored |= frame_polygons.contains(centers)
+        if max_range is not None:
+            ignored |= np.hypot(centers[:, 0], centers[:, 1]) > max_range
+        return ignored
@@ -0,0 +1,343 @@
+"""
+Sharded evaluation: a coordinator splits the gt frames of a split into shards (ranges of frames), hands them to
+worker processes over authenticated multiprocessing.connection sockets and merges the scoring states they send
+back (see score_submission partial) into the same output as a single process run, up to the float summation
+order of the averages.
+
+Workers are local processes started by evaluate_sharded, or remote ones started on other hosts with
+    python -m evaluation_script.shard_worker --address <coordinator host>:<port> --authkey <key>
+that reach the test annotation and submission files at the same paths (shared storage).
+A shard whose worker fails or is lost is retried on another worker, a shard running longer than straggler_seconds
+is also handed to another worker and the first state back is kept, and a shard failing max_attempts times is
+scored by the coordinator itself, so one failing shard or worker never loses the run.
+"""
+import os
+import threading
+import time
+from collections import deque
+from multiprocessing import Process
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+
+import numpy as np
+
+from .admission import __MAX_FRAME_BOXES__, __MAX_TOTAL_BOXES__, Admission
+from .manifest import evaluator_digest, file_digest
+from .main import __GT_BOX_DTYPE__, SCORE_OPTIONS, GroundTruth, install_requirements, score_output, score_submission
+
+
+# score options the coordinator handles itself instead of passing them to the shards
+__COORDINATOR_OPTIONS__ = ('progress', 'progress_seed', 'checkpoint_dir', 'checkpoint_seconds', 'manifest_file')
+
+
+def shard_frames(names, previous: dict, shards: int, keep_sequences: bool = False):
+    """ names split into at most shards consecutive ranges of about equal size, in order. With keep_sequences,
+    ranges only start at a frame that does not follow the previous name in its sequence (see GroundTruth.previous),
+    so sequence consistency metrics never lose a pair to a shard boundary.
+    """
+    if not names:
+        return []
+    starts = [i for i, name in enumerate(names) if not keep_sequences or i == 0 or previous.get(name) != names[i - 1]]
+    targets = np.linspace(0, len(names), shards + 1)[1:-1]
+    cuts = sorted({starts[min(np.searchsorted(starts, target), len(starts) - 1)] for target in targets} - {0})
+    bounds = [0] + cuts + [len(names)]
+    return [names[start:stop] for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+
+def merge_states(states):
+    """ one scoring state of the states of consecutive shards, in frame order. Merges into the first state.
+    """
+    merged = dict(states[0])
+    for state in states[1:]:
+        for metric, other in zip(merged['metrics'], state['metrics']):
+            metric.merge(other)
+        if merged['temporal_accumulator'] is not None:
+            merged['temporal_accumulator'].merge(state['temporal_accumulator'])
+        if merged['ignored_counts'] is not None:
+            merged['ignored_counts'] = merged['ignored_counts'] + state['ignored_counts']
+        merged['bucket_sums'] = merged['bucket_sums'] + state['bucket_sums']
+        merged['bucket_counts'] = merged['bucket_counts'] + state['bucket_counts']
+        merged['gt_count'] += state['gt_count']
+        merged['done'] += state['done']
+        merged['names'] = merged['names'] + state['names']
+    merged['records'] = np.concatenate([state['records'] for state in states])
+    merged['regions_kept'] = {}
+    merged['options'] = dict(
+        merged['options'],
+        truncated_frames=sorted(name for state in states for name in state['options']['truncated_frames']),
+    )
+    return merged
+
+
+def score_shard(task: dict, gts: dict = None):
+    """ scoring state of a shard task, gts caches GroundTruth by (test annotation file, angle unit).
+    """
+    gts = {} if gts is None else gts
+    key = (task['test_annotation_file'], task['angle_unit'])
+    if key not in gts:
+        gts[key] = GroundTruth(task['test_annotation_file'], task['angle_unit'])
+    return score_submission(
+        gts[key], task['user_submission_file'], task['phase_codename'], f"shard{task['shard']}_{os.getpid()}",
+        frames=task['frames'], partial=True, **task['score_options']
+    )
+
+
+def run_worker(address, authkey: bytes, gts: dict = None, connect_seconds: float = 0.0):
+    """ scores the shards sent by the coordinator at address until it sends None or goes away,
+    gts are already loaded GroundTruth (see score_shard). Connecting is retried for connect_seconds, so workers
+    can be started before the coordinator.
+    """
+    deadline = time.time() + connect_seconds
+    while True:
+        try:
+            connection = Client(address, authkey=authkey)
+            break
+        except ConnectionRefusedError:
+            if time.time() > deadline:
+                raise
+            time.sleep(1.0)
+    gts = {} if gts is None else gts
+    try:
+        while True:
+            try:
+                task = connection.recv()
+            except EOFError:
+                return
+            if task is None:
+                return
+            try:
+                connection.send({'shard': task['shard'], 'state': score_shard(task, gts)})
+            except Exception as ex:
+                connection.send({'shard': task['shard'], 'error': repr(ex)})
+    finally:
+        connection.close()
+
+
+class Coordinator:
+    """
+    Shard queue shared by the threads serving the worker connections: each worker gets the next pending shard and
+    returns its state or an error. Failed shards are queued again up to max_attempts times, running shards older
+    than straggler_seconds are queued once more for another worker, only the first state of a shard is kept.
+    """
+    def __init__(self, tasks: list, max_attempts: int = 3, straggler_seconds: float = None):
+        self.tasks = tasks
+        self.max_attempts = max_attempts
+        self.straggler_seconds = straggler_seconds
+        self.pending = deque(range(len(tasks)))
+        self.states = {}
+        self.failures = {shard: [] for shard in range(len(tasks))}
+        self.started = {}
+        self.duplicated = set()
+        self.workers = 0
+        self.condition = threading.Condition()
+
+    def finished(self):
+        with self.condition:
+            return all(self._settled(shard) for shard in range(len(self.tasks)))
+
+    def failed(self):
+        """ shards without a state after max_attempts failures.
+        """
+        return [shard for shard in range(len(self.tasks)) if shard not in self.states]
+
+    def _settled(self, shard: int):
+        return shard in self.states or len(self.failures[shard]) >= self.max_attempts
+
+    def _queue_stragglers(self):
+        if self.straggler_seconds is None:
+            return
+        now = time.time()
+        for shard, start in self.started.items():
+            if not self._settled(shard) and shard not in self.duplicated and now - start > self.straggler_seconds:
+                print(f'shard {shard}: running for {now - start:.0f}s, queued for another worker')
+                self.duplicated.add(shard)
+                self.pending.append(shard)
+
+    def next_shard(self):
+        """ next shard to score, None once every shard is settled.
+        """
+        with self.condition:
+            while True:
+                while self.pending:
+                    shard = self.pending.popleft()
+                    if not self._settled(shard):
+                        self.started.setdefault(shard, time.time())
+                        return shard
+                if all(self._settled(shard) for shard in range(len(self.tasks))):
+                    return None
+                self._queue_stragglers()
+                if not self.pending:
+                    self.condition.wait(timeout=1.0)
+
+    def complete(self, shard: int, state: dict):
+        with self.condition:
+            self.states.setdefault(shard, state)
+            self.condition.notify_all()
+
+    def fail(self, shard: int, error: str):
+        with self.condition:
+            if shard in self.states:
+                # a duplicate of a shard already scored
+                return
+            self.failures[shard].append(error)
+            print(f'shard {shard}: attempt {len(self.failures[shard])} failed: {error}')
+            if not self._settled(shard):
+                self.started.pop(shard, None)
+                self.duplicated.discard(shard)
+                self.pending.append(shard)
+            self.condition.notify_all()
+
+    def serve(self, connection):
+        """ feeds one worker connection until every shard is settled or the worker is lost.
+        """
+        with self.condition:
+            self.workers += 1
+        shard = None
+        try:
+            while True:
+                shard = self.next_shard()
+                connection.send(self.tasks[shard] if shard is not None else None)
+                if shard is None:
+                    return
+                reply = connection.recv()
+                if 'error' in reply:
+                    self.fail(shard, reply['error'])
+                else:
+                    self.complete(shard, reply['state'])
+                shard = None
+        except (EOFError, OSError) as ex:
+            if shard is not None:
+                self.fail(shard, f'worker lost: {ex!r}')
+        finally:
+            connection.close()
+            with self.condition:
+                self.workers -= 1
+                self.condition.notify_all()
+
+
+def _accept(listener: Listener, coordinator: Coordinator, stop: threading.Event):
+    """ serves the worker connections to listener until stop is set, closing the listener does not unblock a
+    pending accept, so the coordinator sets stop and connects once more (see _stop_accept).
+    """
+    while True:
+        try:
+            connection = listener.accept()
+        except OSError:
+            # listener closed
+            return
+        except Exception as ex:
+            print(f'rejected worker connection: {ex!r}')
+            continue
+        if stop.is_set():
+            connection.close()
+            return
+        threading.Thread(target=coordinator.serve, args=(connection,), daemon=True).start()
+
+
+def _stop_accept(listener: Listener, authkey: bytes, stop: threading.Event, accept_thread: threading.Thread):
+    stop.set()
+    try:
+        Client(listener.address, authkey=authkey).close()
+    except OSError:
+        pass
+    accept_thread.join(timeout=5)
+    listener.close()
+
+
+def evaluate_sharded(test_annotation_file, user_submission_file, phase_codename, shards: int = None,
+                     local_workers: int = None, address=('127.0.0.1', 0), authkey: bytes = None,
+                     max_attempts: int = 3, straggler_seconds: float = None, idle_seconds: float = 300.0, **kwargs):
+    """
+    Evaluates a submission like evaluate, with its frames split into shards (default 4 per worker) scored by
+    local_workers local processes (default cpu count) and any remote workers connecting to address with authkey
+    (default random, local workers only). Shards follow sequences when temporal metrics are on.
+    With no worker connected for idle_seconds (None: wait forever), the coordinator scores the remaining shards.
+    kwargs are evaluate kwargs, progress and checkpoint options are not used, a manifest_file is written by the
+    coordinator. Returns the evaluate output.
+    """
+    install_requirements()
+    angle_unit = kwargs.get('angle_unit', 'degrees')
+    score_options = {key: kwargs[key] for key in SCORE_OPTIONS if key in kwargs and key not in __COORDINATOR_OPTIONS__}
+    local_workers = os.cpu_count() if local_workers is None else local_workers
+    authkey = authkey or os.urandom(16)
+
+    print(f"# Evaluating for '{phase_codename}' Phase in shards")
+    gt = GroundTruth(test_annotation_file, angle_unit)
+    # the total boxes limit holds for the whole submission, so it is checked here once and not per shard
+    Admission(
+        __GT_BOX_DTYPE__.itemsize, kwargs.get('max_frame_boxes', __MAX_FRAME_BOXES__),
+        kwargs.get('max_total_boxes', __MAX_TOTAL_BOXES__), kwargs.get('admission_policy', 'truncate'),
+    ).check(user_submission_file, gt.index)
+    score_options['max_total_boxes'] = None
+
+    names = list(gt.index)
+    frames = shard_frames(
+        names, gt.previous, shards or 4 * max(local_workers, 1), keep_sequences=bool(score_options.get('temporal'))
+    )
+    tasks = [
+        {
+            'shard': shard, 'frames': shard_names, 'phase_codename': phase_codename, 'angle_unit': angle_unit,
+            'test_annotation_file': str(Path(test_annotation_file).absolute()),
+            'user_submission_file': str(Path(user_submission_file).absolute()),
+            'score_options': score_options,
+        }
+        for shard, shard_names in enumerate(frames)
+    ]
+    coordinator = Coordinator(tasks, max_attempts, straggler_seconds)
+    gts = {(tasks[0]['test_annotation_file'], angle_unit): gt} if tasks else {}
+    listener = Listener(address, authkey=authkey)
+    print(f'coordinator on {listener.address}, {len(tasks)} shards of {len(names)} frames')
+    # local workers get the loaded gt, they are started before any thread so forking is safe
+    processes = [
+        Process(target=run_worker, args=(listener.address, authkey, gts), daemon=True) for _ in range(local_workers)
+    ]
+    stop = threading.Event()
+    accept_thread = threading.Thread(target=_accept, args=(listener, coordinator, stop), daemon=True)
+    try:
+        for process in processes:
+            process.start()
+        accept_thread.start()
+        last_worker = time.time()
+        while not coordinator.finished():
+            with coordinator.condition:
+                coordinator.condition.wait(timeout=1.0)
+                coordinator._queue_stragglers()
+                lost = bool(processes) and coordinator.workers == 0 and not any(p.is_alive() for p in processes)
+                if coordinator.workers:
+                    last_worker = time.time()
+            if lost:
+                print('all workers are gone, scoring the remaining shards here')
+                break
+            if idle_seconds is not None and time.time() - last_worker > idle_seconds:
+                print(f'no worker for {idle_seconds:.0f}s, scoring the remaining shards here')
+                break
+    finally:
+        if accept_thread.is_alive():
+            _stop_accept(listener, authkey, stop, accept_thread)
+        else:
+            listener.close()
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+    for shard in coordinator.failed():
+        print(f'# Score shard {shard} in the coordinator')
+        try:
+            coordinator.states[shard] = score_shard(tasks[shard], gts)
+        except Exception as ex:
+            raise RuntimeError(f'shard {shard} failed: {coordinator.failures[shard] + [repr(ex)]}') from ex
+
+    state = merge_states([coordinator.states[shard] for shard in range(len(tasks))])
+    state['options']['max_total_boxes'] = kwargs.get('max_total_boxes', __MAX_TOTAL_BOXES__)
+    metadata = {
+        'phase_codename': phase_codename,
+        'evaluator': evaluator_digest(),
+        'submission': file_digest(user_submission_file),
+        'options': state['options'],
+    }
+    output = score_output(
+        gt, phase_codename, state, kwargs.get('bootstrap_replicates', 1000), kwargs.get('manifest_file'), metadata
+    )
+    print(f"# Completed evaluation for '{phase_codename}' Phase")
+    return output
@@ -0,0 +1,23 @@
+"""
+Remote worker of a sharded evaluation (see shard.py): connects to the coordinator and scores the shards it sends.
+
+usage: python -m evaluation_script.shard_worker --address coordinator-host:port --authkey <key>
+"""
+import argparse
+
+from .shard import run_worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--address', required=True, help='coordinator host:port')
+    parser.add_argument('--authkey', required=True, help='the authkey evaluate_sharded was given')
+    parser.add_argument('--connect-seconds', type=float, default=300.0, help='how long to wait for the coordinator')
+    args = parser.parse_args()
+
+    host, port = args.address.rsplit(':', 1)
+    run_worker((host, int(port)), args.authkey.encode(), connect_seconds=args.connect_seconds)
+
+
+if __name__ == '__main__':
+    main()
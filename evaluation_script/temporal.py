@@ -0,0 +1,96 @@
+from pathlib import Path
+
+import numpy as np
+
+from .geometry import wrap_angle, xy_iou_matrix
+
+
+def frame_number(name: str):
+    """ frame number of a '0000000001.bin' style frame name, None for other names.
+    """
+    stem = Path(name).stem
+    return int(stem) if stem.isdigit() else None
+
+
+def previous_frames(names):
+    """ maps each frame name to the name of the frame right before it in the same sequence, frames without one are left out.
+    Frames are linked when their numbers are consecutive, a gap in the numbering starts a new sequence.
+    """
+    by_number = {frame_number(name): name for name in names if frame_number(name) is not None}
+    return {name: by_number[number - 1] for number, name in by_number.items() if number - 1 in by_number}
+
+
+def associate(prev_index, index, min_iou: float = 0.1):
+    """ one to one association of boxes of consecutive frames: mutual best xy iou matches above min_iou.
+    Returns (prev_rows, rows) index arrays.
+    """
+    if len(prev_index) == 0 or len(index) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    rows, cols = index.candidate_pairs(prev_index)
+    ious = xy_iou_matrix(prev_index.geometry, index.geometry, rows, cols)
+    best = np.argmax(ious, axis=1)
+    prev_rows = np.arange(len(prev_index))
+    mutual = (np.argmax(ious, axis=0)[best] == prev_rows) & (ious[prev_rows, best] > min_iou)
+    return prev_rows[mutual], best[mutual]
+
+
+class TemporalAccumulator:
+    """
+    ID-free temporal consistency of a submission, frames are fed in order with update().
+    Gt boxes of consecutive frames are associated once per GroundTruth (see GroundTruth.associations), and each
+    associated gt pair is checked for:
+    * detection stability - the gt box is detected (best det xy iou >= detected_iou) in both frames or in neither
+    * heading flip - both are detected and the heading change of their best detections differs from the gt
+      heading change by more than a quarter period
+    Only the previous frame's detection state is kept, no geometry is rebuilt.
+    """
+    def __init__(self, detected_iou: float = 0.5, heading_period: float = 360.0):
+        self.detected_iou = detected_iou
+        self.heading_period = heading_period
+        self.pairs = 0
+        self.stable_pairs = 0
+        self.heading_pairs = 0
+        self.heading_flips = 0
+        self._prev_name = None
+        self._prev_detected = None
+        self._prev_gt_heading = None
+        self._prev_det_heading = None
+
+    def update(self, name: str, prev_name: str, associations, gt_boxes: np.array, gt_xy_ious: np.array,
+               det_heading: np.array):
+        """ name's frame state: gt_xy_ious are the best det xy iou of each gt box and det_heading the heading
+        of that best det (nan when undetected). associations are the (prev_rows, rows) gt pairs with prev_name.
+        """
+        detected = gt_xy_ious >= self.detected_iou
+        if prev_name is not None and prev_name == self._prev_name:
+            prev_rows, rows = associations
+            self.pairs += len(rows)
+            self.stable_pairs += np.count_nonzero(detected[rows] == self._prev_detected[prev_rows])
+
+            both = detected[rows] & self._prev_detected[prev_rows]
+            prev_rows, rows = prev_rows[both], rows[both]
+            gt_heading = gt_boxes['heading'].astype(float)
+            gt_change = gt_heading[rows] - self._prev_gt_heading[prev_rows]
+            det_change = det_heading[rows] - self._prev_det_heading[prev_rows]
+            flips = np.abs(wrap_angle(det_change - gt_change, self.heading_period)) > self.heading_period / 4
+            self.heading_pairs += len(rows)
+            self.heading_flips += np.count_nonzero(flips)
+
+        self._prev_name = name
+        self._prev_detected = detected
+        self._prev_gt_heading = gt_boxes['heading'].astype(float)
+        self._prev_det_heading = det_heading
+
+    def merge(self, other: 'TemporalAccumulator'):
+        """ adds the pairs of other, accumulated over other sequences.
+        """
+        self.pairs += other.pairs
+        self.stable_pairs += other.stable_pairs
+        self.heading_pairs += other.heading_pairs
+        self.heading_flips += other.heading_flips
+
+    def result(self):
+        return {
+            "DETECTION_STABILITY": self.stable_pairs / self.pairs if self.pairs else float('nan'),
+            "HEADING_FLIP_RATE": self.heading_flips / self.heading_pairs if self.heading_pairs else float('nan'),
+        }
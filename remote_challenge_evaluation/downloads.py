@@ -0,0 +1,304 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class ChecksumError(Exception):
+    pass
+
+
+def submission_sha256(submission):
+    """Function to get the expected sha256 of a submission input file, when EvalAI gives one
+
+    Args:
+        submission ([dict]): Submission details, as returned by get_submission_by_pk
+
+    Returns:
+        [str]: Hex sha256 of the input_file_sha256 field or of the sha256 entry of the submission metadata, or None
+    """
+    metadata = submission.get("submission_metadata")
+    if not isinstance(metadata, dict):
+        metadata = {}
+    return submission.get("input_file_sha256") or metadata.get("sha256")
+
+
+def remove_file(path):
+    """Function to delete a file that may not exist, Path.unlink(missing_ok=True) needs Python 3.8"""
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def content_range(response):
+    """Function to parse the Content-Range header of a response
+
+    Returns:
+        [tuple]: (first byte or None, total size or None), (None, None) without a usable header
+    """
+    try:
+        _, spec = response.headers["Content-Range"].split(" ", 1)
+        byte_range, total = spec.split("/", 1)
+        first = None if byte_range == "*" else int(byte_range.split("-", 1)[0])
+        return first, None if total == "*" else int(total)
+    except (KeyError, ValueError):
+        return None, None
+
+
+class SubmissionCache:
+    def __init__(self, directory, max_bytes=10 * 1024 ** 3):
+        """Class to keep downloaded submission files on local disk
+
+        Files are content addressed by their sha256 and indexed by a key, e.g. the submission input file URL.
+        When the cache grows beyond max_bytes the least recently used files are evicted, except pinned files
+        that are still in use (see get, add and unpin).
+
+        Arguments:
+            directory {[str]} -- Cache directory
+
+        Keyword Arguments:
+            max_bytes {[integer]} -- Size budget of the cached files (default: {10 GiB})
+        """
+        self.directory = Path(directory)
+        self.partial_directory = self.directory / "partial"
+        self.partial_directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.index_file = self.directory / "index.json"
+        self.lock = threading.Lock()
+        self.index = json.loads(self.index_file.read_text()) if self.index_file.exists() else {}
+        # cached file to the number of users holding it, pinned files are never evicted
+        self.pins = {}
+
+    def blob_path(self, sha256, suffix=""):
+        return self.directory / "{}{}".format(sha256, suffix)
+
+    def get(self, key, pin=False):
+        """Function to get the cached file of a key
+
+        Args:
+            key ([str]): Cache key
+            pin ([bool]): Pin the file until unpin is called. Defaults to False.
+
+        Returns:
+            [Path]: Cached file or None, a hit marks the file as recently used
+        """
+        with self.lock:
+            entry = self.index.get(key)
+            if entry is None:
+                return None
+            path = self.blob_path(entry["sha256"], entry["suffix"])
+            if not path.exists():
+                del self.index[key]
+                self._save_index()
+                return None
+            os.utime(str(path))
+            if pin:
+                self._pin(path)
+            return path
+
+    def add(self, key, path, sha256, suffix="", pin=False):
+        """Function to move a downloaded file into the cache
+
+        Args:
+            key ([str]): Cache key
+            path ([Path]): Downloaded file, moved into the cache
+            sha256 ([str]): Hex sha256 of the file content
+            suffix ([str]): File suffix kept on the cached file, e.g. '.zip'
+            pin ([bool]): Pin the file until unpin is called. Defaults to False.
+
+        Returns:
+            [Path]: Cached file
+        """
+        with self.lock:
+            blob = self.blob_path(sha256, suffix)
+            os.replace(str(path), str(blob))
+            os.utime(str(blob))
+            self.index[key] = {"sha256": sha256, "suffix": suffix}
+            if pin:
+                self._pin(blob)
+            self._evict(keep=blob)
+            self._save_index()
+            return blob
+
+    def unpin(self, path):
+        """Function to release a file pinned by get or add, it can be evicted once no user holds it"""
+        with self.lock:
+            path = Path(path)
+            count = self.pins.pop(path, 0) - 1
+            if count > 0:
+                self.pins[path] = count
+
+    def _pin(self, path):
+        self.pins[path] = self.pins.get(path, 0) + 1
+
+    def _evict(self, keep):
+        blobs = [p for p in self.directory.iterdir() if p.is_file() and p != self.index_file]
+        total = sum(p.stat().st_size for p in blobs)
+        for blob in sorted(blobs, key=lambda p: p.stat().st_mtime):
+            if total <= self.max_bytes:
+                break
+            if blob == keep or blob in self.pins:
+                continue
+            total -= blob.stat().st_size
+            logger.info("Evicting cached submission file {}".format(blob))
+            blob.unlink()
+        existing = {p.name for p in self.directory.iterdir()}
+        self.index = {
+            key: entry
+            for key, entry in self.index.items()
+            if "{}{}".format(entry["sha256"], entry["suffix"]) in existing
+        }
+
+    def _save_index(self):
+        tmp = self.index_file.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.index))
+        os.replace(str(tmp), str(self.index_file))
+
+
+class DownloadManager:
+    def __init__(self, cache, chunk_size=1024 ** 2, timeout=60, max_retries=3):
+        """Class to download submission files into a SubmissionCache
+
+        Downloads are streamed to disk in chunks and hashed once complete. An interrupted download is resumed
+        with a Range request on the next attempt, conditioned with If-Range on the ETag (or Last-Modified) of the
+        first response, so a file changed on the server is downloaded again whole. Each file is fetched once per
+        cache.
+
+        Arguments:
+            cache {[SubmissionCache]} -- Cache the downloads are stored in
+
+        Keyword Arguments:
+            chunk_size {[integer]} -- Bytes read and written per chunk (default: {1 MiB})
+            timeout {[float]} -- Connect and read timeout in seconds (default: {60})
+            max_retries {[integer]} -- Resumed attempts after a failed download (default: {3})
+        """
+        self.cache = cache
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        self.key_locks = {}
+        self.key_locks_lock = threading.Lock()
+
+    def _key_lock(self, key):
+        with self.key_locks_lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def fetch(self, url, key=None, sha256=None, pin=False):
+        """Function to get the local path of a file, downloading it on a cache miss
+
+        Args:
+            url ([str]): URL of the file
+            key ([str], optional): Cache key. Defaults to the URL without query string.
+            sha256 ([str], optional): Expected hex sha256, verified after download and on a cache hit.
+                                      Defaults to None.
+            pin ([bool]): Keep the file from eviction until release is called. Defaults to False.
+
+        Returns:
+            [Path]: Cached file
+        """
+        key = key or url.split("?")[0]
+        with self._key_lock(key):
+            path = self.cache.get(key, pin=pin)
+            if path is not None and sha256 is not None and path.name.split(".")[0] != sha256:
+                if pin:
+                    self.cache.unpin(path)
+                raise ChecksumError(
+                    "Checksum mismatch of cached {}: expected {}, got {}".format(url, sha256, path.name.split(".")[0])
+                )
+            if path is not None:
+                logger.info("Submission file cache hit {}".format(key))
+                return path
+
+            suffix = "".join(Path(url.split("?")[0]).suffixes)
+            partial = self.cache.partial_directory / "{}.part".format(
+                hashlib.sha256(key.encode()).hexdigest()
+            )
+            for attempt in range(self.max_retries + 1):
+                try:
+                    self._download(url, partial)
+                    break
+                except (
+                    requests.exceptions.ConnectionError,
+                    requests.exceptions.ChunkedEncodingError,
+                    requests.exceptions.Timeout,
+                ):
+                    if attempt == self.max_retries:
+                        raise
+                    logger.info("Download of {} interrupted, resuming".format(url))
+
+            digest = self._sha256(partial)
+            remove_file(self._validator_file(partial))
+            if sha256 is not None and digest != sha256:
+                partial.unlink()
+                raise ChecksumError(
+                    "Checksum mismatch of {}: expected {}, got {}".format(url, sha256, digest)
+                )
+            return self.cache.add(key, partial, digest, suffix, pin=pin)
+
+    def fetch_submission(self, submission, sha256=None, pin=False):
+        """Function to get the local input file of a submission
+
+        Args:
+            submission ([dict]): Submission details, as returned by get_submission_by_pk
+            sha256 ([str], optional): Expected hex sha256 of the input file. Defaults to the one EvalAI gives,
+                                      see submission_sha256.
+            pin ([bool]): Keep the file from eviction until release is called. Defaults to False.
+
+        Returns:
+            [Path]: Cached submission input file
+        """
+        return self.fetch(submission["input_file"], sha256=sha256 or submission_sha256(submission), pin=pin)
+
+    def release(self, path):
+        """Function to release a file fetched with pin=True"""
+        self.cache.unpin(path)
+
+    def _validator_file(self, partial):
+        return partial.with_suffix(".validator")
+
+    def _download(self, url, partial):
+        validator_file = self._validator_file(partial)
+        offset = partial.stat().st_size if partial.exists() else 0
+        validator = validator_file.read_text() if offset and validator_file.exists() else None
+        # a partial file is only resumed with the validator of its first response, else it is downloaded again
+        headers = {"Range": "bytes={}-".format(offset), "If-Range": validator} if validator else {}
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            first, total = content_range(response)
+            if response.status_code == 416 and headers and total == offset:
+                # the partial file is already complete
+                return
+            if headers and (response.status_code == 416 or (response.status_code == 206 and first != offset)):
+                logger.info("Partial download of {} does not match the remote file, downloading it again".format(url))
+                partial.unlink()
+                remove_file(validator_file)
+                return self._download(url, partial)
+            response.raise_for_status()
+            if response.status_code == 206:
+                mode = "ab"
+            else:
+                mode = "wb"
+                # weak ETags can not be used in If-Range
+                etag = response.headers.get("ETag", "")
+                validator = etag if etag and not etag.startswith("W/") else response.headers.get("Last-Modified")
+                if validator:
+                    validator_file.write_text(validator)
+                else:
+                    remove_file(validator_file)
+            with open(partial, mode) as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    f.write(chunk)
+
+    def _sha256(self, path):
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
@@ -1,7 +1,10 @@
+import asyncio
 import logging
+import random
 import requests
 import json
 import time
+import urllib3
 
 logger = logging.getLogger(__name__)
 
@@ -14,8 +17,40 @@ URLS = {
 }
 
 
+# responses worth retrying, anything else is returned to the caller as is
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# methods retried after any connection error or timeout, others only when the request was never sent (see request_not_sent)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "DELETE")
+
+
+def request_not_sent(error):
+    """Function to tell whether a connection error was raised before the request reached the server
+
+    Args:
+        error ([requests.exceptions.RequestException]): Error of a request
+
+    Returns:
+        [bool]: True for a connect timeout or a new connection that failed, which are safe to retry for any method
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+
 class EvalAI_Interface:
-    def __init__(self, AUTH_TOKEN, EVALAI_API_SERVER, QUEUE_NAME, CHALLENGE_PK):
+    def __init__(
+        self,
+        AUTH_TOKEN,
+        EVALAI_API_SERVER,
+        QUEUE_NAME,
+        CHALLENGE_PK,
+        timeout=30,
+        max_retries=3,
+        backoff_factor=1.0,
+        pool_maxsize=10,
+    ):
         """Class to initiate call to EvalAI backend
 
         Arguments:
@@ -23,12 +58,29 @@ class EvalAI_Interface:
             EVALAI_API_SERVER {[string]} -- It should be set to https://eval.ai # For production server
             QUEUE_NAME {[string]} -- Unique queue name corresponding to every challenge
             CHALLENGE_PK {[integer]} -- Primary key corresponding to a challenge
+
+        Keyword Arguments:
+            timeout {[float]} -- Connect and read timeout of each request in seconds (default: {30})
+            max_retries {[integer]} -- Retries of a request failing with a connection error or a 429/5xx status,
+                POST/PUT/PATCH requests that may have reached the server are not retried (default: {3})
+            backoff_factor {[float]} -- Base of the jittered exponential backoff between retries in seconds (default: {1.0})
+            pool_maxsize {[integer]} -- Keep-alive connections kept open to the EvalAI server (default: {10})
         """
 
         self.AUTH_TOKEN = AUTH_TOKEN
         self.EVALAI_API_SERVER = EVALAI_API_SERVER
         self.QUEUE_NAME = QUEUE_NAME
         self.CHALLENGE_PK = CHALLENGE_PK
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+
+        # one pooled session, connections are kept alive across requests
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(self.get_request_headers())
 
     def get_request_headers(self):
         """Function to get the header of the EvalAI request in proper format
@@ -50,16 +102,42 @@ class EvalAI_Interface:
         Returns:
             [JSON]: JSON response data
         """
-        headers = self.get_request_headers()
-        try:
-            response = requests.request(
-                method=method, url=url, headers=headers, data=data
-            )
-            response.raise_for_status()
-        except requests.exceptions.RequestException:
-            logger.info("The server isn't able establish connection with EvalAI")
-            raise
-        return response.json()
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.request(
+                    method=method, url=url, data=data, timeout=self.timeout
+                )
+                if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                    logger.info("EvalAI responded {}, retrying".format(response.status_code))
+                else:
+                    response.raise_for_status()
+                    return response.json()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as ex:
+                # a non idempotent request that timed out or lost its connection may already have been applied
+                retry = method.upper() in IDEMPOTENT_METHODS or request_not_sent(ex)
+                if attempt == self.max_retries or not retry:
+                    logger.info("The server isn't able establish connection with EvalAI")
+                    raise
+                logger.info("Connection to EvalAI failed, retrying")
+            except requests.exceptions.RequestException:
+                logger.info("The server isn't able establish connection with EvalAI")
+                raise
+            time.sleep(self.retry_delay(attempt))
+
+    def retry_delay(self, attempt):
+        """Function to get the delay before a retry, exponential backoff with full jitter
+
+        Args:
+            attempt ([int]): Number of the failed attempt, starting from 0
+
+        Returns:
+            [float]: Delay in seconds
+        """
+        return random.uniform(0, self.backoff_factor * (2 ** attempt))
+
+    def close(self):
+        """Function to close the pooled connections"""
+        self.session.close()
 
     def return_url_per_environment(self, url):
         """Function to get the URL for API
@@ -143,6 +221,57 @@ class EvalAI_Interface:
         return response
 
 
+class AsyncEvalAI_Interface(EvalAI_Interface):
+    """asyncio variant of EvalAI_Interface
+
+    Every API method returns an awaitable, e.g. `message = await evalai.get_message_from_sqs_queue()`.
+    Requests go through the same pooled session and retry policy, run in the default executor of the event loop.
+    """
+
+    async def make_request(self, url, method, data=None):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None, super(AsyncEvalAI_Interface, self).make_request, url, method, data
+        )
+
+
+class AdaptivePoller:
+    def __init__(self, min_interval=1, max_interval=60, backoff=2.0, jitter=0.1):
+        """Class to compute the queue polling interval
+
+        Polls quickly while the queue is busy and backs off exponentially up to max_interval while it is idle.
+
+        Keyword Arguments:
+            min_interval {[float]} -- Interval in seconds after a message was received (default: {1})
+            max_interval {[float]} -- Largest interval in seconds of an idle queue (default: {60})
+            backoff {[float]} -- Interval growth factor per empty poll (default: {2.0})
+            jitter {[float]} -- Relative random jitter added to each interval (default: {0.1})
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.interval = min_interval
+
+    def next_interval(self, received_message):
+        """Function to get the time to wait before the next poll
+
+        Args:
+            received_message ([bool]): Whether the last poll returned a message
+
+        Returns:
+            [float]: Interval in seconds
+        """
+        if received_message:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+        return self.interval * (1 + random.uniform(0, self.jitter))
+
+    def sleep(self, received_message):
+        time.sleep(self.next_interval(received_message))
+
+
 if __name__ == "__main__":
 
     auth_token = ""  # Go to EvalAI UI to fetch your auth token
@@ -154,6 +283,7 @@ if __name__ == "__main__":
     evalai = EvalAI_Interface(auth_token, evalai_api_server, queue_name, challenge_pk)
 
     # Q. How to set up the remote evaluation?
+    poller = AdaptivePoller()
     while True:
         # Get the message from the queue
         message = evalai.get_message_from_sqs_queue()
@@ -182,8 +312,8 @@ if __name__ == "__main__":
                 # Run the submission with the input file using your own code and data.
                 pass
 
-        # Poll challenge queue for new submissions
-        time.sleep(60)
+        # Poll challenge queue for new submissions, quickly while busy and backing off while idle
+        poller.sleep(bool(message_body))
 
     # Q. How to update EvalAI with the submission state?
 
@@ -0,0 +1,294 @@
+import asyncio
+import contextlib
+import functools
+import importlib
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import requests
+
+from downloads import DownloadManager, SubmissionCache
+from evaluation_script_starter import AdaptivePoller, AsyncEvalAI_Interface
+
+logger = logging.getLogger(__name__)
+
+
+# submission states after which the queue message is only deleted
+DONE_STATUSES = ("finished", "failed", "cancelled")
+
+
+def result_to_evalai(output):
+    """Function to convert the evaluate() output to the result format of update_submission_data
+
+    Args:
+        output ([dict]): evaluate() output, {"result": [{"<split>": {"<metric>": value}}]}
+
+    Returns:
+        [str]: JSON result, [{"split": "<split>", "show_to_participant": true, "accuracies": {...}}]
+    """
+    result = []
+    for split_result in output["result"]:
+        for split, accuracies in split_result.items():
+            result.append(
+                {"split": split, "show_to_participant": True, "accuracies": accuracies}
+            )
+    return json.dumps(result)
+
+
+def run_evaluation(evaluation_script_dir, annotation_file, input_file, phase_codename, submission_metadata,
+                   evaluate_kwargs=None):
+    """Function to run evaluate() in a worker process, capturing its stdout
+
+    Args:
+        evaluation_script_dir ([str]): Directory containing the evaluation_script package
+        annotation_file ([str]): Test annotation file of the phase
+        input_file ([str]): Downloaded submission file
+        phase_codename ([str]): Codename of the phase
+        submission_metadata ([dict]): Submission details passed to evaluate() as kwargs['submission_metadata']
+        evaluate_kwargs ([dict]): Further evaluate() kwargs, e.g. memory_budget
+
+    Returns:
+        [dict]: output of evaluate() or None, captured stdout and the traceback of a failure as stderr
+    """
+    if evaluation_script_dir not in sys.path:
+        sys.path.append(evaluation_script_dir)
+    stdout = io.StringIO()
+    output, stderr = None, ""
+    with contextlib.redirect_stdout(stdout):
+        try:
+            evaluation_module = importlib.import_module("evaluation_script")
+            output = evaluation_module.evaluate(
+                annotation_file,
+                input_file,
+                phase_codename,
+                submission_metadata=submission_metadata,
+                **(evaluate_kwargs or {}),
+            )
+        except Exception:
+            stderr = traceback.format_exc()
+    return {"output": output, "stdout": stdout.getvalue(), "stderr": stderr}
+
+
+class SubmissionWorker:
+    def __init__(self, evalai, phases, slots=None, evaluation_script_dir=None, poller=None, downloads=None, prefetch=1,
+                 memory_budget=None):
+        """Class to evaluate the submissions of a challenge queue concurrently
+
+        Messages are pulled only while an evaluation or prefetch slot is free, so the input files of the next
+        submissions download while the previous ones are scored. Each submission runs evaluate() in a process pool
+        and its RUNNING/FINISHED/FAILED status is sent to EvalAI without blocking the other slots.
+        A pool broken by a dying evaluation process (e.g. killed out of memory) is replaced, and the evaluations it
+        broke are run again in a process of their own, so only the submission that kills its process is failed.
+
+        Arguments:
+            evalai {[AsyncEvalAI_Interface]} -- EvalAI client of the challenge
+            phases {[dict]} -- phase_pk to {"codename": <phase codename>, "annotation_file": <test annotation file>}
+
+        Keyword Arguments:
+            slots {[integer]} -- Submissions evaluated concurrently (default: {cpu count})
+            evaluation_script_dir {[str]} -- Directory containing the evaluation_script package (default: {repository root})
+            poller {[AdaptivePoller]} -- Queue polling interval policy (default: {AdaptivePoller()})
+            downloads {[DownloadManager]} -- Submission file downloads (default: {cache in the temp directory})
+            prefetch {[integer]} -- Submissions downloaded ahead of a free evaluation slot (default: {1})
+            memory_budget {[integer]} -- Bytes all evaluation slots together should stay within, split evenly between
+                                         the slots and passed to evaluate() (default: {None, unbounded})
+        """
+        self.evalai = evalai
+        self.phases = {str(phase_pk): phase for phase_pk, phase in phases.items()}
+        self.slots = slots or os.cpu_count()
+        self.evaluation_script_dir = evaluation_script_dir or str(Path(__file__).absolute().parent.parent)
+        self.poller = poller or AdaptivePoller()
+        self.downloads = downloads or DownloadManager(
+            SubmissionCache(Path(tempfile.gettempdir()) / "evalai_submission_cache")
+        )
+        self.prefetch = prefetch
+        self.memory_budget = memory_budget
+        # submissions being evaluated by this worker, redelivered messages for them are skipped.
+        # EvalAI's queue API has no visibility extension, a redelivered message is recognized by its submission pk
+        self.in_flight = set()
+        # created in the running loop by run_submission, asyncio primitives bind to a loop before Python 3.10
+        self.evaluation_slots = None
+        # process pool evaluate() runs in, created by run() and replaced when it breaks
+        self.executor = None
+
+    async def run(self):
+        """Function to run the worker until cancelled"""
+        loop = asyncio.get_event_loop()
+        free_slots = asyncio.Semaphore(self.slots + self.prefetch)
+        self.executor = ProcessPoolExecutor(max_workers=self.slots)
+        try:
+            while True:
+                await free_slots.acquire()
+                try:
+                    message = await self.evalai.get_message_from_sqs_queue()
+                except requests.exceptions.RequestException:
+                    message = {}
+                message_body = message.get("body")
+                if not message_body:
+                    free_slots.release()
+                    await asyncio.sleep(self.poller.next_interval(False))
+                    continue
+
+                task = loop.create_task(self.handle_message(message))
+                task.add_done_callback(lambda _: free_slots.release())
+                await asyncio.sleep(self.poller.next_interval(True))
+        finally:
+            self.executor.shutdown()
+
+    async def handle_message(self, message):
+        """Function to process one queue message, evaluating its submission if it is new
+
+        Args:
+            message ([dict]): Queue message, as returned by get_message_from_sqs_queue
+        """
+        message_body = message["body"]
+        submission_pk = message_body.get("submission_pk")
+        phase_pk = message_body.get("phase_pk")
+        if submission_pk in self.in_flight:
+            return
+
+        try:
+            submission = await self.evalai.get_submission_by_pk(submission_pk)
+            status = submission.get("status")
+            if status in DONE_STATUSES:
+                await self.evalai.delete_message_from_sqs_queue(message.get("receipt_handle"))
+            elif status == "running":
+                # Do nothing on EvalAI, evaluated by another worker
+                pass
+            else:
+                self.in_flight.add(submission_pk)
+                try:
+                    await self.evaluate_submission(submission, submission_pk, phase_pk)
+                finally:
+                    self.in_flight.discard(submission_pk)
+                await self.evalai.delete_message_from_sqs_queue(message.get("receipt_handle"))
+        except Exception:
+            logger.exception("Failed handling submission {}".format(submission_pk))
+
+    def evaluate_kwargs(self):
+        if self.memory_budget is None:
+            return {}
+        return {"memory_budget": self.memory_budget // self.slots}
+
+    async def evaluate_submission(self, submission, submission_pk, phase_pk):
+        phase = self.phases.get(str(phase_pk))
+        if phase is None:
+            evaluation = {
+                "output": None,
+                "stdout": "",
+                "stderr": "Phase {} is not evaluated by this worker, its phases are {}".format(
+                    phase_pk, sorted(self.phases)
+                ),
+            }
+        else:
+            evaluation = await self.run_submission(submission, submission_pk, phase)
+
+        submission_data = {
+            "challenge_phase": phase_pk,
+            "submission": submission_pk,
+            "stdout": evaluation["stdout"],
+            "stderr": evaluation["stderr"],
+            "metadata": "",
+        }
+        if evaluation["output"] is not None:
+            submission_data["submission_status"] = "FINISHED"
+            submission_data["result"] = result_to_evalai(evaluation["output"])
+        else:
+            submission_data["submission_status"] = "FAILED"
+        await self.evalai.update_submission_data(submission_data)
+
+    def replace_executor(self, broken):
+        """Function to replace the broken process pool, once for all the evaluations it broke
+
+        Args:
+            broken ([ProcessPoolExecutor]): Pool an evaluation failed in with BrokenProcessPool
+        """
+        if self.executor is broken:
+            logger.warning("The evaluation process pool broke, starting a new one")
+            broken.shutdown(wait=False)
+            self.executor = ProcessPoolExecutor(max_workers=self.slots)
+
+    async def run_submission(self, submission, submission_pk, phase):
+        """Function to download and evaluate a submission, it is reported RUNNING once it holds an evaluation slot
+
+        Returns:
+            [dict]: run_evaluation result, the traceback as stderr when the download or the evaluation failed
+        """
+        loop = asyncio.get_event_loop()
+        try:
+            # pinned, so the cache does not evict the file while it waits for a slot or is evaluated
+            input_file = await loop.run_in_executor(
+                None, functools.partial(self.downloads.fetch_submission, submission, pin=True)
+            )
+        except Exception:
+            return {"output": None, "stdout": "", "stderr": traceback.format_exc()}
+
+        if self.evaluation_slots is None:
+            self.evaluation_slots = asyncio.Semaphore(self.slots)
+        evaluation = functools.partial(
+            run_evaluation,
+            self.evaluation_script_dir,
+            phase["annotation_file"],
+            str(input_file),
+            phase["codename"],
+            submission,
+            self.evaluate_kwargs(),
+        )
+        try:
+            async with self.evaluation_slots:
+                await self.evalai.update_submission_status(
+                    {"submission": submission_pk, "job_name": "", "submission_status": "RUNNING"}
+                )
+                executor = self.executor
+                try:
+                    return await loop.run_in_executor(executor, evaluation)
+                except BrokenProcessPool:
+                    self.replace_executor(executor)
+                except Exception:
+                    return {"output": None, "stdout": "", "stderr": traceback.format_exc()}
+
+                # the pool broke under every evaluation it ran, only the one that also breaks a pool of its own fails
+                logger.warning("Evaluating submission {} again in its own process".format(submission_pk))
+                with ProcessPoolExecutor(max_workers=1) as isolated:
+                    try:
+                        return await loop.run_in_executor(isolated, evaluation)
+                    except BrokenProcessPool:
+                        return {
+                            "output": None,
+                            "stdout": "",
+                            "stderr": "The evaluation process died, e.g. killed for running out of memory\n"
+                                      + traceback.format_exc(),
+                        }
+                    except Exception:
+                        return {"output": None, "stdout": "", "stderr": traceback.format_exc()}
+        finally:
+            self.downloads.release(input_file)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    evalai = AsyncEvalAI_Interface(
+        os.environ.get("AUTH_TOKEN", ""),  # Go to EvalAI UI to fetch your auth token
+        os.environ.get("EVALAI_API_SERVER", "https://eval.ai"),
+        os.environ.get("QUEUE_NAME", ""),  # Please email EvalAI admin (team@cloudcv.org) to get the queue name
+        os.environ.get("CHALLENGE_PK", ""),  # Please email EvalAI admin (team@cloudcv.org) to get the challenge primary key
+    )
+    # e.g. PHASES='{"<phase_pk>": {"codename": "dev", "annotation_file": "../annotations/test_annotations_devsplit.zip"}}'
+    phases = json.loads(os.environ.get("PHASES", "{}"))
+    slots = int(os.environ.get("WORKER_SLOTS", "0")) or None
+    cache_dir = os.environ.get("SUBMISSION_CACHE_DIR", str(Path(tempfile.gettempdir()) / "evalai_submission_cache"))
+    cache_bytes = int(os.environ.get("SUBMISSION_CACHE_BYTES", str(10 * 1024 ** 3)))
+    memory_budget = int(os.environ.get("WORKER_MEMORY_BUDGET", "0")) or None
+
+    downloads = DownloadManager(SubmissionCache(cache_dir, max_bytes=cache_bytes))
+    worker = SubmissionWorker(evalai, phases, slots=slots, downloads=downloads, memory_budget=memory_budget)
+    asyncio.get_event_loop().run_until_complete(worker.run())
@@ -0,0 +1,74 @@
+"""
+Shared test setup: the repository root and the remote worker folder on sys.path (the remote worker modules import
+each other as top level modules) and a local stub http server standing in for EvalAI and the submission storage.
+"""
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).absolute().parent.parent
+for path in (ROOT, ROOT / "remote_challenge_evaluation"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+
+class StubServer:
+    """
+    Local http server answering each request with respond(method, path, headers, body) -> (status, headers, body),
+    every request is recorded as (method, path, headers, body, client port). A Content-Length header above the
+    body length sends a truncated body and closes the connection.
+    """
+    def __init__(self, respond):
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def handle_request(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                stub.requests.append((self.command, self.path, dict(self.headers), body, self.client_address[1]))
+                status, headers, payload = respond(self.command, self.path, self.headers, body)
+                headers = dict(headers)
+                length = int(headers.pop("Content-Length", len(payload)))
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(length))
+                self.end_headers()
+                self.wfile.write(payload)
+                if length != len(payload):
+                    # a body shorter than its Content-Length, closed like an interrupted transfer
+                    self.close_connection = True
+
+            do_GET = do_POST = do_PUT = do_PATCH = handle_request
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:{}".format(self.server.server_address[1])
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    """ starts StubServer(respond) servers, shut down after the test. """
+    servers = []
+
+    def start(respond):
+        servers.append(StubServer(respond))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
@@ -0,0 +1,122 @@
+import hashlib
+import os
+from pathlib import Path
+
+import pytest
+
+from downloads import ChecksumError, DownloadManager, SubmissionCache
+
+
+class RemoteFile:
+    """ file served by the stub server with Range and If-Range support, the first truncate responses are cut """
+    def __init__(self, content, etag='"v1"', if_range=True, truncate=0):
+        self.content = content
+        self.etag = etag
+        self.if_range = if_range
+        self.truncate = truncate
+
+    def __call__(self, method, path, headers, body):
+        size = len(self.content)
+        if headers.get("Range") and (not self.if_range or headers.get("If-Range") in (None, self.etag)):
+            start = int(headers["Range"][len("bytes="):-1])
+            if start >= size:
+                return 416, {"Content-Range": "bytes */{}".format(size)}, b""
+            return 206, {"Content-Range": "bytes {}-{}/{}".format(start, size - 1, size), "ETag": self.etag}, \
+                self.content[start:]
+        if self.truncate:
+            self.truncate -= 1
+            return 200, {"ETag": self.etag, "Content-Length": str(size)}, self.content[:size // 2]
+        return 200, {"ETag": self.etag}, self.content
+
+
+def sha256(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+@pytest.fixture
+def downloads(tmp_path):
+    return DownloadManager(SubmissionCache(tmp_path / "cache"), chunk_size=64, timeout=5)
+
+
+def test_downloads_once_per_key(stub_server, downloads):
+    server = stub_server(RemoteFile(b"x" * 1000))
+    first = downloads.fetch(server.url + "/submission.zip?signature=1")
+    second = downloads.fetch(server.url + "/submission.zip?signature=2")
+    assert first == second and first.read_bytes() == b"x" * 1000
+    assert first.name == sha256(b"x" * 1000) + ".zip"
+    assert len(server.requests) == 1
+
+
+def test_interrupted_download_resumes_with_if_range(stub_server, downloads):
+    content = bytes(range(256)) * 8
+    server = stub_server(RemoteFile(content, truncate=1))
+    assert downloads.fetch(server.url + "/submission.zip").read_bytes() == content
+    resumed = server.requests[1][2]
+    assert resumed["Range"] == "bytes={}-".format(len(content) // 2)
+    assert resumed["If-Range"] == '"v1"'
+
+
+def test_changed_remote_file_is_not_spliced(stub_server, downloads):
+    remote = RemoteFile(b"a" * 1000, truncate=1)
+    server = stub_server(remote)
+    with pytest.raises(Exception):
+        DownloadManager(downloads.cache, chunk_size=64, timeout=5, max_retries=0).fetch(server.url + "/submission.zip")
+    remote.content, remote.etag = b"b" * 1000, '"v2"'
+    assert downloads.fetch(server.url + "/submission.zip").read_bytes() == b"b" * 1000
+
+
+def partial_file(downloads, url, content, validator='"v1"'):
+    partial = downloads.cache.partial_directory / "{}.part".format(sha256(url.encode()))
+    partial.write_bytes(content)
+    partial.with_suffix(".validator").write_text(validator)
+
+
+def test_stale_partial_answered_416_is_downloaded_again(stub_server, downloads):
+    # a server ignoring If-Range answers the range of a longer stale partial file with 416
+    server = stub_server(RemoteFile(b"new" * 10, if_range=False))
+    url = server.url + "/submission.zip"
+    partial_file(downloads, url, b"old" * 100)
+    assert downloads.fetch(url).read_bytes() == b"new" * 10
+    assert [request[0] for request in server.requests] == ["GET", "GET"]
+
+
+def test_complete_partial_answered_416_is_kept(stub_server, downloads):
+    server = stub_server(RemoteFile(b"done" * 10))
+    url = server.url + "/submission.zip"
+    partial_file(downloads, url, b"done" * 10)
+    assert downloads.fetch(url).read_bytes() == b"done" * 10
+    assert len(server.requests) == 1
+
+
+def test_downloads_without_unlink_missing_ok(stub_server, downloads, monkeypatch):
+    # Path.unlink of Python 3.7 has no missing_ok argument
+    monkeypatch.setattr(Path, "unlink", lambda self: os.unlink(str(self)))
+    server = stub_server(RemoteFile(b"new" * 10, etag="", if_range=False))
+    url = server.url + "/submission.zip"
+    partial_file(downloads, url, b"old" * 100)
+    assert downloads.fetch(url).read_bytes() == b"new" * 10
+
+
+def test_submission_checksum_from_evalai(stub_server, downloads):
+    server = stub_server(RemoteFile(b"x" * 100))
+    with pytest.raises(ChecksumError):
+        downloads.fetch_submission({"input_file": server.url + "/a.zip", "input_file_sha256": sha256(b"y")})
+    path = downloads.fetch_submission(
+        {"input_file": server.url + "/b.zip", "submission_metadata": {"sha256": sha256(b"x" * 100)}}
+    )
+    assert path.read_bytes() == b"x" * 100
+    # a cache hit is verified too
+    with pytest.raises(ChecksumError):
+        downloads.fetch_submission({"input_file": server.url + "/b.zip", "input_file_sha256": sha256(b"y")})
+
+
+def test_pinned_files_are_not_evicted(stub_server, tmp_path):
+    server = stub_server(lambda method, path, headers, body: (200, {}, path.encode() * 20))
+    downloads = DownloadManager(SubmissionCache(tmp_path / "cache", max_bytes=150))
+    in_use = downloads.fetch(server.url + "/a.zip", pin=True)
+    downloads.fetch(server.url + "/b.zip")
+    assert in_use.exists()
+    downloads.release(in_use)
+    downloads.fetch(server.url + "/c.zip")
+    assert not in_use.exists()
+    assert downloads.cache.get(server.url + "/a.zip") is None
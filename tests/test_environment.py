@@ -0,0 +1,73 @@
+import sys
+from concurrent import futures
+
+import pytest
+
+from conftest import ROOT
+
+pytest.importorskip("gym")
+grpc = pytest.importorskip("grpc")
+for path in ("environment", "utils"):
+    sys.path.insert(0, str(ROOT / "code_upload_challenge_evaluation" / path))
+
+import environment  # noqa: E402
+import evaluation_pb2  # noqa: E402
+import evaluation_pb2_grpc  # noqa: E402
+from codec import action_to_message  # noqa: E402
+
+
+@pytest.fixture
+def servicer(monkeypatch):
+    monkeypatch.setattr(environment, "LOCAL_EVALUATION", "1")
+    return environment.Environment("1", "1", "1", None)
+
+
+@pytest.fixture
+def stub(servicer):
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+    evaluation_pb2_grpc.add_EnvironmentServicer_to_server(servicer, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    with grpc.insecure_channel("127.0.0.1:{}".format(port)) as channel:
+        yield evaluation_pb2_grpc.EnvironmentStub(channel)
+    server.stop(0)
+
+
+def test_pickled_rpcs_are_not_served(stub):
+    for rpc in (stub.act_on_environment, stub.get_action_space):
+        with pytest.raises(grpc.RpcError) as error:
+            rpc(evaluation_pb2.Package(SerializedEntity=b"not unpickled"))
+        assert error.value.code() == grpc.StatusCode.UNIMPLEMENTED
+
+
+def test_typed_step(stub):
+    assert list(stub.GetActionSpace(evaluation_pb2.Empty()).actions) == [0, 1]
+    result = stub.Step(action_to_message(1))
+    assert result.current_score >= 1
+
+
+def test_open_sessions_are_capped(stub, monkeypatch):
+    monkeypatch.setattr(environment, "MAX_SESSIONS", 2)
+    sessions = [stub.CreateSession(evaluation_pb2.SessionRequest(num_envs=1)) for _ in range(2)]
+    with pytest.raises(grpc.RpcError) as error:
+        stub.CreateSession(evaluation_pb2.SessionRequest(num_envs=1))
+    assert error.value.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+    stub.CloseSession(sessions[0])
+    stub.CreateSession(evaluation_pb2.SessionRequest(num_envs=1))
+
+
+def test_idle_sessions_are_closed(stub, servicer, monkeypatch):
+    monkeypatch.setattr(environment, "MAX_SESSIONS", 1)
+    monkeypatch.setattr(environment, "SESSION_IDLE_SECONDS", 0)
+    idle = stub.CreateSession(evaluation_pb2.SessionRequest(num_envs=1))
+    session = stub.CreateSession(evaluation_pb2.SessionRequest(num_envs=1))
+    assert list(servicer.sessions) == [session.session_id] != [idle.session_id]
+
+
+def test_result_is_reported_outside_the_step_lock(servicer, monkeypatch):
+    reported = []
+    monkeypatch.setattr(servicer, "complete", lambda: reported.append(servicer.lock.locked()))
+    monkeypatch.setattr(environment, "env", environment.evaluator_environment())
+    while not reported:
+        servicer.step(1)
+    assert reported == [False]
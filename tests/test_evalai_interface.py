@@ -0,0 +1,93 @@
+import asyncio
+import json
+import socket
+import time
+
+import pytest
+import requests
+
+from evaluation_script_starter import AdaptivePoller, AsyncEvalAI_Interface, EvalAI_Interface
+
+
+def json_response(payload, status=200):
+    return status, {"Content-Type": "application/json"}, json.dumps(payload).encode()
+
+
+def test_retries_5xx_then_returns_json(stub_server):
+    statuses = [503, 502, 200]
+
+    def respond(method, path, headers, body):
+        return json_response({"body": {"submission_pk": 1}}, statuses.pop(0))
+
+    server = stub_server(respond)
+    evalai = EvalAI_Interface("token", server.url, "queue", 1, backoff_factor=0)
+    assert evalai.get_message_from_sqs_queue() == {"body": {"submission_pk": 1}}
+    assert len(server.requests) == 3
+    assert all(request[2]["Authorization"] == "Bearer token" for request in server.requests)
+
+
+def test_gives_up_after_max_retries(stub_server):
+    server = stub_server(lambda *args: json_response({}, 503))
+    evalai = EvalAI_Interface("token", server.url, "queue", 1, max_retries=2, backoff_factor=0)
+    with pytest.raises(requests.exceptions.HTTPError):
+        evalai.get_submission_by_pk(1)
+    assert len(server.requests) == 3
+
+
+def test_client_errors_are_not_retried(stub_server):
+    server = stub_server(lambda *args: json_response({}, 404))
+    evalai = EvalAI_Interface("token", server.url, "queue", 1, backoff_factor=0)
+    with pytest.raises(requests.exceptions.HTTPError):
+        evalai.get_submission_by_pk(1)
+    assert len(server.requests) == 1
+
+
+def test_requests_share_a_keep_alive_connection(stub_server):
+    server = stub_server(lambda *args: json_response({}))
+    evalai = EvalAI_Interface("token", server.url, "queue", 1)
+    for _ in range(3):
+        evalai.get_submission_by_pk(1)
+    assert len({request[4] for request in server.requests}) == 1
+
+
+def test_async_interface(stub_server):
+    server = stub_server(lambda method, path, headers, body: json_response({"method": method, "path": path}))
+    evalai = AsyncEvalAI_Interface("token", server.url, "queue", 7)
+    response = asyncio.run(evalai.update_submission_status({"submission": 1, "submission_status": "RUNNING"}))
+    assert response == {"method": "PATCH", "path": "/api/jobs/challenge/7/update_submission/"}
+    assert b"submission_status=RUNNING" in server.requests[0][3]
+
+
+def slow_response(*args):
+    time.sleep(0.5)
+    return json_response({})
+
+
+def test_read_timeouts_are_retried_for_get_only(stub_server):
+    server = stub_server(slow_response)
+    evalai = EvalAI_Interface("token", server.url, "queue", 1, timeout=0.1, max_retries=2, backoff_factor=0)
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        evalai.get_submission_by_pk(1)
+    assert len(server.requests) == 3
+    # the update may have been applied, so it is not sent again
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        evalai.update_submission_data({"submission": 1, "submission_status": "FINISHED"})
+    assert [request[0] for request in server.requests[3:]] == ["PUT"]
+
+
+def test_refused_connections_are_retried_for_every_method():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    evalai = EvalAI_Interface("token", "http://127.0.0.1:{}".format(port), "queue", 1, max_retries=2, backoff_factor=0)
+    attempts = []
+    evalai.retry_delay = lambda attempt: attempts.append(attempt) or 0
+    with pytest.raises(requests.exceptions.ConnectionError):
+        evalai.update_submission_status({"submission": 1, "submission_status": "RUNNING"})
+    assert attempts == [0, 1]
+
+
+def test_adaptive_poller_backs_off_while_idle():
+    poller = AdaptivePoller(min_interval=1, max_interval=8, backoff=2.0, jitter=0)
+    assert [poller.next_interval(False) for _ in range(4)] == [2, 4, 8, 8]
+    assert poller.next_interval(True) == 1
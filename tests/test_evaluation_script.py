@@ -0,0 +1,143 @@
+import io
+import json
+import tarfile
+import zipfile
+
+import numpy as np
+import pytest
+
+from conftest import ROOT
+from evaluation_script import GroundTruth, evaluate, evaluate_arrays, evaluate_many
+from evaluation_script.admission import AdmissionError
+from evaluation_script.checkpoint import Journal
+from evaluation_script.geometry import xy_iou_matrix
+from evaluation_script.main import FrameIndex, as_boxes
+
+
+def boxes(*rows):
+    """ (N, 8) x, y, z, length, width, height, heading, class rows """
+    return np.array(rows, dtype=float).reshape(-1, 8)
+
+
+def test_skip_empty_gt_with_an_empty_gt_frame():
+    # the second gt frame has no boxes while its det frame has one, point counts are loaded
+    gt_frames = {'0000000000.bin': boxes([0, 0, 0, 4, 2, 1.5, 0, 1], [10, 0, 0, 4, 2, 1.5, 0, 1]),
+                 '0000000001.bin': boxes()}
+    points = {'0000000000.bin': np.array([[0, 0, 0, 1]] * 5, dtype=np.float32),
+              '0000000001.bin': np.array([[5, 5, 0, 1]], dtype=np.float32)}
+    gt = GroundTruth.from_frames(gt_frames, points=points)
+    predictions = {'0000000000.bin': boxes([0, 0, 0, 4, 2, 1.5, 0, 1]),
+                   '0000000001.bin': boxes([5, 5, 0, 4, 2, 1.5, 0, 1])}
+    result = evaluate_arrays(gt, predictions, skip_empty_gt=True, bootstrap_replicates=0)['submission_result']
+    # the box without points is skipped, the matched box is perfect and the unmatched det counts as a false positive
+    assert np.isclose(result['AVG_GT_VS_DET_XY_IOU'], 1)
+    assert np.isclose(result['XY_PRECISION_50'], 0.5)
+
+
+def test_trailing_bytes_of_a_submission_frame_are_ignored(tmp_path):
+    gt_file = ROOT / 'annotations' / 'test_annotations_devsplit.zip'
+    with zipfile.ZipFile(ROOT / 'submission.zip') as source:
+        frames = {name: source.read(name) for name in source.namelist()}
+    stray = tmp_path / 'stray.zip'
+    with zipfile.ZipFile(stray, 'w') as target:
+        for i, (name, data) in enumerate(sorted(frames.items())):
+            target.writestr(name, data + b'\0' if i == 0 else data)
+    clean = evaluate(gt_file, ROOT / 'submission.zip', 'dev')['submission_result']
+    assert evaluate(gt_file, stray, 'dev')['submission_result']['AVG_XY_IOU'] == clean['AVG_XY_IOU']
+
+
+def test_bootstrap_intervals_do_not_depend_on_the_scoring_order():
+    rng = np.random.default_rng(0)
+    gt_frames = {f'{i:010d}.bin': boxes(*[[x, 0, 0, 4, 2, 1.5, 0, 1] for x in range(0, 10 * n, 10)])
+                 for i, n in enumerate(rng.integers(1, 6, 40))}
+    predictions = {name: frame + rng.normal(0, 0.5, frame.shape) * [1, 1, 0, 0, 0, 0, 0, 0]
+                   for name, frame in gt_frames.items()}
+    gt = GroundTruth.from_frames(gt_frames)
+    normal = evaluate_arrays(gt, predictions)['submission_result']
+    progressive = evaluate_arrays(gt, predictions, progress=True, progress_seed=3)['submission_result']
+    for key in ('AVG_XY_IOU_CI95_LOW', 'AVG_XY_IOU_CI95_HIGH'):
+        assert progressive[key] == normal[key]
+
+
+def test_editing_the_ignore_regions_file_does_not_resume_its_journal(tmp_path, monkeypatch):
+    gt_file = ROOT / 'annotations' / 'test_annotations_devsplit.zip'
+    regions = tmp_path / 'regions.json'
+    checkpoints = tmp_path / 'checkpoints'
+    # journals are kept after the run, so a second run would resume the whole first one
+    monkeypatch.setattr(Journal, 'remove', lambda self: None)
+
+    def run(max_range, **kwargs):
+        regions.write_text(json.dumps({'max_range': max_range}))
+        return evaluate(gt_file, ROOT / 'submission.zip', 'dev', ignore_regions=str(regions),
+                        bootstrap_replicates=0, **kwargs)['submission_result']
+
+    run(1.0, checkpoint_dir=str(checkpoints), checkpoint_seconds=0)
+    assert run(1000.0, checkpoint_dir=str(checkpoints), checkpoint_seconds=0) == run(1000.0)
+    assert len(list(checkpoints.glob('*.journal'))) == 2
+
+
+def test_a_huge_box_is_paired_with_every_box_it_overlaps():
+    rng = np.random.default_rng(0)
+    normal = boxes(*[[x, y, 0, 4, 2, 1.5, h, 1] for x, y, h in rng.uniform([-50, -50, 0], [50, 50, 360], (200, 3))])
+    huge = np.concatenate([normal[:100], boxes([0, 0, 0, 4e4, 4e4, 1.5, 30, 1]), normal[100:]])
+    for target, ref in ((normal, huge), (huge, normal), (huge, huge)):
+        target, ref = FrameIndex(as_boxes(target)), FrameIndex(as_boxes(ref))
+        rows, cols = ref.candidate_pairs(target)
+        expected = xy_iou_matrix(target.geometry, ref.geometry)
+        assert np.array_equal(xy_iou_matrix(target.geometry, ref.geometry, rows, cols), expected)
+        assert np.count_nonzero(expected) > 0
+
+
+def tar_submission(path, frames, symlink=None):
+    with tarfile.open(path, 'w:gz') as tf:
+        for name, data in sorted(frames.items()):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+        if symlink is not None:
+            info = tarfile.TarInfo(symlink)
+            info.type, info.linkname = tarfile.SYMTYPE, '/dev/zero'
+            tf.addfile(info)
+    return path
+
+
+def test_tar_submissions_are_admitted_by_their_member_sizes(tmp_path):
+    gt_file = ROOT / 'annotations' / 'test_annotations_devsplit.zip'
+    with zipfile.ZipFile(ROOT / 'submission.zip') as source:
+        frames = {name: source.read(name) for name in source.namelist()}
+    name, data = sorted(frames.items())[0]
+    tar = tar_submission(tmp_path / 'submission.tar.gz', dict(frames, **{name: data * 3}))
+    with pytest.raises(AdmissionError, match=name):
+        evaluate(gt_file, tar, 'dev', max_frame_boxes=len(data) // 32 + 1, admission_policy='reject')
+    clean = evaluate(gt_file, ROOT / 'submission.zip', 'dev')['submission_result']['AVG_XY_IOU']
+    tar = tar_submission(tmp_path / 'clean.tar.gz', frames)
+    assert evaluate(gt_file, tar, 'dev')['submission_result']['AVG_XY_IOU'] == clean
+
+
+def test_submissions_that_can_not_be_counted_are_rejected(tmp_path):
+    gt_file = ROOT / 'annotations' / 'test_annotations_devsplit.zip'
+    name = sorted(GroundTruth(gt_file).index)[0]
+    tar = tar_submission(tmp_path / 'linked.tar.gz', {}, symlink=name)
+    with pytest.raises(AdmissionError, match='not a regular file'):
+        evaluate(gt_file, tar, 'dev')
+    other = tmp_path / 'submission.bin'
+    other.write_bytes(b'\0' * 320)
+    with pytest.raises(AdmissionError, match='not a zip or tar'):
+        evaluate(gt_file, other, 'dev')
+
+
+def test_evaluate_many_matches_evaluate(tmp_path):
+    gt_file = ROOT / 'annotations' / 'test_annotations_devsplit.zip'
+    shifted = tmp_path / 'shifted.zip'
+    with zipfile.ZipFile(ROOT / 'submission.zip') as source, zipfile.ZipFile(shifted, 'w') as target:
+        for i, name in enumerate(sorted(source.namelist())):
+            frame = np.frombuffer(source.read(name), dtype=np.float32).reshape(-1, 8).copy()
+            frame[:, 0] += 0.1 * (i % 7)
+            target.writestr(name, frame.tobytes())
+    broken = tmp_path / 'broken.bin'
+    broken.write_bytes(b'not an archive')
+    submissions = [ROOT / 'submission.zip', shifted, broken]
+    expected = [evaluate(gt_file, submission, 'dev') for submission in submissions[:2]] + [None]
+    assert expected[0]['submission_result'] != expected[1]['submission_result']
+    for max_workers in (1, 2):
+        assert evaluate_many(gt_file, submissions, 'dev', max_workers=max_workers) == expected
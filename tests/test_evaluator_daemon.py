@@ -0,0 +1,129 @@
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import ROOT
+
+grpc = pytest.importorskip("grpc")
+
+
+
+def load_module(name, path):
+    """ module loaded by path, utils/ has another client module. Registered, so pool processes unpickle its functions """
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = sys.modules[name] = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+evaluator_client = load_module("evaluator_client", ROOT / "code_upload_challenge_evaluation" / "evaluator" / "client.py")
+evaluator_daemon = load_module("evaluator_daemon", ROOT / "code_upload_challenge_evaluation" / "evaluator" / "evaluator.py")
+
+
+@pytest.fixture(scope="module")
+def client():
+    """ evaluator daemon serving the dev phase on a free localhost port """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        address = "127.0.0.1:{}".format(s.getsockname()[1])
+    env = dict(
+        os.environ,
+        PHASES=json.dumps({"dev": str(ROOT / "annotations" / "test_annotations_devsplit.zip")}),
+        EVALUATOR_ADDRESS=address,
+        EVALUATOR_WORKERS="1",
+    )
+    daemon = subprocess.Popen(
+        [sys.executable, str(ROOT / "code_upload_challenge_evaluation" / "evaluator" / "evaluator.py")],
+        env=env, stdout=subprocess.DEVNULL,
+    )
+    evaluator = evaluator_client.EvaluatorClient(address)
+    try:
+        grpc.channel_ready_future(evaluator.channel).result(timeout=120)
+        yield evaluator
+    finally:
+        evaluator.close()
+        daemon.terminate()
+        daemon.wait(timeout=30)
+
+
+def avg_xy_iou(response):
+    assert not response.error
+    return json.loads(response.output)["submission_result"]["AVG_XY_IOU"]
+
+
+def test_scores_a_submission_path(client):
+    assert avg_xy_iou(client.evaluate("dev", path=ROOT / "submission.zip")) == pytest.approx(1)
+
+
+def test_scores_an_upload_above_4mb(client, tmp_path):
+    upload = tmp_path / "upload.zip"
+    with zipfile.ZipFile(ROOT / "submission.zip") as source, zipfile.ZipFile(upload, "w") as target:
+        for name in source.namelist():
+            target.writestr(name, source.read(name))
+        target.writestr("padding.bin", os.urandom(5 * 1024 ** 2))
+    assert upload.stat().st_size > 4 * 1024 ** 2
+    assert avg_xy_iou(client.evaluate("dev", data=upload.read_bytes())) == pytest.approx(1)
+
+
+def test_unknown_phase_is_rejected(client):
+    with pytest.raises(grpc.RpcError) as error:
+        client.evaluate("test", path=ROOT / "submission.zip")
+    assert error.value.code() == grpc.StatusCode.INVALID_ARGUMENT
+
+
+@pytest.mark.parametrize("options", [
+    {"manifest_file": "/tmp/manifest.json"},
+    {"checkpoint_dir": "/tmp"},
+    {"max_total_boxes": None},
+    {"ignore_regions": "/etc/passwd"},
+    {"bootstrap_replicates": "1000"},
+    {"bootstrap_replicates": 10 ** 9},
+])
+def test_server_controlled_options_are_refused(client, options):
+    with pytest.raises(grpc.RpcError) as error:
+        client.evaluate("dev", path=ROOT / "submission.zip", **options)
+    assert error.value.code() == grpc.StatusCode.INVALID_ARGUMENT
+
+
+def test_client_options_are_used(client):
+    response = client.evaluate("dev", path=ROOT / "submission.zip", bootstrap_replicates=0, skip_empty_gt=True)
+    assert avg_xy_iou(response) == pytest.approx(1)
+    assert "AVG_XY_IOU_CI95_LOW" not in json.loads(response.output)["submission_result"]
+
+
+def crashing_score_in_worker(submission_file, phase, options):
+    """ score_in_worker whose process dies on crash.zip, like one killed out of memory """
+    if submission_file == "crash.zip":
+        os._exit(1)
+    time.sleep(0.5)
+    return evaluator_daemon.score_submission(evaluator_daemon.WORKER_GT[phase], submission_file, phase, **options), 0, 0
+
+
+def test_a_broken_pool_is_replaced_and_only_the_crashing_request_fails(monkeypatch):
+    from evaluation_script import GroundTruth
+
+    monkeypatch.setattr(evaluator_daemon, "score_in_worker", crashing_score_in_worker)
+    evaluator = evaluator_daemon.Evaluator({"dev": GroundTruth(ROOT / "annotations" / "test_annotations_devsplit.zip")}, 2, 2)
+    broken = evaluator.pool
+
+    def evaluate(path):
+        request = evaluator_daemon.evaluation_pb2.EvaluateRequest(phase="dev", path=str(path), options="{}")
+        return evaluator.Evaluate(request, None)
+    try:
+        with ThreadPoolExecutor(2) as threads:
+            scored = threads.submit(evaluate, ROOT / "submission.zip")
+            crashed = threads.submit(evaluate, "crash.zip")
+            assert avg_xy_iou(scored.result()) == pytest.approx(1)
+            assert "died" in crashed.result().error
+        assert evaluator.pool is not broken
+        assert avg_xy_iou(evaluate(ROOT / "submission.zip")) == pytest.approx(1)
+    finally:
+        evaluator.close()
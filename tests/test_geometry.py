@@ -0,0 +1,59 @@
+import numpy as np
+
+from evaluation_script.geometry import BoxGeometry, aligned_pairs, intersection_areas, xy_intersection_matrix
+from evaluation_script.main import IOUBox, as_boxes
+
+
+def geometry(*rows):
+    """ BoxGeometry of (x, y, dx, dy, heading in degrees) rows """
+    rows = np.array(rows, dtype=float).reshape(-1, 5)
+    return BoxGeometry(as_boxes(np.stack([rows[:, 0], rows[:, 1], np.zeros(len(rows)), rows[:, 2], rows[:, 3],
+                                          np.ones(len(rows)), rows[:, 4]], axis=1)))
+
+
+def polygon_intersection(target, ref):
+    """ intersection area matrix of the shapely contours of IOUBox, the baseline iou """
+    contours = [[IOUBox(x, y, dx, dy, heading).contour() for x, y, dx, dy, heading in boxes]
+                for boxes in (target, ref)]
+    return np.array([[a.intersection(b).area for b in contours[1]] for a in contours[0]])
+
+
+def test_aligned_pairs_match_the_polygon_intersection():
+    # same heading, turned by 90, 180 and 270 degrees, axis aligned or not, overlapping partially, fully or not at all
+    pairs = [
+        ([0, 0, 4, 2, 0], [1, 0.5, 4, 2, 0]),
+        ([0, 0, 4, 2, 0], [0.5, 0, 4, 1, 90]),
+        ([0, 0, 4, 2, 0], [-1.5, 2, 3, 1, 270]),
+        ([0, 0, 4, 2, 0], [30, 0, 4, 2, 180]),
+        ([1, 1, 3, 1, 37], [1.5, 1, 2, 3, 127]),
+        ([1, 1, 3, 1, 37], [1, 1.2, 3, 1, 217]),
+        ([1, 1, 3, 1, 37], [1, 1, 1, 0.5, -53]),
+        ([-2, 3, 5, 2, 90], [-2, 2, 2, 6, 0]),
+    ]
+    target, ref = (np.array(boxes, dtype=float) for boxes in zip(*pairs))
+    target_geometry, ref_geometry = geometry(*target), geometry(*ref)
+    rows = cols = np.arange(len(pairs))
+    assert aligned_pairs(target_geometry, ref_geometry, rows, cols).all()
+    expected = np.diag(polygon_intersection(target, ref))
+    assert np.allclose(intersection_areas(target_geometry, ref_geometry, rows, cols), expected)
+    assert np.count_nonzero(expected) == len(pairs) - 1
+
+
+def test_rotated_pairs_match_the_polygon_intersection():
+    rng = np.random.default_rng(0)
+    target = np.concatenate([rng.uniform(-3, 3, (50, 2)), rng.uniform(0.5, 5, (50, 2)), rng.uniform(-180, 180, (50, 1))],
+                            axis=1)
+    ref = target + np.concatenate([rng.normal(0, 1, (50, 2)), np.zeros((50, 2)), rng.uniform(-90, 90, (50, 1))], axis=1)
+    target_geometry, ref_geometry = geometry(*target), geometry(*ref)
+    rows = cols = np.arange(50)
+    expected = np.diag(polygon_intersection(target, ref))
+    assert np.allclose(intersection_areas(target_geometry, ref_geometry, rows, cols), expected)
+
+
+def test_degenerate_boxes_never_overlap():
+    boxes = geometry([0, 0, 4, 2, 0], [np.nan, 0, 4, 2, 0], [0, 0, 0, 2, 0], [0, 0, 4, -1, 0], [0, 0, 4, 2, np.inf])
+    assert boxes.valid.tolist() == [True, False, False, False, False]
+    assert np.isfinite(boxes.corners).all()
+    intersection = xy_intersection_matrix(boxes, boxes)
+    assert intersection[0, 0] == 8
+    assert np.count_nonzero(intersection) == 1
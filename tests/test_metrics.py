@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from evaluation_script import GroundTruth, evaluate_arrays
+from evaluation_script.distance import _nearest_grid, _nearest_kdtree
+
+
+def boxes(*rows):
+    """ (N, 8) x, y, z, length, width, height, heading, class rows """
+    return np.array(rows, dtype=float).reshape(-1, 8)
+
+
+GT_FRAMES = {
+    '0000000000.bin': boxes([0, 0, 0, 4, 2, 1.5, 0, 1], [10, 0, 0, 4, 2, 1.5, 0, 2]),
+    '0000000001.bin': boxes([0, 5, 0, 4, 2, 1.5, 30, 1]),
+}
+
+
+def test_a_class_without_detections_averages_to_zero():
+    gt = GroundTruth.from_frames(GT_FRAMES)
+    predictions = {name: frame[frame[:, 7] == 1] for name, frame in GT_FRAMES.items()}
+    result = evaluate_arrays(gt, predictions, bootstrap_replicates=0)['submission_result']
+    assert np.isclose(result['AVG_XY_IOU_CLASS_1'], 1)
+    assert result['AVG_XY_IOU_CLASS_2'] == 0
+
+
+def test_an_empty_submission_averages_to_zero():
+    gt = GroundTruth.from_frames(GT_FRAMES)
+    output = evaluate_arrays(gt, {name: boxes() for name in GT_FRAMES})
+    for name in ('AVG_XY_IOU', 'AVG_3D_IOU', 'AVG_GT_VS_DET_XY_IOU', 'AVG_DET_VS_GT_XY_IOU', 'AVG_XY_IOU_CLASS_1'):
+        assert output['submission_result'][name] == 0
+    assert output['result'][0]['dev_split']['AVG_XY_IOU'] == 0
+    assert output['submission_result']['AVG_XY_IOU_CI95_LOW'] == output['submission_result']['AVG_XY_IOU_CI95_HIGH'] == 0
+
+
+def test_an_empty_submission_has_zero_precision():
+    gt = GroundTruth.from_frames(GT_FRAMES)
+    result = evaluate_arrays(gt, {name: boxes() for name in GT_FRAMES}, bootstrap_replicates=0)['submission_result']
+    for name in ('XY_PRECISION_50', 'XY_RECALL_50', '3D_PRECISION_50', 'CENTER_PRECISION_2M', 'CENTER_RECALL_2M'):
+        assert result[name] == 0
+
+
+def brute_force_nearest(query, ref, max_distance):
+    distance = np.hypot(*(query[:, None, :] - ref[None, :, :]).transpose(2, 0, 1))
+    arg = np.argmin(distance, axis=1)
+    best = distance[np.arange(len(query)), arg]
+    found = best <= max_distance
+    return np.where(found, best, np.inf), np.where(found, arg, -1)
+
+
+def centers(seed):
+    rng = np.random.default_rng(seed)
+    query = rng.uniform(-30, 30, (300, 2))
+    ref = np.concatenate([
+        rng.uniform(-30, 30, (200, 2)),
+        query[:20] + [4.0, 0.0],  # exactly at the bound
+        query[20:30],  # duplicates of query centers
+        [[1e7, 1e7], [-1e15, 5.0], [1e20, 1.0]],  # far outliers
+    ])
+    ref = np.concatenate([ref, ref[:10]])  # tied ref centers
+    return np.concatenate([query, [[1e7 + 1, 1e7], [-1e15, 7.0], [1e20, 0.0]]]), ref
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_grid_nearest_centers_match_brute_force(seed):
+    query, ref = centers(seed)
+    for max_distance in (0.5, 4.0):
+        distance, arg = _nearest_grid(query, ref, max_distance)
+        expected_distance, expected_arg = brute_force_nearest(query, ref, max_distance)
+        assert np.array_equal(distance, expected_distance)
+        assert np.array_equal(arg, expected_arg)
+
+
+def test_kdtree_nearest_centers_match_brute_force():
+    pytest.importorskip("scipy")
+    query, ref = centers(0)
+    distance, arg = _nearest_kdtree(query, ref, 4.0)
+    expected_distance, _ = brute_force_nearest(query, ref, 4.0)
+    assert np.allclose(distance, expected_distance, rtol=0, atol=1e-9)
+    found = np.isfinite(distance)
+    assert np.allclose(np.hypot(*(query[found] - ref[arg[found]]).T), distance[found], rtol=0, atol=1e-9)
+
+
+def test_true_positive_errors_of_a_hand_built_frame():
+    gt = GroundTruth.from_frames({'0000000000.bin': boxes(
+        [0, 0, 0, 4, 2, 1.5, 0, 1],
+        [20, 0, 0, 4, 2, 2, 0, 2],
+        [40, 0, 0, 4, 2, 2, 0, 2],  # missed
+    )})
+    predictions = {'0000000000.bin': boxes(
+        [0.3, 0.4, 0, 4, 2, 1.5, 10, 1],  # 0.5 m off, turned by 10 degrees
+        [20, 0, 0, 3, 2, 2, 0, 2],  # 3 / 4 of the gt volume
+        [43, 0, 0, 4, 2, 2, 0, 2],  # xy iou 1 / 7, not a true positive
+    )}
+    result = evaluate_arrays(gt, predictions, bootstrap_replicates=0)['submission_result']
+    assert np.isclose(result['TP_TRANSLATION_ERROR'], 0.25)
+    assert np.isclose(result['TP_SCALE_ERROR'], 0.125)
+    assert np.isclose(result['TP_ORIENTATION_ERROR'], np.radians(10) / 2)
+    assert np.isclose(result['TP_TRANSLATION_ERROR_CLASS_1'], 0.5)
+    assert np.isclose(result['TP_ORIENTATION_ERROR_CLASS_1'], np.radians(10))
+    assert np.isclose(result['TP_SCALE_ERROR_CLASS_2'], 0.25)
+    assert result['TP_TRANSLATION_ERROR_CLASS_2'] == 0
+
+
+def test_true_positive_errors_without_true_positives_are_left_out():
+    gt = GroundTruth.from_frames(GT_FRAMES)
+    output = evaluate_arrays(gt, {name: boxes() for name in GT_FRAMES})
+    assert not [name for name in output['submission_result'] if name.startswith('TP_')]
+    assert all(np.isfinite(value) for value in output['submission_result'].values())
+    assert all(np.isfinite(value) for value in output['result'][0]['dev_split'].values())
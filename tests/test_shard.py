@@ -0,0 +1,44 @@
+import threading
+
+import numpy as np
+import pytest
+
+from conftest import ROOT
+from evaluation_script import evaluate
+from evaluation_script.shard import evaluate_sharded, shard_frames
+
+GT_FILE = ROOT / 'annotations' / 'test_annotations_devsplit.zip'
+SUBMISSION = ROOT / 'submission.zip'
+
+
+@pytest.fixture(scope='module')
+def single():
+    return evaluate(GT_FILE, SUBMISSION, 'dev', bootstrap_replicates=0)['submission_result']
+
+
+def assert_same_result(sharded, single):
+    assert sharded.keys() == single.keys()
+    for key, value in single.items():
+        assert np.isclose(sharded[key], value, equal_nan=True), key
+
+
+def accept_threads():
+    return [thread for thread in threading.enumerate() if '_accept' in thread.name]
+
+
+def test_shard_frames_of_no_frames():
+    assert shard_frames([], {}, 4) == []
+    assert shard_frames([], {}, 4, keep_sequences=True) == []
+
+
+def test_local_workers_match_a_single_process_run(single):
+    output = evaluate_sharded(GT_FILE, SUBMISSION, 'dev', shards=5, local_workers=2, bootstrap_replicates=0)
+    assert_same_result(output['submission_result'], single)
+    assert not accept_threads()
+
+
+def test_no_worker_connecting_falls_back_to_the_coordinator(single):
+    output = evaluate_sharded(GT_FILE, SUBMISSION, 'dev', shards=3, local_workers=0, idle_seconds=0.5,
+                              bootstrap_replicates=0)
+    assert_same_result(output['submission_result'], single)
+    assert not accept_threads()
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import worker
+from conftest import ROOT
+from worker import SubmissionWorker
+
+
+class FakeEvalAI:
+    """ records the calls of the worker in order, submissions are read from a dict """
+    def __init__(self, submissions):
+        self.submissions = submissions
+        self.calls = []
+
+    async def get_submission_by_pk(self, submission_pk):
+        return self.submissions[submission_pk]
+
+    async def update_submission_status(self, data):
+        self.calls.append(("status", data["submission"], data["submission_status"]))
+
+    async def update_submission_data(self, data):
+        self.calls.append(("data", data["submission"], data["submission_status"], data))
+
+    async def delete_message_from_sqs_queue(self, receipt_handle):
+        self.calls.append(("delete", receipt_handle))
+
+
+class FakeDownloads:
+    def __init__(self):
+        self.pinned = []
+
+    def fetch_submission(self, submission, pin=False):
+        if pin:
+            self.pinned.append(submission["input_file"])
+        return submission["input_file"]
+
+    def release(self, path):
+        self.pinned.remove(path)
+
+
+def message(submission_pk, phase_pk=1):
+    return {"receipt_handle": "handle{}".format(submission_pk),
+            "body": {"submission_pk": submission_pk, "phase_pk": phase_pk}}
+
+
+def make_worker(submissions, slots=1):
+    evalai = FakeEvalAI(submissions)
+    phases = {1: {"codename": "dev", "annotation_file": str(ROOT / "annotations" / "test_annotations_devsplit.zip")}}
+    return evalai, SubmissionWorker(evalai, phases, slots=slots, downloads=FakeDownloads())
+
+
+def test_evaluates_and_reports_the_result():
+    evalai, submission_worker = make_worker(
+        {5: {"status": "submitted", "input_file": str(ROOT / "submission.zip")}}
+    )
+    with ThreadPoolExecutor(1) as submission_worker.executor:
+        asyncio.run(submission_worker.handle_message(message(5)))
+    assert [call[:3] for call in evalai.calls] == [("status", 5, "RUNNING"), ("data", 5, "FINISHED"), ("delete", "handle5")]
+    result = json.loads(evalai.calls[1][3]["result"])
+    assert result[0]["split"] == "dev_split"
+    assert abs(result[0]["accuracies"]["AVG_XY_IOU"] - 1) < 1e-6
+    assert submission_worker.downloads.pinned == []
+
+
+def test_unknown_phase_fails_and_deletes_the_message():
+    evalai, submission_worker = make_worker({5: {"status": "submitted", "input_file": "unused.zip"}})
+    asyncio.run(submission_worker.handle_message(message(5, phase_pk=99)))
+    assert [call[:3] for call in evalai.calls] == [("data", 5, "FAILED"), ("delete", "handle5")]
+    assert "99" in evalai.calls[0][3]["stderr"]
+
+
+def test_running_is_reported_once_a_slot_is_acquired(monkeypatch):
+    evalai, submission_worker = make_worker(
+        {pk: {"status": "submitted", "input_file": "{}.zip".format(pk)} for pk in (1, 2)}, slots=1
+    )
+
+    def run_evaluation(*args):
+        return {"output": {"result": []}, "stdout": "", "stderr": ""}
+    monkeypatch.setattr(worker, "run_evaluation", run_evaluation)
+
+    async def handle_both():
+        with ThreadPoolExecutor(1) as submission_worker.executor:
+            await asyncio.gather(*(submission_worker.handle_message(message(pk)) for pk in (1, 2)))
+    asyncio.run(handle_both())
+    statuses = [call[1:3] for call in evalai.calls if call[0] != "delete"]
+    # the second submission waits for the only slot and is not shown as running meanwhile
+    assert statuses == [(1, "RUNNING"), (1, "FINISHED"), (2, "RUNNING"), (2, "FINISHED")]
+
+
+def test_done_submissions_only_delete_the_message():
+    evalai, submission_worker = make_worker({5: {"status": "finished"}})
+    asyncio.run(submission_worker.handle_message(message(5)))
+    assert evalai.calls == [("delete", "handle5")]
+
+
+def crashing_run_evaluation(evaluation_script_dir, annotation_file, input_file, *args):
+    """ run_evaluation whose process dies on crash.zip, like one killed out of memory """
+    if input_file == "crash.zip":
+        os._exit(1)
+    time.sleep(0.5)
+    return {"output": {"result": []}, "stdout": "", "stderr": ""}
+
+
+def test_a_broken_pool_is_replaced_and_only_the_crashing_submission_fails(monkeypatch):
+    evalai, submission_worker = make_worker(
+        {pk: {"status": "submitted", "input_file": name} for pk, name in ((1, "crash.zip"), (2, "2.zip"), (3, "3.zip"))},
+        slots=2,
+    )
+    monkeypatch.setattr(worker, "run_evaluation", crashing_run_evaluation)
+
+    async def handle_all():
+        submission_worker.executor = ProcessPoolExecutor(2)
+        broken = submission_worker.executor
+        try:
+            await asyncio.gather(*(submission_worker.handle_message(message(pk)) for pk in (2, 1)))
+            assert submission_worker.executor is not broken
+            await submission_worker.handle_message(message(3))
+        finally:
+            submission_worker.executor.shutdown()
+    asyncio.run(handle_all())
+    results = {call[1]: call[2] for call in evalai.calls if call[0] == "data"}
+    assert results == {1: "FAILED", 2: "FINISHED", 3: "FINISHED"}
+    assert sorted(call[1] for call in evalai.calls if call[0] == "delete") == ["handle1", "handle2", "handle3"]
+    assert submission_worker.downloads.pinned == []
+